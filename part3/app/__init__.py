@@ -6,7 +6,9 @@ from app.api.v1.amenities import api as amenities_ns
 from app.api.v1.reviews import api as reviews_ns
 from app.api.v1.places import api as places_ns
 from app.api.v1.auth import api as auth_ns
+from app.api.v1.changes import api as changes_ns
 from app.utils.encryption import bcrypt
+from app.services import facade
 from config import config
 
 # Instantiate JWTManager
@@ -26,6 +28,9 @@ def create_app(config_name="development"):
     # Initialize JWTManager with the Flask app
     jwt.init_app(app)
 
+    # Select the storage backend of the facade
+    facade.init_app(app)
+
     # Add security definitions for Swagger
     authorizations = {
         'Bearer': {
@@ -52,6 +57,7 @@ def create_app(config_name="development"):
     api.add_namespace(reviews_ns, path='/api/v1/reviews')
     api.add_namespace(places_ns, path='/api/v1/places')
     api.add_namespace(auth_ns, path='/api/v1/auth')
+    api.add_namespace(changes_ns, path='/api/v1/changes')
 
     return app
 
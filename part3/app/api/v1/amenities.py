@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
-from app.services import facade
+from app.services import async_facade, facade
+from app.api.v1.async_views import async_view
+from app.api.v1.pagination import (
+    get_page_async, json_response, pagination_parser)
 
 api = Namespace('amenities', description='Amenity operations')
 
@@ -32,18 +35,26 @@ class AmenityList(Resource):
 
         return new_amenity, 201
 
+    @api.expect(pagination_parser)
     @api.response(200, 'List of amenities retrieved successfully')
-    def get(self):
+    @api.response(400, 'Invalid pagination parameters')
+    @async_view
+    async def get(self):
         """
         Retrieve a list of all amenities.
-        Handles the GET request to fetch all available amenities.
+        Handles the GET request to fetch all available amenities, a page
+        at a time when limit and cursor are given.
         """
-        amenities = facade.get_all_amenities()
+        try:
+            amenities, headers = await get_page_async(
+                async_facade.get_amenities_page, encoded=True)
+        except ValueError as error:
+            return {'error': str(error)}, 400
 
-        if not amenities:
+        if amenities == b'[]':
             return {'error': 'No amenities found'}, 404
 
-        return amenities, 200
+        return json_response(amenities, headers)
 
 
 @api.route('/<amenity_id>')
@@ -53,11 +64,12 @@ class AmenityResource(Resource):
     """
     @api.response(200, 'Amenity details retrieved successfully')
     @api.response(404, 'Amenity not found')
-    def get(self, amenity_id):
+    @async_view
+    async def get(self, amenity_id):
         """
         Get amenity details by ID.
         """
-        amenity = facade.get_amenity(amenity_id)
+        amenity = await async_facade.get_amenity(amenity_id)
 
         if not amenity:
             return {'error': 'Amenity not found'}, 404
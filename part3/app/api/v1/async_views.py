@@ -0,0 +1,14 @@
+from functools import wraps
+from flask import current_app
+
+
+def async_view(method):
+    """Let a Resource method be a coroutine function.
+
+    flask-restx calls resource methods directly, so the coroutine is run
+    through Flask's ensure_sync, on an event loop for the request.
+    """
+    @wraps(method)
+    def view(*args, **kwargs):
+        return current_app.ensure_sync(method)(*args, **kwargs)
+    return view
@@ -0,0 +1,39 @@
+from flask_restx import Namespace, Resource, reqparse
+from app.persistence.changes import ResyncRequired
+from app.services import facade
+
+api = Namespace('changes', description='Change feed')
+
+changes_parser = reqparse.RequestParser()
+changes_parser.add_argument(
+    'since', type=int, default=0, location='args',
+    help='next_since of the previous response (0 the first time)')
+changes_parser.add_argument(
+    'limit', type=int, location='args',
+    help='Maximum number of changes to read')
+
+
+@api.route('/')
+class ChangeList(Resource):
+    @api.expect(changes_parser)
+    @api.response(200, 'Changes after since')
+    @api.response(400, 'Invalid query parameters')
+    @api.response(410, 'Changes no longer available: resync required')
+    def get(self):
+        """Retrieve the creates, updates and deletes of users, places,
+        reviews and amenities made after since.
+
+        Each object changed is listed once, with its current data or
+        "deleted": true. Pass next_since as since to continue; when
+        has_more is false the client is up to date. A 410 response means
+        since is too old: reload the lists and continue from its
+        last_seq.
+        """
+        args = changes_parser.parse_args()
+        try:
+            return facade.get_changes(args['since'], args['limit']), 200
+        except ResyncRequired as error:
+            return {'message': str(error), 'resync': True,
+                    'last_seq': facade.changes.last_seq}, 410
+        except ValueError as error:
+            return {'message': str(error)}, 400
@@ -0,0 +1,31 @@
+from flask import Response
+from flask_restx import reqparse
+
+# Query parameters accepted by every list resource
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument(
+    'limit', type=int, location='args',
+    help='Maximum number of items to return')
+pagination_parser.add_argument(
+    'cursor', type=str, location='args',
+    help='Cursor returned in X-Next-Cursor by the previous page')
+
+
+async def get_page_async(fetch, parser=pagination_parser, **kwargs):
+    """Await fetch with the request's pagination (and parser's other)
+    arguments, and kwargs, as keywords.
+
+    Returns (items, headers): the next page's cursor, if any, is sent in
+    the X-Next-Cursor header so list bodies stay plain JSON arrays.
+    Raises ValueError for an invalid cursor or limit.
+    """
+    items, next_cursor = await fetch(**parser.parse_args(), **kwargs)
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    return items, headers
+
+
+def json_response(body, headers=None, status=200):
+    """Return JSON bytes, such as a page fetched with encoded=True, as the
+    response, without decoding and encoding them again
+    """
+    return Response(body, status, headers, mimetype='application/json')
@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
-from app.services import facade
+from app.services import async_facade, facade
+from app.api.v1.async_views import async_view
+from app.api.v1.pagination import (
+    get_page_async, json_response, pagination_parser)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 api = Namespace('places', description='Place operations')
@@ -41,6 +44,46 @@ place_model = api.model('Place', {
 })
 
 
+def bbox(value):
+    """Parse a minLat,minLon,maxLat,maxLon bounding box"""
+    try:
+        min_lat, min_lon, max_lat, max_lon = map(float, value.split(','))
+    except ValueError:
+        raise ValueError("bbox must be minLat,minLon,maxLat,maxLon") from None
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bbox minimums must not exceed its maximums")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def near(value):
+    """Parse a lat,lon,km circle"""
+    try:
+        lat, lon, km = map(float, value.split(','))
+    except ValueError:
+        raise ValueError("near must be lat,lon,km") from None
+    if km < 0:
+        raise ValueError("near radius must not be negative")
+    return lat, lon, km
+
+
+place_list_parser = pagination_parser.copy()
+place_list_parser.add_argument(
+    'bbox', type=bbox, location='args',
+    help='Only places inside minLat,minLon,maxLat,maxLon')
+place_list_parser.add_argument(
+    'q', type=str, location='args',
+    help='Only places whose title or description match, best first')
+place_list_parser.add_argument(
+    'near', type=near, location='args',
+    help='Only places within km of lat,lon')
+place_list_parser.add_argument(
+    'min_price', type=float, location='args',
+    help='Only places priced at least this much per night')
+place_list_parser.add_argument(
+    'max_price', type=float, location='args',
+    help='Only places priced at most this much per night')
+
+
 @api.route('/')
 class PlaceList(Resource):
     @jwt_required()
@@ -60,26 +103,33 @@ class PlaceList(Resource):
         new_place = facade.create_place(place_data)
         return new_place, 201
 
+    @api.expect(place_list_parser)
     @api.response(200, 'Places list')
-    def get(self):
-        """Retrieve all places"""
-        places = facade.get_all_places()
-        return places, 200
+    @api.response(400, 'Invalid query parameters')
+    @async_view
+    async def get(self):
+        """Retrieve all places, or those matching the filters, a page at
+        a time
+        """
+        try:
+            places, headers = await get_page_async(
+                async_facade.get_places_page, place_list_parser,
+                encoded=True)
+        except ValueError as error:
+            return {'message': str(error)}, 400
+        return json_response(places, headers)
 
 
 @api.route('/<place_id>')
 class PlaceResource(Resource):
     @api.response(200, 'Place details')
     @api.response(404, 'Place not found')
-    def get(self, place_id):
+    @async_view
+    async def get(self, place_id):
         """Retrieve a place's details, including its reviews"""
-        place = facade.get_place(place_id)
+        place = await async_facade.get_place_with_reviews(place_id)
         if not place:
             return {'message': 'Not found'}, 404
-
-        # retrieve reviews associated with the location
-        reviews = facade.get_reviews_by_place(place_id)
-        place['reviews'] = reviews
         return place, 200
 
     @api.response(200, 'Place deleted')
@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
-from app.services import facade
+from app.services import async_facade, facade
+from app.api.v1.async_views import async_view
+from app.api.v1.pagination import (
+    get_page_async, json_response, pagination_parser)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 api = Namespace('reviews', description='Review operations')
@@ -16,6 +19,12 @@ review_model = api.model('Review', {
 })
 
 
+review_list_parser = pagination_parser.copy()
+review_list_parser.add_argument(
+    'q', type=str, location='args',
+    help='Only reviews whose text matches, best first')
+
+
 @api.route('/')
 class ReviewList(Resource):
     @jwt_required()
@@ -39,33 +48,38 @@ class ReviewList(Resource):
         if token_user_id == place_data["owner"]:
             return {'message': 'You cannot review your own place'}, 400
 
-        # Check if the user has already reviewed this place
-        existing_review = facade.get_user_review_for_place(
-            token_user_id,
-            review_data['place_id'])
-        # 409 is for conflict
-        if existing_review:
-            return {'message': 'You have already reviewed this place'}, 400
-
-        new_review = facade.create_review(review_data)
-        if not new_review:
-            return {'error': 'Invalid input data'}, 400
+        # A second review of the place by the user is rejected here
+        try:
+            new_review = facade.create_review(review_data)
+        except ValueError as error:
+            return {'message': str(error)}, 400
         return new_review, 201
 
+    @api.expect(review_list_parser)
     @api.response(200, 'List of reviews retrieved successfully')
-    def get(self):
-        """Retrieve a list of all reviews"""
-        reviews = facade.get_all_reviews()
-        return reviews, 200
+    @api.response(400, 'Invalid query parameters')
+    @async_view
+    async def get(self):
+        """Retrieve a list of all reviews, or those matching q, a page at
+        a time
+        """
+        try:
+            reviews, headers = await get_page_async(
+                async_facade.get_reviews_page, review_list_parser,
+                encoded=True)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        return json_response(reviews, headers)
 
 
 @api.route('/<review_id>')
 class ReviewResource(Resource):
     @api.response(200, 'Review details retrieved successfully')
     @api.response(404, 'Review not found')
-    def get(self, review_id):
+    @async_view
+    async def get(self, review_id):
         """Get review details by ID"""
-        review = facade.get_review(review_id)
+        review = await async_facade.get_review(review_id)
         if not review:
             return {'error': 'Review not found'}, 404
         return review, 200
@@ -126,9 +140,10 @@ class ReviewResource(Resource):
 class PlaceReviewList(Resource):
     @api.response(200, 'List of reviews for the place retrieved successfully')
     @api.response(404, 'Place not found')
-    def get(self, place_id):
+    @async_view
+    async def get(self, place_id):
         """Get all reviews for a specific place"""
-        reviews = facade.get_reviews_by_place(place_id)
+        reviews = await async_facade.get_reviews_by_place(place_id)
         if not reviews:
             return {'error': 'No reviews found for this place'}, 404
         return reviews, 200
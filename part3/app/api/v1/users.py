@@ -4,7 +4,10 @@ from flask_jwt_extended import (
     get_jwt_identity,
     get_jwt
 )
-from app.services import facade
+from app.services import async_facade, facade
+from app.api.v1.async_views import async_view
+from app.api.v1.pagination import (
+    get_page_async, json_response, pagination_parser)
 
 api = Namespace('users', description='User operations')
 
@@ -46,18 +49,25 @@ class UserList(Resource):
             return {'error': 'Email already registered'}, 400
         try:
             new_user = facade.create_user(user_data)
-        except ValueError:
-            return {'error': 'Invalid input data'}, 400
+        except ValueError as error:
+            return {'error': str(error)}, 400
         return {
             'id': new_user['id'],
             'message': 'User successfully created'
             }, 201
 
+    @api.expect(pagination_parser)
     @api.response(200, 'User list retrieved')
-    def get(self):
-        """Retrieve all users"""
-        users = facade.get_all_users()
-        return users, 200
+    @api.response(400, 'Invalid pagination parameters')
+    @async_view
+    async def get(self):
+        """Retrieve all users, a page at a time with limit and cursor"""
+        try:
+            users, headers = await get_page_async(
+                async_facade.get_users_page, encoded=True)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        return json_response(users, headers)
 
 # Retrieve, update, or delete a specific user
 
@@ -66,9 +76,10 @@ class UserList(Resource):
 class UserResource(Resource):
     @api.response(200, 'User details retrieved')
     @api.response(404, 'User not found')
-    def get(self, user_id):
+    @async_view
+    async def get(self, user_id):
         """Get user details by ID"""
-        user = facade.get_user(user_id)
+        user = await async_facade.get_user(user_id)
         if not user:
             return {'error': 'User not found'}, 404
         user.pop('password', None)
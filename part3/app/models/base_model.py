@@ -1,33 +1,167 @@
-import uuid
+import json
 from datetime import datetime
+from .ids import new_id
+
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
+def _versions(items):
+    """Return the (id, updated_at) of a list of models, as a tuple"""
+    return tuple((item.id, item.updated_at) for item in items)
 
 
 class BaseModel:
+    # Attributes are kept in slots rather than a per-instance __dict__;
+    # subclasses list theirs in __slots__ too, and FIELDS holds them all.
+    # _json caches to_json() and is not an attribute of the entity.
+    __slots__ = ('id', 'created_at', 'updated_at', '_json')
+    FIELDS = ('id', 'created_at', 'updated_at')
+    # Attributes holding lists of related models
+    NESTED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = cls.FIELDS + cls.__dict__.get('__slots__', ())
+        cls._to_dict = compile_serializer(cls)
+
     def __init__(self):
-        self.id = str(uuid.uuid4())
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        self.id = new_id()
+        # Both timestamps share one datetime until the first save()
+        self.created_at = self.updated_at = datetime.now()
+        self._json = None
 
     def save(self):
         """Update the updated_at timestamp whenever the object is modified"""
         self.updated_at = datetime.now()
+        self._json = None
+
+    def changes(self, data):
+        """Return the items of data that would change the object: those of
+        its attributes (other than id) that are set and hold another value.
+
+        Lists of related models (NESTED) are compared by the id and
+        updated_at of their items, as the same version of an entity may
+        come as another instance.
+        """
+        changed = {}
+        for key, value in data.items():
+            if key not in self.FIELDS or key == 'id':
+                continue
+            current = getattr(self, key, value)
+            if key in self.NESTED:
+                current, new = _versions(current), _versions(value)
+            else:
+                new = value
+            if current != new:
+                changed[key] = value
+        return changed
 
     def update(self, data):
         """Update the attributes of the object based on the provided
-        dictionary"""
-        for key, value in data.items():
-            if hasattr(self, key):
+        dictionary, and return those that changed, by name.
+
+        The object is only saved when something changed.
+        """
+        changed = self.changes(data)
+        if changed:
+            for key, value in changed.items():
                 setattr(self, key, value)
-        self.save()  # Update the updated_at timestamp
+            self.save()  # Update the updated_at timestamp
+        return changed
+
+    def attributes(self):
+        """Return the attributes that are set, by name"""
+        values = {}
+        for key in self.FIELDS:
+            try:
+                values[key] = getattr(self, key)
+            except AttributeError:
+                pass
+        return values
 
     def to_dict(self):
         """Convert instance to dictionary"""
-        dictionary = {}
-        for key, value in self.__dict__.items():
-            if isinstance(value, datetime):
-                dictionary[key] = value.isoformat()
-            elif hasattr(value, 'to_dict'):
-                dictionary[key] = value.to_dict()
-            else:
-                dictionary[key] = value
-        return dictionary
+        return self._to_dict()
+
+    def to_public_dict(self):
+        """Convert instance to dictionary, as the API shows it"""
+        return self._to_dict()
+
+    def to_json(self):
+        """Return to_public_dict() encoded as JSON bytes.
+
+        The bytes are kept until the next save(), so code changing the
+        attributes directly must call save() too.
+        """
+        try:
+            data = self._json
+        except AttributeError:  # rebuilt without __init__
+            data = None
+        if data is None:
+            data = self._json = json.dumps(
+                self.to_public_dict(), separators=(',', ':')).encode()
+        return data
+
+
+def _nested(values):
+    return [value.to_dict() if isinstance(value, BaseModel) else value
+            for value in values]
+
+
+def _to_dict(obj, rename, exclude):
+    """Convert any instance to a dictionary, attribute by attribute"""
+    dictionary = {}
+    for key, value in obj.attributes().items():
+        if key in exclude:
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        elif isinstance(value, (list, tuple)):
+            value = _nested(value)
+        dictionary[rename.get(key, key)] = value
+    return dictionary
+
+
+def compile_serializer(cls, rename=None, exclude=()):
+    """Return a function converting an instance of cls to a dictionary,
+    with the attributes in rename renamed and those in exclude left out.
+
+    The function is generated for the FIELDS of cls, so it builds the
+    dictionary in one pass without inspecting the values: timestamps
+    become ISO strings and the NESTED lists hold dictionaries. Instances
+    with an attribute unset, or a timestamp that is not a datetime, take
+    the generic path.
+    """
+    rename = dict(rename or {})
+    lines = ['def to_dict(obj):', '    try:']
+    items = []
+    formatted = set()
+    for name in cls.FIELDS:
+        if name in exclude:
+            continue
+        value = f'obj.{name}'
+        if name == 'updated_at' and 'created_at' in formatted:
+            # Formatted once while both share one datetime
+            lines.append('        updated_at = created_at if obj.updated_at '
+                         'is obj.created_at else obj.updated_at.isoformat()')
+            value = name
+        elif name in DATETIME_FIELDS:
+            lines.append(f'        {name} = {value}.isoformat()')
+            value = name
+            formatted.add(name)
+        elif name in cls.NESTED:
+            value = f'_nested({value}) if {value} else []'
+        items.append(f'{rename.get(name, name)!r}: {value}')
+    lines += ['        return {' + ', '.join(items) + '}',
+              '    except AttributeError:',
+              '        return _to_dict(obj, rename, exclude)']
+    source = '\n'.join(lines)
+    namespace = {'_nested': _nested, '_to_dict': _to_dict,
+                 'rename': rename, 'exclude': frozenset(exclude)}
+    exec(source, namespace)
+    return namespace['to_dict']
+
+
+BaseModel._to_dict = compile_serializer(BaseModel)
@@ -1,8 +1,11 @@
-from datetime import datetime
-from .base_model import BaseModel
+from .base_model import BaseModel, compile_serializer
 
 
 class Place(BaseModel):
+    __slots__ = ('title', 'description', 'price', 'latitude', 'longitude',
+                 'owner', 'reviews', 'amenities')
+    NESTED = ('reviews', 'amenities')
+
     def __init__(self, title, description, price, latitude, longitude, owner):
         super().__init__()
         self.title = title
@@ -11,22 +14,29 @@ class Place(BaseModel):
         self.latitude = latitude
         self.longitude = longitude
         self.owner = owner  # Owner is id of user who owns the place(for now)
-        self.reviews = []  # List to store related reviews ids
-        self.amenities = []  # List to store related amenities ids
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        # Related reviews and amenities; a shared empty tuple until the
+        # first one is added, as most places have none
+        self.reviews = ()
+        self.amenities = ()
 
     def add_review(self, review):
         """Add a review to the place."""
+        if isinstance(self.reviews, tuple):
+            self.reviews = list(self.reviews)
         self.reviews.append(review)
+        self._json = None
 
     def add_amenity(self, amenity):
         """Add an amenity to the place."""
+        if isinstance(self.amenities, tuple):
+            self.amenities = list(self.amenities)
         self.amenities.append(amenity)
+        self._json = None
 
     def to_dict_with_owner_id(self):
         """Convert instance to dictionary with owner_id instead of owner"""
-        place_dict = self.to_dict()
-        place_dict['owner_id'] = self.owner
-        place_dict.pop('owner', None)
-        return place_dict
+        return _to_dict_with_owner_id(self)
+
+
+_to_dict_with_owner_id = compile_serializer(
+    Place, rename={'owner': 'owner_id'})
@@ -1,24 +1,25 @@
-from datetime import datetime
-from .base_model import BaseModel
+from .base_model import BaseModel, compile_serializer
 # from .user import User
 # from .place import Place
 
 
 class Review(BaseModel):
+    __slots__ = ('text', 'rating', 'place', 'user')
+
     def __init__(self, text, rating, place, user):
         super().__init__()
         self.text = text
         self.rating = rating
         self.place = place
         self.user = user
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
 
     def to_dict_with_ids(self):
-        """Convert instance to dictionary with owner_id instead of owner"""
-        place_dict = self.to_dict()
-        place_dict['place_id'] = self.place
-        place_dict.pop('place', None)
-        place_dict['user_id'] = self.user
-        place_dict.pop('user', None)
-        return place_dict
+        """Convert instance to dictionary with place_id and user_id instead
+        of place and user"""
+        return _to_dict_with_ids(self)
+
+    to_public_dict = to_dict_with_ids
+
+
+_to_dict_with_ids = compile_serializer(
+    Review, rename={'place': 'place_id', 'user': 'user_id'})
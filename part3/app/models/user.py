@@ -1,17 +1,16 @@
-from datetime import datetime
-from .base_model import BaseModel
+from .base_model import BaseModel, compile_serializer
 from app.utils.encryption import bcrypt
 
 
 class User(BaseModel):
+    __slots__ = ('first_name', 'last_name', 'email', 'is_admin', 'password')
+
     def __init__(self, first_name, last_name, email, password, is_admin=False):
         super().__init__()
         self.first_name = first_name
         self.last_name = last_name
         self.email = email
         self.is_admin = is_admin
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
         self.set_password(password)
 
     def set_password(self, password):
@@ -29,3 +28,10 @@ class User(BaseModel):
     def verify_password(self, password):
         # Verifies if the provided password matches the hashed password
         return bcrypt.check_password_hash(self.password, password)
+
+    def to_public_dict(self):
+        """Convert instance to dictionary, without the password hash"""
+        return _to_public_dict(self)
+
+
+_to_public_dict = compile_serializer(User, exclude=('password',))
@@ -0,0 +1,76 @@
+import os
+from app.persistence.concurrent import ConcurrentRepository
+
+# Config keys that, together with REPOSITORY, identify a storage backend
+BACKEND_SETTINGS = (
+    'SQLITE_DATABASE',
+    'DATA_DIRECTORY',
+    'WAL_COMMIT_DELAY',
+    'SNAPSHOT_EVERY',
+    'CACHE_SIZE',
+    'CACHE_TTL',
+    'SHARED_MEMORY_NAME',
+    'SHARED_MEMORY_SIZE',
+    'REMOTE_SOCKET',
+    'REMOTE_POOL_SIZE',
+)
+
+
+def backend_settings(config):
+    """Return the storage settings of config, to tell backends apart"""
+    backend = config.get('REPOSITORY', 'memory')
+    if backend == 'memory':
+        return (backend, config.get('SNAPSHOT_PATH'))
+    return (backend,) + tuple(config.get(key) for key in BACKEND_SETTINGS)
+
+
+def repository_factory(config):
+    """Return a callable building the repository of an entity table.
+
+    The backend is picked with the REPOSITORY config key:
+    'memory' (default), 'sqlite' (stored in SQLITE_DATABASE),
+    'durable' (in memory, logged to disk under DATA_DIRECTORY),
+    'shared' (in shared memory named SHARED_MEMORY_NAME, for every
+    worker process of the host) or 'remote' (served by a repository
+    server listening on REMOTE_SOCKET). With CACHE_SIZE set, the
+    objects of the 'sqlite' and 'durable' backends are cached by id
+    (see CachingRepository).
+    """
+    factory = _backend_factory(config)
+    cache_size = config.get('CACHE_SIZE')
+    # Memory and shared memory reads need no cache, and a cache of
+    # remote objects would miss the writes of the other workers
+    if not cache_size or config.get('REPOSITORY', 'memory') in (
+            'memory', 'shared', 'remote'):
+        return factory
+    from app.persistence.caching import CachingRepository
+    return lambda table: CachingRepository(
+        factory(table), cache_size, ttl=config.get('CACHE_TTL'))
+
+
+def _backend_factory(config):
+    backend = config.get('REPOSITORY', 'memory')
+    if backend == 'memory':
+        return lambda table: ConcurrentRepository()
+    if backend == 'sqlite':
+        from app.persistence.sqlite_repository import SQLiteRepository
+        database = config.get('SQLITE_DATABASE', 'hbnb.db')
+        return lambda table: SQLiteRepository(database, table)
+    if backend == 'durable':
+        from app.persistence.durable import DurableRepository
+        directory = config.get('DATA_DIRECTORY', 'data')
+        return lambda table: DurableRepository(
+            os.path.join(directory, table),
+            commit_delay=config.get('WAL_COMMIT_DELAY', 0.002),
+            snapshot_every=config.get('SNAPSHOT_EVERY', 100_000))
+    if backend == 'shared':
+        from app.persistence.shared import SharedMemoryRepository
+        name = config.get('SHARED_MEMORY_NAME', 'hbnb')
+        return lambda table: SharedMemoryRepository(
+            f'{name}-{table}', config.get('SHARED_MEMORY_SIZE', 64 << 20))
+    if backend == 'remote':
+        from app.persistence.remote import RemoteClient, RemoteRepository
+        client = RemoteClient(config.get('REMOTE_SOCKET', 'hbnb.sock'),
+                              config.get('REMOTE_POOL_SIZE', 4))
+        return lambda table: RemoteRepository(client, table)
+    raise ValueError(f"Unknown repository backend '{backend}'")
@@ -0,0 +1,103 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+
+class AsyncRepository(ABC):
+    """asyncio counterpart of Repository.
+
+    The calls mirror Repository's, as coroutines, so a backend doing
+    real I/O can serve many requests from one event loop.
+    """
+
+    @abstractmethod
+    async def add(self, obj):
+        pass
+
+    @abstractmethod
+    async def get(self, obj_id):
+        pass
+
+    @abstractmethod
+    async def get_all(self):
+        """Return a list of every object"""
+
+    @abstractmethod
+    async def update(self, obj_id, data):
+        """Return the attributes that changed; see Repository.update"""
+
+    @abstractmethod
+    async def delete(self, obj_id):
+        pass
+
+    @abstractmethod
+    async def get_by_attribute(self, attr_name, attr_value):
+        pass
+
+    @abstractmethod
+    async def find(self, where=None, order_by=None, limit=None, cursor=None):
+        """Return (objects, next_cursor); see Repository.find"""
+
+    async def get_all_by_attribute(self, attr_name, attr_value):
+        objs, _ = await self.find(where={attr_name: attr_value})
+        return objs
+
+    async def get_many(self, obj_ids):
+        """Return the objects of obj_ids (None if missing), fetched
+        concurrently
+        """
+        return list(await asyncio.gather(*map(self.get, obj_ids)))
+
+    async def page(self, cursor=None, limit=None):
+        return await self.find(limit=limit, cursor=cursor)
+
+
+class ThreadedAsyncRepository(AsyncRepository):
+    """AsyncRepository serving the calls of a synchronous Repository.
+
+    With offload, each call runs in the default executor's threads so
+    blocking backends (SQLite, fsyncs) do not stall the event loop;
+    without it, calls run inline, which suits in-memory backends whose
+    calls never block.
+    """
+
+    def __init__(self, repo, offload=True):
+        self.repo = repo
+        self.offload = offload
+
+    async def _call(self, func, *args, **kwargs):
+        if self.offload:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    async def add(self, obj):
+        await self._call(self.repo.add, obj)
+
+    async def get(self, obj_id):
+        return await self._call(self.repo.get, obj_id)
+
+    async def get_many(self, obj_ids):
+        return await self._call(self.repo.get_many, list(obj_ids))
+
+    async def get_all(self):
+        return await self._call(lambda: list(self.repo.get_all()))
+
+    async def update(self, obj_id, data):
+        return await self._call(self.repo.update, obj_id, data)
+
+    async def delete(self, obj_id):
+        return await self._call(self.repo.delete, obj_id)
+
+    async def get_by_attribute(self, attr_name, attr_value):
+        return await self._call(
+            self.repo.get_by_attribute, attr_name, attr_value)
+
+    async def get_all_by_attribute(self, attr_name, attr_value):
+        return await self._call(
+            self.repo.get_all_by_attribute, attr_name, attr_value)
+
+    async def find(self, where=None, order_by=None, limit=None, cursor=None):
+        return await self._call(
+            self.repo.find, where, order_by, limit, cursor)
+
+    async def page(self, cursor=None, limit=None):
+        return await self._call(self.repo.page, cursor, limit)
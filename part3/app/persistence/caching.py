@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import OrderedDict
+from app.persistence.forwarding import ForwardingRepository
+
+# Halves every byte, to age the frequency sketch's counters at once
+_HALVE = bytes(value >> 1 for value in range(256))
+
+
+class FrequencySketch:
+    """Count-min sketch of how often keys were accessed recently.
+
+    Each of the four rows of counters is indexed by 16 bits of the key's
+    hash, so rows hold at most 65536 counters. Counters saturate at 15
+    and are all halved every sample_size accesses, so keys that were
+    popular long ago lose their weight.
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, size):
+        width = 16
+        while width < 4 * size and width < 1 << 16:
+            width *= 2
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(4)]
+        self.sample_size = 10 * max(size, 1)
+        self._additions = 0
+
+    def _slots(self, key):
+        h = hash(key)
+        mask = self._mask
+        return h & mask, (h >> 16) & mask, (h >> 32) & mask, (h >> 48) & mask
+
+    def frequency(self, key):
+        a, b, c, d = self._slots(key)
+        r0, r1, r2, r3 = self._rows
+        return min(r0[a], r1[b], r2[c], r3[d])
+
+    def increment(self, key):
+        """Count an access, only raising the smallest counters of key"""
+        a, b, c, d = self._slots(key)
+        r0, r1, r2, r3 = self._rows
+        w, x, y, z = r0[a], r1[b], r2[c], r3[d]
+        least = min(w, x, y, z)
+        if least < self.MAX_COUNT:
+            if w == least:
+                r0[a] = least + 1
+            if x == least:
+                r1[b] = least + 1
+            if y == least:
+                r2[c] = least + 1
+            if z == least:
+                r3[d] = least + 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            for row in self._rows:
+                row[:] = row.translate(_HALVE)
+            self._additions //= 2
+
+
+class CachingRepository(ForwardingRepository):
+    """Cache of objects by id in front of another repository.
+
+    get and get_many are served from a bounded LRU cache. When it is full,
+    a missed object only replaces the least recently used one if it was
+    accessed more often recently (TinyLFU admission), so a burst of
+    one-off reads does not flush the popular objects. Entries expire
+    ttl seconds after they were cached, if ttl is set.
+
+    Writes go to the wrapped repository and then drop the objects they
+    touch from the cache, and a read started before a write does not
+    cache what it read. Every other call is answered by the wrapped
+    repository.
+    """
+
+    def __init__(self, repo, maxsize=10_000, ttl=None, clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        super().__init__(repo)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # obj_id -> (obj, expiry or None)
+        self._sketch = FrequencySketch(maxsize)
+        self._lock = threading.Lock()
+        self._epoch = 0  # incremented by every write
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.expirations = 0
+
+    def stats(self):
+        """Return the size and counters of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries),
+                    'maxsize': self.maxsize,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions,
+                    'rejections': self.rejections,
+                    'expirations': self.expirations}
+
+    # ----- Reads -----
+    def _cached(self, obj_id):
+        """Return the cached object, or None (called with the lock held)"""
+        self._sketch.increment(obj_id)
+        entry = self._entries.get(obj_id)
+        if entry is not None:
+            obj, expiry = entry
+            if expiry is None or expiry > self._clock():
+                self._entries.move_to_end(obj_id)
+                self.hits += 1
+                return obj
+            del self._entries[obj_id]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def _admits(self, obj_id, victim):
+        """Tell whether obj_id may replace victim in a full cache"""
+        return self._sketch.frequency(obj_id) > self._sketch.frequency(victim)
+
+    def _store(self, objs, epoch):
+        """Cache objects read while the write epoch was epoch"""
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            expiry = None if self.ttl is None else self._clock() + self.ttl
+            for obj in objs:
+                if obj.id in self._entries:
+                    continue
+                if len(self._entries) >= self.maxsize:
+                    victim = next(iter(self._entries))
+                    if not self._admits(obj.id, victim):
+                        self.rejections += 1
+                        continue
+                    del self._entries[victim]
+                    self.evictions += 1
+                self._entries[obj.id] = (obj, expiry)
+
+    def get(self, obj_id):
+        with self._lock:
+            obj = self._cached(obj_id)
+            epoch = self._epoch
+        if obj is None:
+            obj = self.repo.get(obj_id)
+            if obj is not None:
+                self._store([obj], epoch)
+        return obj
+
+    def get_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        with self._lock:
+            found = {}
+            for obj_id in obj_ids:
+                if obj_id not in found:
+                    found[obj_id] = self._cached(obj_id)
+            epoch = self._epoch
+        missing = [obj_id for obj_id, obj in found.items() if obj is None]
+        if missing:
+            loaded = [obj for obj in self.repo.get_many(missing)
+                      if obj is not None]
+            self._store(loaded, epoch)
+            found.update((obj.id, obj) for obj in loaded)
+        return [found[obj_id] for obj_id in obj_ids]
+
+    # ----- Writes -----
+    def invalidate(self, obj_ids=None):
+        """Drop objects (all of them by default) from the cache"""
+        with self._lock:
+            self._epoch += 1
+            if obj_ids is None:
+                self._entries.clear()
+                return
+            for obj_id in obj_ids:
+                self._entries.pop(obj_id, None)
+
+    def add(self, obj):
+        try:
+            self.repo.add(obj)
+        finally:
+            self.invalidate([obj.id])
+
+    def add_many(self, objs):
+        objs = list(objs)
+        try:
+            self.repo.add_many(objs)
+        finally:
+            self.invalidate([obj.id for obj in objs])
+
+    def add_if_absent(self, obj, attr_name):
+        try:
+            return self.repo.add_if_absent(obj, attr_name)
+        finally:
+            self.invalidate([obj.id])
+
+    def update(self, obj_id, data):
+        changed = None
+        try:
+            changed = self.repo.update(obj_id, data)
+            return changed
+        finally:
+            if changed != {}:  # updates changing nothing keep the entry
+                self.invalidate([obj_id])
+
+    def update_many(self, updates):
+        updates = list(updates)
+        changed = None
+        try:
+            changed = self.repo.update_many(updates)
+            return changed
+        finally:
+            if changed is None:
+                self.invalidate([obj_id for obj_id, _ in updates])
+            else:
+                self.invalidate([obj_id for obj_id, fields
+                                 in changed.items() if fields])
+
+    def delete(self, obj_id):
+        try:
+            return self.repo.delete(obj_id)
+        finally:
+            self.invalidate([obj_id])
+
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        try:
+            return self.repo.delete_many(obj_ids)
+        finally:
+            self.invalidate(obj_ids)
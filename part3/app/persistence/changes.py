@@ -0,0 +1,279 @@
+"""Change-data capture: an ordered log of the mutations of repositories.
+
+Wrapping a repository in a CapturingRepository appends a Change to a
+shared ChangeLog after every successful add, update and delete. The log
+keeps the latest changes in a ring buffer; subscribers receive them
+synchronously, or from a background thread through a ChangeConsumer.
+"""
+import threading
+import time
+from collections import namedtuple
+from app.persistence.forwarding import ForwardingRepository
+
+ADD = 'add'
+UPDATE = 'update'
+DELETE = 'delete'
+
+# fields names the updated attributes; it is None for adds and deletes,
+# and for updates made by another process sharing the data.
+# at is the time.time() of the change, and origin the writer, for logs
+# given a function naming it (see RepositoryServer).
+Change = namedtuple('Change', 'seq op entity id fields at origin',
+                    defaults=(None,))
+
+
+class ResyncRequired(ValueError):
+    """The changes asked for are no longer (or not) in the log"""
+
+
+class ChangeLog:
+    """Bounded ring buffer of changes, numbered from 1.
+
+    Once capacity changes are held, each new one overwrites the oldest;
+    with retention, changes older than retention seconds are not
+    returned either. Appending only holds the lock to number and store
+    the change; the writer then calls the synchronous subscribers, so
+    concurrent writers may call them out of sequence order.
+    """
+
+    def __init__(self, capacity=65536, retention=None, clock=time.time,
+                 origin=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.retention = retention
+        self._clock = clock
+        self._origin = origin
+        self._ring = [None] * capacity
+        self._last_seq = 0
+        self._subscribers = []
+        self._cond = threading.Condition()
+
+    @property
+    def last_seq(self):
+        """Sequence number of the latest change (0 before the first)"""
+        return self._last_seq
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest change still available"""
+        with self._cond:
+            return self._first_seq()
+
+    def _first_seq(self):
+        low = max(1, self._last_seq - self.capacity + 1)
+        if self.retention is None:
+            return low
+        # Changes are appended in time order: find the oldest recent one
+        cutoff = self._clock() - self.retention
+        high = self._last_seq + 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._ring[middle % self.capacity].at < cutoff:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def append(self, op, entity, obj_id, fields=None):
+        origin = self._origin() if self._origin is not None else None
+        with self._cond:
+            seq = self._last_seq + 1
+            change = Change(seq, op, entity, obj_id, fields, self._clock(),
+                            origin)
+            self._ring[seq % self.capacity] = change
+            self._last_seq = seq
+            self._cond.notify_all()
+            subscribers = self._subscribers
+        for callback in subscribers:
+            callback(change)
+        return change
+
+    def read(self, after=0, limit=None):
+        """Return the changes numbered after after, oldest first.
+
+        Raises ResyncRequired if some of them were already overwritten
+        or expired, or if after is ahead of the log (e.g. it was
+        numbered by an earlier process).
+        """
+        with self._cond:
+            return self._read(after, limit)
+
+    def _read(self, after, limit):
+        first_seq = self._first_seq()
+        if after > self._last_seq or after < first_seq - 1:
+            raise ResyncRequired(
+                f"Changes after {after} are not available; the log holds "
+                f"{first_seq} to {self._last_seq}")
+        end = self._last_seq
+        if limit is not None:
+            end = min(end, after + limit)
+        return [self._ring[seq % self.capacity]
+                for seq in range(after + 1, end + 1)]
+
+    def subscribe(self, callback):
+        """Call callback(change) for every change, as it is appended.
+
+        The writer waits for the callback, so it must be quick; slower
+        work belongs in a consumer thread (see consume).
+        """
+        with self._cond:
+            # Replaced rather than changed, as writers iterate it unlocked
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        with self._cond:
+            subscribers = list(self._subscribers)
+            subscribers.remove(callback)
+            self._subscribers = subscribers
+
+    def consume(self, callback, after=None, batch_size=256):
+        """Start a thread calling callback(change) for every change
+        after after (by default, from now on); returns its
+        ChangeConsumer
+        """
+        consumer = ChangeConsumer(
+            self, callback, self._last_seq if after is None else after,
+            batch_size)
+        consumer.start()
+        return consumer
+
+    def _wait(self, after, batch_size, stopped):
+        """Wait for changes after after; returns (changes, number of
+        changes overwritten before they were read)
+        """
+        with self._cond:
+            while self._last_seq <= after and not stopped():
+                self._cond.wait()
+            skipped = max(0, self._first_seq() - 1 - after)
+            return self._read(after + skipped, batch_size), skipped
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class ChangeConsumer(threading.Thread):
+    """Background thread delivering the changes of a log to a callback.
+
+    A consumer that falls more than the log's capacity (or retention)
+    behind loses the changes it missed; it then resumes from the oldest
+    change available and counts the lost ones in dropped. lag is how
+    many changes are waiting.
+    """
+
+    def __init__(self, log, callback, after, batch_size):
+        super().__init__(daemon=True)
+        self.log = log
+        self.callback = callback
+        self.position = after
+        self.batch_size = batch_size
+        self.delivered = 0
+        self.dropped = 0
+        self.max_lag = 0
+        self._stopped = False
+        self._idle = threading.Condition()
+
+    @property
+    def lag(self):
+        return self.log.last_seq - self.position
+
+    def stats(self):
+        """Return the back-pressure counters of the consumer"""
+        return {'position': self.position,
+                'lag': self.lag,
+                'max_lag': self.max_lag,
+                'delivered': self.delivered,
+                'dropped': self.dropped}
+
+    def run(self):
+        while not self._stopped:
+            self.max_lag = max(self.max_lag, self.lag)
+            changes, skipped = self.log._wait(
+                self.position, self.batch_size, lambda: self._stopped)
+            self.dropped += skipped
+            self.position += skipped
+            for change in changes:
+                self.callback(change)
+                self.position = change.seq
+                self.delivered += 1
+            with self._idle:
+                self._idle.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until every change appended so far was delivered"""
+        target = self.log.last_seq
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: self.position >= target or not self.is_alive(),
+                timeout)
+
+    def stop(self):
+        self._stopped = True
+        self.log._wake()
+        self.join()
+
+
+class CapturingRepository(ForwardingRepository):
+    """Repository appending a Change to a log after every write.
+
+    entity names the objects in the changes (e.g. 'places'). Changes
+    are appended once the wrapped repository applied the write, so two
+    concurrent writes of one object may be logged in either order; the
+    last change of an object always follows its last write.
+    """
+
+    def __init__(self, repo, log, entity):
+        super().__init__(repo)
+        self.log = log
+        self.entity = entity
+        repo.watch(self._watched)
+
+    def _watched(self, op, obj_id):
+        """Log a write of another process to the shared data"""
+        self.log.append(op, self.entity, obj_id)
+
+    def add(self, obj):
+        self.repo.add(obj)
+        self.log.append(ADD, self.entity, obj.id)
+
+    def add_many(self, objs):
+        objs = list(objs)
+        self.repo.add_many(objs)
+        for obj in objs:
+            self.log.append(ADD, self.entity, obj.id)
+
+    def add_if_absent(self, obj, attr_name):
+        existing = self.repo.add_if_absent(obj, attr_name)
+        if existing is None:
+            self.log.append(ADD, self.entity, obj.id)
+        return existing
+
+    def update(self, obj_id, data):
+        changed = self.repo.update(obj_id, data)
+        if changed:
+            self.log.append(UPDATE, self.entity, obj_id,
+                            tuple(sorted(changed)))
+        return changed
+
+    def update_many(self, updates):
+        changed = self.repo.update_many(updates)
+        for obj_id, fields in changed.items():
+            if fields:
+                self.log.append(UPDATE, self.entity, obj_id,
+                                tuple(sorted(fields)))
+        return changed
+
+    def delete(self, obj_id):
+        deleted = self.repo.delete(obj_id)
+        if deleted:
+            self.log.append(DELETE, self.entity, obj_id)
+        return deleted
+
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        removed = self.repo.delete_many(obj_ids)
+        for obj_id, was_removed in zip(obj_ids, removed):
+            if was_removed:
+                self.log.append(DELETE, self.entity, obj_id)
+        return removed
@@ -0,0 +1,95 @@
+import json
+import sys
+from datetime import datetime
+from app.models import User, Place, Review, Amenity
+from app.models.base_model import BaseModel
+
+# Model classes by name, used to rebuild objects from stored records
+MODELS = {cls.__name__: cls for cls in (User, Place, Review, Amenity)}
+
+DATETIME_FIELDS = ('created_at', 'updated_at')
+# Ids of other entities, repeated by many records, so interned
+REFERENCE_FIELDS = frozenset(('owner', 'place', 'user'))
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return to_record(value)
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '__model__' in value:
+        return from_record(value)
+    if isinstance(value, list):
+        # Empty lists are shared, as Place does
+        return [_decode_value(item) for item in value] if value else ()
+    return value
+
+
+def to_record(obj):
+    """Convert a model instance to a JSON-compatible dictionary"""
+    record = {'__model__': type(obj).__name__}
+    for key, value in obj.attributes().items():
+        record[key] = _encode_value(value)
+    return record
+
+
+def from_record(record):
+    """Rebuild a model instance from to_record() output.
+
+    __init__ is bypassed so that stored password hashes are kept as is.
+    """
+    cls = MODELS[record['__model__']]
+    obj = cls.__new__(cls)
+    timestamps = {}
+    for key, value in record.items():
+        if key == '__model__':
+            continue
+        if key in DATETIME_FIELDS and isinstance(value, str):
+            # Equal timestamps share one datetime, as after __init__
+            if value not in timestamps:
+                timestamps[value] = datetime.fromisoformat(value)
+            value = timestamps[value]
+        elif key in REFERENCE_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(obj, key, _decode_value(value))
+    return obj
+
+
+def encode_fields(fields):
+    """Serialize attribute values, e.g. the changes of an update, to
+    compact JSON bytes
+    """
+    return json.dumps(
+        {key: _encode_value(value) for key, value in fields.items()},
+        separators=(',', ':')).encode('utf-8')
+
+
+def decode_fields(data):
+    """Rebuild the attribute values serialized by encode_fields()"""
+    fields = {}
+    for key, value in json.loads(data).items():
+        if key in DATETIME_FIELDS and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        fields[key] = _decode_value(value)
+    return fields
+
+
+def dumps(obj):
+    """Serialize a model instance to a compact JSON string"""
+    return json.dumps(to_record(obj), separators=(',', ':'))
+
+
+def encode(obj):
+    """Serialize a model instance to compact JSON bytes"""
+    return dumps(obj).encode('utf-8')
+
+
+def decode(data):
+    """Rebuild a model instance from dumps() or encode() output"""
+    return from_record(json.loads(data))
@@ -0,0 +1,184 @@
+import threading
+import numpy as np
+from app.persistence.query import Eq, In, Near, Range, Within, EARTH_RADIUS_KM
+
+
+def _number(value):
+    """Return value as a float, None when it is missing or not a number"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColumnStore:
+    """Numeric attributes of the stored objects, as NumPy columns.
+
+    Each object has a row holding its attributes in contiguous float64
+    arrays (NaN for missing values), so range, bounding-box and distance
+    conditions are answered with vectorized masks instead of reading
+    every object. Deleted rows are tombstoned and reused only when the
+    columns are compacted.
+
+    Like GridIndex, it offers the maintenance calls of HashIndex, so
+    repositories keep it up to date on every write.
+    """
+
+    unique = False
+    # Compact once this share of the rows are tombstones
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, attrs, capacity=1024):
+        self.attrs = tuple(attrs)
+        self.attr_name = self.name = ','.join(self.attrs)
+        self._columns = {attr: np.full(capacity, np.nan)
+                         for attr in self.attrs}
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._ids = []  # row -> obj_id (None once deleted)
+        self._rows = {}  # obj_id -> row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, obj_id):
+        return obj_id in self._rows
+
+    def key_of(self, obj, data=None):
+        """Return the values of an object (None when missing), optionally
+        with pending changes
+        """
+        values = []
+        for attr in self.attrs:
+            if data is not None and attr in data:
+                value = data[attr]
+            else:
+                value = getattr(obj, attr, None)
+            values.append(_number(value))
+        return tuple(values)
+
+    def indexed_key(self, obj_id, obj):
+        """Return the values obj is currently stored with"""
+        with self._lock:
+            row = self._rows.get(obj_id)
+            if row is None:
+                return self.key_of(obj)
+            values = (float(self._columns[attr][row]) for attr in self.attrs)
+            return tuple(None if np.isnan(value) else value
+                         for value in values)
+
+    def check(self, obj_id, key):
+        """Columns hold any value"""
+
+    def insert(self, obj_id, key):
+        with self._lock:
+            row = self._rows.get(obj_id)
+            if row is None:
+                row = len(self._ids)
+                if row == len(self._alive):
+                    self._grow()
+                self._ids.append(obj_id)
+                self._rows[obj_id] = row
+                self._alive[row] = True
+            for attr, value in zip(self.attrs, key):
+                self._columns[attr][row] = np.nan if value is None else value
+
+    def remove(self, obj_id):
+        with self._lock:
+            row = self._rows.pop(obj_id, None)
+            if row is None:
+                return
+            self._alive[row] = False
+            self._ids[row] = None
+            if len(self._ids) - len(self._rows) > (
+                    len(self._ids) * self.COMPACT_RATIO):
+                self._compact()
+
+    def _grow(self):
+        capacity = 2 * len(self._alive)
+        for attr, column in self._columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[:len(column)] = column
+            self._columns[attr] = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+
+    def _compact(self):
+        """Move the live rows to the front, in row order"""
+        count = len(self._ids)
+        live = np.flatnonzero(self._alive[:count])
+        for attr, column in self._columns.items():
+            column[:len(live)] = column[live]
+            column[len(live):count] = np.nan
+        self._alive[:len(live)] = True
+        self._alive[len(live):count] = False
+        self._ids = [self._ids[row] for row in live]
+        self._rows = {obj_id: row for row, obj_id in enumerate(self._ids)}
+
+    def covers(self, attr_name, pred):
+        """Tell whether a find() condition can be answered from the
+        columns
+        """
+        if isinstance(pred, (Within, Near)):
+            return (isinstance(attr_name, tuple) and len(attr_name) == 2 and
+                    all(attr in self._columns for attr in attr_name))
+        if attr_name not in self._columns:
+            return False
+        if isinstance(pred, Eq):
+            values = [pred.value]
+        elif isinstance(pred, In):
+            values = pred.values
+        else:
+            values = [value for value in (pred.low, pred.high)
+                      if value is not None]
+        return all(isinstance(value, (int, float)) and
+                   not isinstance(value, bool) for value in values)
+
+    def select(self, conds):
+        """Return the ids of the objects satisfying covered conditions"""
+        with self._lock:
+            count = len(self._ids)
+            mask = self._alive[:count].copy()
+            for attr_name, pred in conds:
+                mask &= self._mask(attr_name, pred, count)
+            return [self._ids[row] for row in np.flatnonzero(mask)]
+
+    def _mask(self, attr_name, pred, count):
+        if isinstance(pred, (Within, Near)):
+            lat = self._columns[attr_name[0]][:count]
+            lon = self._columns[attr_name[1]][:count]
+            if isinstance(pred, Within):
+                min_lat, min_lon, max_lat, max_lon = pred.bbox
+                return ((lat >= min_lat) & (lat <= max_lat) &
+                        (lon >= min_lon) & (lon <= max_lon))
+            # Distances are only computed inside the circle's bounding box
+            min_lat, min_lon, max_lat, max_lon = pred.bbox()
+            mask = ((lat >= min_lat) & (lat <= max_lat) &
+                    (lon >= min_lon) & (lon <= max_lon))
+            rows = np.flatnonzero(mask)
+            mask[rows] = _distances(
+                lat[rows], lon[rows], pred.lat, pred.lon) <= pred.km
+            return mask
+        column = self._columns[attr_name][:count]
+        if isinstance(pred, Eq):
+            return column == pred.value
+        if isinstance(pred, In):
+            return np.isin(column, pred.values)
+        mask = ~np.isnan(column)
+        if pred.low is not None:
+            mask &= column >= pred.low
+        if pred.high is not None:
+            mask &= column <= pred.high
+        return mask
+
+
+def _distances(lat, lon, centre_lat, centre_lon):
+    """Haversine distances in km from a centre to arrays of points"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    centre_lat, centre_lon = np.radians(centre_lat), np.radians(centre_lon)
+    a = (np.sin((lat - centre_lat) / 2) ** 2 + np.cos(lat) *
+         np.cos(centre_lat) * np.sin((lon - centre_lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,143 @@
+import threading
+from contextlib import contextmanager
+from app.persistence.repository import InMemoryRepository
+
+
+class ConcurrentRepository(InMemoryRepository):
+    """InMemoryRepository that can be shared between threads.
+
+    Each mutation locks the stripes of the object id and of the index
+    keys it reads or writes, always in stripe order. Writers of unrelated
+    objects do not wait for each other, and a unique index check is atomic
+    with the insert that follows it (see add_if_absent). Reads take no
+    lock.
+    """
+
+    def __init__(self, stripes=64):
+        super().__init__()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    def _stripes_of(self, keys):
+        return sorted({hash(key) % len(self._stripes) for key in keys})
+
+    def _acquire(self, stripes):
+        for stripe in stripes:
+            self._stripes[stripe].acquire()
+
+    def _release(self, stripes):
+        for stripe in reversed(stripes):
+            self._stripes[stripe].release()
+
+    @contextmanager
+    def _locked(self, stripes):
+        self._acquire(stripes)
+        try:
+            yield
+        finally:
+            self._release(stripes)
+
+    def _lock_keys(self, obj_id, obj, data=None, new=True):
+        """Return the lock keys of a mutation of obj"""
+        keys = [('id', obj_id)]
+        for name, index in self._indexes.items():
+            keys.append((name, index.indexed_key(obj_id, obj)))
+            if new:
+                keys.append((name, index.key_of(obj, data)))
+        return keys
+
+    def _lock_stored(self, obj_id, data=None, new=True):
+        """Lock the stripes of a stored object.
+
+        Returns the object and the stripes held, or (None, []) if there is
+        no such object.
+        """
+        (obj,), stripes = self._lock_stored_many([(obj_id, data)], new)
+        if obj is None:
+            self._release(stripes)
+            return None, []
+        return obj, stripes
+
+    def _lock_stored_many(self, changes, new=True):
+        """Lock the stripes of the objects of several (obj_id, data).
+
+        Returns the objects (None if missing) and the stripes held. The
+        keys an object is indexed under only change while its id stripe
+        is held, so they are read again once locked; if they moved in
+        between, the locks are taken again.
+        """
+        while True:
+            objs = [self.get(obj_id) for obj_id, _ in changes]
+            keys = self._stored_keys(changes, objs, new)
+            stripes = self._stripes_of(keys)
+            self._acquire(stripes)
+            if (all(self.get(obj_id) is obj
+                    for (obj_id, _), obj in zip(changes, objs)) and
+                    self._stored_keys(changes, objs, new) == keys):
+                return objs, stripes
+            self._release(stripes)
+
+    def _stored_keys(self, changes, objs, new):
+        keys = []
+        for (obj_id, data), obj in zip(changes, objs):
+            if obj is None:
+                keys.append(('id', obj_id))
+            else:
+                keys.extend(self._lock_keys(obj_id, obj, data, new))
+        return keys
+
+    def add_index(self, attr_name, unique=False, normalize=None):
+        with self._locked(range(len(self._stripes))):
+            super().add_index(attr_name, unique=unique, normalize=normalize)
+
+    def add_spatial_index(self, lat_attr, lon_attr, cell_size=0.1):
+        with self._locked(range(len(self._stripes))):
+            super().add_spatial_index(lat_attr, lon_attr, cell_size)
+
+    def add_column_store(self, attrs):
+        with self._locked(range(len(self._stripes))):
+            super().add_column_store(attrs)
+
+    def add(self, obj):
+        with self._locked(self._stripes_of(self._lock_keys(obj.id, obj))):
+            super().add(obj)
+
+    def update(self, obj_id, data):
+        obj, stripes = self._lock_stored(obj_id, data)
+        if obj is None:
+            return None
+        try:
+            return super().update(obj_id, data)
+        finally:
+            self._release(stripes)
+
+    def delete(self, obj_id):
+        obj, stripes = self._lock_stored(obj_id, new=False)
+        if obj is None:
+            return False
+        try:
+            return super().delete(obj_id)
+        finally:
+            self._release(stripes)
+
+    def add_many(self, objs):
+        objs = list(objs)
+        keys = [key for obj in objs for key in self._lock_keys(obj.id, obj)]
+        with self._locked(self._stripes_of(keys)):
+            super().add_many(objs)
+
+    def update_many(self, updates):
+        updates = list(updates)
+        _, stripes = self._lock_stored_many(updates)
+        try:
+            return super().update_many(updates)
+        finally:
+            self._release(stripes)
+
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        _, stripes = self._lock_stored_many(
+            [(obj_id, None) for obj_id in obj_ids], new=False)
+        try:
+            return super().delete_many(obj_ids)
+        finally:
+            self._release(stripes)
@@ -0,0 +1,44 @@
+"""Opaque pagination cursors.
+
+A cursor encodes the position of the first object of a page: an
+insertion sequence number, a rowid or an offset, depending on the query.
+"""
+import base64
+import itertools
+
+
+def encode_cursor(position):
+    """Return the opaque cursor of a page starting at position"""
+    return base64.urlsafe_b64encode(
+        str(position).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the position a cursor points to (0 for no cursor)"""
+    if cursor is None:
+        return 0
+    try:
+        position = int(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)).decode('ascii'))
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+    if position < 0:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def page_of(items, limit):
+    """Cut a page from (position, obj) pairs in position order.
+
+    Returns the objects and the cursor of the next page, or None when
+    there is none. Only limit + 1 pairs are consumed.
+    """
+    if limit is None:
+        return [obj for _, obj in items], None
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    items = list(itertools.islice(items, limit + 1))
+    next_cursor = None
+    if len(items) > limit:
+        next_cursor = encode_cursor(items[limit][0])
+    return [obj for _, obj in items[:limit]], next_cursor
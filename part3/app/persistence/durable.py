@@ -0,0 +1,184 @@
+import copy
+import os
+import threading
+from app.persistence.codec import encode, decode, encode_fields, decode_fields
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import Snapshot, write_snapshot
+from app.persistence.wal import (
+    WriteAheadLog, read_records, OP_ADD, OP_DELETE, OP_PATCH)
+
+
+class DurableRepository(InMemoryRepository):
+    """In-memory repository made crash-safe by a write-ahead log.
+
+    Every add/update/delete is logged before the call returns, with
+    fsyncs shared between concurrent writers (see WriteAheadLog).
+    Updates log the attributes they changed, with the new updated_at,
+    rather than the whole object. The
+    *_many calls queue the records of a whole batch and wait once.
+    Every snapshot_every mutations the whole store is written to a
+    snapshot and the log it covers is dropped, so startup only maps the
+    snapshot (records are decoded lazily) and replays the mutations made
+    since.
+    """
+
+    def __init__(self, directory, commit_delay=0.002, snapshot_every=100_000):
+        super().__init__()
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._checkpointing = False
+        self._since_snapshot = 0
+        last_seq = self._recover()
+        self._wal = WriteAheadLog(
+            self._segment_path(last_seq + 1), commit_delay, last_seq)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, 'snapshot.bin')
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f'wal-{first_seq:020d}.log')
+
+    def _segments(self):
+        """Return the log files of the directory, oldest first"""
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.startswith('wal-') and name.endswith('.log'))
+
+    # ----- Recovery -----
+    def _load_snapshot(self):
+        """Map the snapshot into storage and return the sequence it covers"""
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        snapshot = Snapshot(self.snapshot_path)
+        self.load_snapshot(snapshot.sections['records'])
+        return snapshot.seq
+
+    def _patched(self, obj_id, fields):
+        """Return a copy of the stored object with fields set as is"""
+        obj = copy.copy(self._storage[obj_id])
+        for key, value in fields.items():
+            setattr(obj, key, value)
+        return obj
+
+    def _recover(self):
+        """Rebuild storage from the snapshot and the logs written after it"""
+        snapshot_seq = last_seq = self._load_snapshot()
+        for path in self._segments():
+            replayed = False
+            for seq, op, obj_id, payload in read_records(path):
+                replayed = True
+                if seq <= snapshot_seq:
+                    continue
+                if op == OP_DELETE:
+                    self._remove(obj_id)
+                elif op == OP_PATCH:
+                    self._put(self._patched(obj_id, decode_fields(payload)))
+                else:  # added, or updated by an older version
+                    self._put(decode(payload))
+                last_seq = max(last_seq, seq)
+            if not replayed:
+                os.remove(path)
+        self._since_snapshot = last_seq - snapshot_seq
+        return last_seq
+
+    # ----- Snapshots -----
+    def checkpoint(self):
+        """Write a snapshot of the store and drop the logs it covers"""
+        with self._checkpoint_lock:
+            with self._write_lock:
+                view = self.snapshot()
+                seq = self._wal.rotate(
+                    self._segment_path(self._wal.last_seq + 1))
+                self._since_snapshot = 0
+            write_snapshot(
+                self.snapshot_path,
+                {'records': (list(view), self._snapshot_indexes())}, seq)
+            for path in self._segments():
+                if path != self._wal.path:
+                    os.remove(path)
+            self._checkpointing = False
+
+    # ----- Logged mutations -----
+    def _log(self, op, obj_id, payload=b''):
+        """Queue a log record (called with the write lock held)"""
+        return self._log_many([(op, obj_id, payload)])
+
+    def _log_many(self, records):
+        """Queue (op, obj_id, payload) log records as one group"""
+        self._since_snapshot += len(records)
+        if (self.snapshot_every and not self._checkpointing and
+                self._since_snapshot >= self.snapshot_every):
+            self._checkpointing = True
+            threading.Thread(target=self.checkpoint, daemon=True).start()
+        return self._wal.enqueue_many(records)
+
+    def add(self, obj):
+        with self._wal.writer():
+            with self._write_lock:
+                super().add(obj)
+                seq = self._log(OP_ADD, obj.id, encode(obj))
+            self._wal.wait(seq)
+
+    def update(self, obj_id, data):
+        with self._wal.writer():
+            with self._write_lock:
+                changed = super().update(obj_id, data)
+                if not changed:
+                    return changed
+                seq = self._log(OP_PATCH, obj_id, self._patch(obj_id, changed))
+            self._wal.wait(seq)
+        return changed
+
+    def _patch(self, obj_id, changed):
+        """Encode the changes of an update and its new updated_at"""
+        obj = self._storage[obj_id]
+        return encode_fields({**changed, 'updated_at': obj.updated_at})
+
+    def delete(self, obj_id):
+        with self._wal.writer():
+            with self._write_lock:
+                if not super().delete(obj_id):
+                    return False
+                seq = self._log(OP_DELETE, obj_id)
+            self._wal.wait(seq)
+        return True
+
+    def add_many(self, objs):
+        objs = list(objs)
+        with self._wal.writer():
+            with self._write_lock:
+                super().add_many(objs)
+                seq = self._log_many(
+                    [(OP_ADD, obj.id, encode(obj)) for obj in objs])
+            self._wal.wait(seq)
+
+    def update_many(self, updates):
+        updates = list(updates)
+        with self._wal.writer():
+            with self._write_lock:
+                changed = super().update_many(updates)
+                seq = self._log_many([
+                    (OP_PATCH, obj_id, self._patch(obj_id, fields))
+                    for obj_id, fields in changed.items() if fields])
+            self._wal.wait(seq)
+        return changed
+
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        with self._wal.writer():
+            with self._write_lock:
+                removed = super().delete_many(obj_ids)
+                seq = self._log_many(
+                    [(OP_DELETE, obj_id, b'') for obj_id, was_removed
+                     in zip(obj_ids, removed) if was_removed])
+            self._wal.wait(seq)
+        return removed
+
+    def close(self):
+        """Flush and close the log"""
+        self._wal.close()
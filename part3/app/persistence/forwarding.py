@@ -0,0 +1,81 @@
+from app.persistence.repository import Repository
+
+
+class ForwardingRepository(Repository):
+    """Repository passing every call to another one.
+
+    Base of the wrappers that add behaviour around a backend (caching,
+    change capture); they override the calls they care about.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def __getattr__(self, name):
+        # Backend-specific calls (snapshots, close, checkpoint...)
+        if name == 'repo':
+            raise AttributeError(name)
+        return getattr(self.repo, name)
+
+    def add(self, obj):
+        self.repo.add(obj)
+
+    def add_many(self, objs):
+        self.repo.add_many(objs)
+
+    def add_if_absent(self, obj, attr_name):
+        return self.repo.add_if_absent(obj, attr_name)
+
+    def get(self, obj_id):
+        return self.repo.get(obj_id)
+
+    def get_many(self, obj_ids):
+        return self.repo.get_many(obj_ids)
+
+    def get_all(self):
+        return self.repo.get_all()
+
+    def refresh(self):
+        self.repo.refresh()
+
+    def watch(self, callback):
+        self.repo.watch(callback)
+
+    def page(self, cursor=None, limit=None):
+        return self.repo.page(cursor, limit)
+
+    def find(self, where=None, order_by=None, limit=None, cursor=None):
+        return self.repo.find(where, order_by, limit, cursor)
+
+    def explain(self, where=None, order_by=None, limit=None, cursor=None):
+        return self.repo.explain(where, order_by, limit, cursor)
+
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        return self.repo.within_bbox(bbox, cursor, limit)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        return self.repo.get_by_attribute(attr_name, attr_value)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        return self.repo.get_all_by_attribute(attr_name, attr_value)
+
+    def update(self, obj_id, data):
+        return self.repo.update(obj_id, data)
+
+    def update_many(self, updates):
+        return self.repo.update_many(updates)
+
+    def delete(self, obj_id):
+        return self.repo.delete(obj_id)
+
+    def delete_many(self, obj_ids):
+        return self.repo.delete_many(obj_ids)
+
+    def add_index(self, attr_name, unique=False, normalize=None):
+        self.repo.add_index(attr_name, unique=unique, normalize=normalize)
+
+    def add_spatial_index(self, lat_attr, lon_attr):
+        self.repo.add_spatial_index(lat_attr, lon_attr)
+
+    def add_column_store(self, attrs):
+        self.repo.add_column_store(attrs)
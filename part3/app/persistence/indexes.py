@@ -0,0 +1,134 @@
+_MISSING = object()
+
+
+def index_name(attr_name):
+    """Return the name of an index on one attribute or a tuple of them"""
+    if isinstance(attr_name, tuple):
+        return ','.join(attr_name)
+    return attr_name
+
+
+def value_of(obj, attr_name):
+    """Return obj's value of one attribute, or of a tuple of them"""
+    if isinstance(attr_name, tuple):
+        return tuple(getattr(obj, name, None) for name in attr_name)
+    return getattr(obj, attr_name, None)
+
+
+class HashIndex:
+    """Secondary index mapping an attribute value to the ids holding it.
+
+    attr_name may be a tuple of attributes for a composite index, keyed
+    by the tuple of their values; objects missing any of them are not
+    constrained by a unique composite index.
+
+    base is an optional SnapshotIndex holding the keys of the records of
+    a snapshot; entries made here override it for the same id.
+    """
+
+    def __init__(self, attr_name, unique=False, normalize=None, base=None):
+        self.attr_name = attr_name
+        self.name = index_name(attr_name)
+        # Attributes the keys are made of
+        self.attrs = attr_name if isinstance(attr_name, tuple) else (
+            attr_name,)
+        self.unique = unique
+        self.normalize = normalize
+        self._entries = {}  # key -> {obj_id: None}, kept in insertion order
+        self._keys = {}  # obj_id -> key it is currently indexed under
+        self._base = base
+        # Deleted ids of base records; the others stored since the base
+        # are in _keys, whose entries override theirs
+        self._shadowed = set()
+
+    def _normalized(self, value):
+        if self.normalize is not None and value is not None:
+            return self.normalize(value)
+        return value
+
+    def key_for(self, value):
+        """Return the key a value is stored under (e.g. case-folded)"""
+        if not isinstance(self.attr_name, tuple):
+            return self._normalized(value)
+        if value is None or None in value:
+            return None
+        return tuple(self._normalized(part) for part in value)
+
+    def key_of(self, obj, data=None):
+        """Return the key of an object, optionally with pending changes"""
+        if not isinstance(self.attr_name, tuple):
+            if data is not None and self.attr_name in data:
+                return self.key_for(data[self.attr_name])
+            return self.key_for(getattr(obj, self.attr_name, None))
+        value = value_of(obj, self.attr_name)
+        if data is not None:
+            value = tuple(data.get(name, part)
+                          for name, part in zip(self.attr_name, value))
+        return self.key_for(value)
+
+    def indexed_key(self, obj_id, obj):
+        """Return the key obj is currently indexed under"""
+        key = self._keys.get(obj_id, _MISSING)
+        return self.key_of(obj) if key is _MISSING else key
+
+    def check(self, obj_id, key):
+        """Raise ValueError if key is already taken by another object"""
+        if not self.unique or key is None:
+            return
+        ids = self._ids(key)
+        if ids and ids != [obj_id]:
+            raise ValueError(
+                f"Duplicate value for unique attribute '{self.name}'")
+
+    def insert(self, obj_id, key):
+        if self._keys.get(obj_id, _MISSING) == key:
+            return
+        self._unlink(obj_id)
+        self._entries.setdefault(key, {})[obj_id] = None
+        self._keys[obj_id] = key
+        self._shadowed.discard(obj_id)
+
+    def remove(self, obj_id):
+        self._unlink(obj_id)
+        if self._base is not None and self._base.holds(obj_id):
+            self._shadowed.add(obj_id)
+
+    def _unlink(self, obj_id):
+        key = self._keys.pop(obj_id, _MISSING)
+        if key is _MISSING:
+            return
+        ids = self._entries[key]
+        del ids[obj_id]
+        if not ids:
+            del self._entries[key]
+
+    def _ids(self, key):
+        ids = list(self._entries.get(key, ()))
+        if self._base is not None:
+            ids = [obj_id for obj_id in self._base.lookup(key)
+                   if obj_id not in self._keys and
+                   obj_id not in self._shadowed] + ids
+        return ids
+
+    def count(self, value):
+        """Return the number of ids indexed under value.
+
+        With a snapshot base, ids whose base entry is out of date may be
+        counted too, so this is an upper bound used for planning.
+        """
+        key = self.key_for(value)
+        count = len(self._entries.get(key, ()))
+        if self._base is not None:
+            count += self._base.count(key)
+        return count
+
+    def lookup(self, value):
+        """Return the ids indexed under value, oldest first"""
+        return self._ids(self.key_for(value))
+
+    def first(self, value):
+        """Return the first id indexed under value, or None"""
+        key = self.key_for(value)
+        if self._base is None:
+            return next(iter(self._entries.get(key, ())), None)
+        return next(iter(self._ids(key)), None)
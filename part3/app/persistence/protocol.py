@@ -0,0 +1,310 @@
+"""Binary protocol between RemoteRepository clients and the repository
+server.
+
+Messages are frames: FRAME (payload length, request id) + payload. A
+request payload is a list of calls, each (table, method, args, kwargs);
+its response, with the same request id, is the list of their
+(status, value) results. Clients may send several frames before
+reading the responses, which come back in order.
+
+Payloads are tagged values (little-endian):
+
+    N T F        None, True, False
+    i f          int64, float64
+    s y          UTF-8 string, bytes (uint32 length + data)
+    l t d        list, tuple, dict (uint32 count + items or key, value)
+    D            naive datetime (int64 microseconds since 1970-01-01)
+    o            model instance (class name + dict of its attributes)
+    p            find() predicate (class name + tuple of its arguments)
+"""
+import struct
+from datetime import datetime, timedelta
+from app.persistence.codec import MODELS
+from app.persistence.query import Eq, In, Range, Within, Near
+
+FRAME = struct.Struct('<II')
+# Frames above this size are refused, rather than read into memory
+MAX_FRAME = 64 << 20
+
+OK = 0
+INVALID = 1  # ValueError, raised again by the client
+ERROR = 2  # any other exception
+
+_LENGTH = struct.Struct('<I')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Predicate classes, and the constructor arguments of an instance
+PREDICATES = {
+    'Eq': (Eq, lambda pred: (pred.value,)),
+    'In': (In, lambda pred: (pred.values,)),
+    'Range': (Range, lambda pred: (pred.low, pred.high)),
+    'Within': (Within, lambda pred: (pred.bbox,)),
+    'Near': (Near, lambda pred: (pred.lat, pred.lon, pred.km)),
+}
+_PREDICATE_NAMES = {cls: name for name, (cls, _) in PREDICATES.items()}
+
+
+class MalformedFrame(ValueError):
+    """A frame whose payload cannot be decoded. The frames after it can
+    still be read.
+    """
+
+    def __init__(self, request_id, message):
+        super().__init__(message)
+        self.request_id = request_id
+
+
+def _encode_int(value, out):
+    try:
+        out += b'i' + _INT.pack(value)
+    except struct.error:
+        raise ValueError(f"{value} does not fit in 64 bits") from None
+
+
+def _encode_str(value, out):
+    data = value.encode('utf-8')
+    out += b's' + _LENGTH.pack(len(data)) + data
+
+
+def _encode_bytes(value, out):
+    out += b'y' + _LENGTH.pack(len(value)) + value
+
+
+def _encode_items(tag):
+    def encode_items(value, out):
+        out += tag + _LENGTH.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    return encode_items
+
+
+def _encode_dict(value, out):
+    out += b'd' + _LENGTH.pack(len(value))
+    for key, item in value.items():
+        _encode(key, out)
+        _encode(item, out)
+
+
+# Encoded attribute names, as every instance repeats them
+_NAMES = {}
+
+
+def _encode_model(value, out):
+    attributes = value.attributes()
+    out += _MODEL_TAGS[type(value)] + _LENGTH.pack(len(attributes))
+    for key, item in attributes.items():
+        name = _NAMES.get(key)
+        if name is None:
+            name = bytearray()
+            _encode_str(key, name)
+            name = _NAMES[key] = bytes(name)
+        out += name
+        _encode(item, out)
+
+
+def _encode_predicate(value, out):
+    name = _PREDICATE_NAMES[type(value)]
+    out += b'p'
+    _encode_str(name, out)
+    _encode(PREDICATES[name][1](value), out)
+
+
+# Encoders by exact type, as isinstance() chains are slow
+_ENCODERS = {
+    type(None): lambda value, out: out.extend(b'N'),
+    bool: lambda value, out: out.extend(b'T' if value else b'F'),
+    int: _encode_int,
+    float: lambda value, out: out.extend(b'f' + _FLOAT.pack(value)),
+    str: _encode_str,
+    bytes: _encode_bytes,
+    bytearray: _encode_bytes,
+    list: _encode_items(b'l'),
+    tuple: _encode_items(b't'),
+    dict: _encode_dict,
+    datetime: lambda value, out: out.extend(
+        b'D' + _INT.pack((value - _EPOCH) // _MICROSECOND)),
+}
+_ENCODERS.update({cls: _encode_model for cls in MODELS.values()})
+# 'o', the class name and the tag of the attributes dict
+_MODEL_TAGS = {
+    cls: b'os' + _LENGTH.pack(len(name)) + name.encode('utf-8') + b'd'
+    for name, cls in MODELS.items()}
+_ENCODERS.update({cls: _encode_predicate for cls in _PREDICATE_NAMES})
+
+
+def _encode(value, out):
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        raise ValueError(f"Cannot encode {type(value).__name__} values")
+    encoder(value, out)
+
+
+def dumps(value):
+    """Encode a value into bytes"""
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+# Decoders by tag; each takes (data, offset) after the tag and returns
+# (value, offset after the value)
+def _decode_length(data, offset):
+    return _LENGTH.unpack_from(data, offset)[0], offset + _LENGTH.size
+
+
+def _decode_str(data, offset):
+    length, offset = _decode_length(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated value")
+    return data[offset:end].decode('utf-8'), end
+
+
+def _decode_bytes(data, offset):
+    length, offset = _decode_length(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated value")
+    return data[offset:end], end
+
+
+def _decode_list(data, offset):
+    count, offset = _decode_length(data, offset)
+    items = []
+    for _ in range(count):
+        item, offset = _decode(data, offset)
+        items.append(item)
+    return items, offset
+
+
+def _decode_tuple(data, offset):
+    items, offset = _decode_list(data, offset)
+    return tuple(items), offset
+
+
+def _decode_dict(data, offset):
+    count, offset = _decode_length(data, offset)
+    items = {}
+    for _ in range(count):
+        key, offset = _decode(data, offset)
+        items[key], offset = _decode(data, offset)
+    return items, offset
+
+
+# Decoded attribute names, shared by the instances
+_KEYS = {}
+_MAX_KEYS = 1024
+
+
+def _decode_model(data, offset):
+    name, offset = _decode(data, offset)
+    if data[offset] != 0x64:  # d
+        raise ValueError("Model attributes must be a dict")
+    count, offset = _decode_length(data, offset + 1)
+    attributes = {}
+    for _ in range(count):
+        length, start = _decode_length(data, offset + 1)
+        end = start + length
+        raw = data[start:end]
+        key = _KEYS.get(raw)
+        if key is None:
+            if data[offset] != 0x73 or end > len(data):  # s
+                raise ValueError("Model attribute names must be strings")
+            key = raw.decode('utf-8')
+            if len(_KEYS) < _MAX_KEYS:
+                _KEYS[raw] = key
+        attributes[key], offset = _decode(data, end)
+    created = attributes.get('created_at')
+    if created is not None and attributes.get('updated_at') == created:
+        # Equal timestamps share one datetime, as after __init__
+        attributes['updated_at'] = created
+    cls = MODELS[name]
+    for key in attributes:
+        if key not in cls.FIELDS:
+            raise ValueError(f"{name} has no attribute '{key}'")
+    # __init__ is bypassed, like in codec.from_record
+    obj = cls.__new__(cls)
+    for key, value in attributes.items():
+        setattr(obj, key, value)
+    return obj, offset
+
+
+def _decode_predicate(data, offset):
+    name, offset = _decode(data, offset)
+    args, offset = _decode(data, offset)
+    return PREDICATES[name][0](*args), offset
+
+
+def _decode_struct(fmt, convert=None):
+    def decode(data, offset):
+        value = fmt.unpack_from(data, offset)[0]
+        if convert is not None:
+            value = convert(value)
+        return value, offset + fmt.size
+    return decode
+
+
+_DECODERS = {
+    ord('N'): lambda data, offset: (None, offset),
+    ord('T'): lambda data, offset: (True, offset),
+    ord('F'): lambda data, offset: (False, offset),
+    ord('i'): _decode_struct(_INT),
+    ord('f'): _decode_struct(_FLOAT),
+    ord('s'): _decode_str,
+    ord('y'): _decode_bytes,
+    ord('l'): _decode_list,
+    ord('t'): _decode_tuple,
+    ord('d'): _decode_dict,
+    ord('D'): _decode_struct(
+        _INT, lambda micros: _EPOCH + micros * _MICROSECOND),
+    ord('o'): _decode_model,
+    ord('p'): _decode_predicate,
+}
+
+
+def _decode(data, offset):
+    decoder = _DECODERS.get(data[offset])
+    if decoder is None:
+        raise ValueError(f"Unknown value tag {data[offset]:#x}")
+    return decoder(data, offset + 1)
+
+
+def loads(data):
+    """Decode a value encoded by dumps()"""
+    try:
+        value, _ = _decode(bytes(data), 0)
+    except (struct.error, KeyError, IndexError, TypeError) as exc:
+        raise ValueError(f"Malformed value: {exc}") from None
+    return value
+
+
+def pack_frame(request_id, value):
+    """Encode value as the payload of a frame"""
+    payload = dumps(value)
+    return FRAME.pack(len(payload), request_id) + payload
+
+
+def read_frame(stream):
+    """Read a frame from a binary file; returns (request_id, value), or
+    None at the end of the stream.
+
+    Raises MalformedFrame if the payload cannot be decoded.
+    """
+    header = stream.read(FRAME.size)
+    if not header:
+        return None
+    if len(header) < FRAME.size:
+        raise ConnectionError("Connection closed in the middle of a frame")
+    length, request_id = FRAME.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ConnectionError("Connection closed in the middle of a frame")
+    try:
+        return request_id, loads(payload)
+    except ValueError as exc:
+        raise MalformedFrame(request_id, str(exc)) from None
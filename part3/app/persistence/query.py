@@ -0,0 +1,171 @@
+"""Predicates of Repository.find() and helpers shared by its planners.
+
+A where clause maps an attribute (or a tuple of attributes) to a
+predicate; plain values mean equality:
+
+    repo.find(where={'owner': owner_id, 'price': Range(high=100)})
+    repo.find(where={('latitude', 'longitude'): Within(bbox)})
+"""
+import itertools
+import math
+from app.persistence.cursors import decode_cursor, page_of
+from app.persistence.indexes import value_of
+
+
+def _same(value):
+    return value
+
+
+class Eq:
+    """Attribute equals value"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def test(self, normalize=_same):
+        target = normalize(self.value)
+        return lambda value: value == target
+
+    def __repr__(self):
+        return f'= {self.value!r}'
+
+
+class In:
+    """Attribute equals one of values"""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def test(self, normalize=_same):
+        targets = [normalize(value) for value in self.values]
+        return lambda value: value in targets
+
+    def __repr__(self):
+        return f'IN {self.values!r}'
+
+
+class Range:
+    """Attribute between low and high, both included (either optional)"""
+
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+
+    def test(self, normalize=_same):
+        low = None if self.low is None else normalize(self.low)
+        high = None if self.high is None else normalize(self.high)
+        return lambda value: (value is not None and
+                              (low is None or value >= low) and
+                              (high is None or value <= high))
+
+    def __repr__(self):
+        return f'BETWEEN {self.low!r} AND {self.high!r}'
+
+
+class Within:
+    """(latitude, longitude) attributes inside a bounding box"""
+
+    def __init__(self, bbox):
+        self.bbox = tuple(bbox)
+
+    def test(self, normalize=_same):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return lambda point: (point is not None and None not in point and
+                              min_lat <= point[0] <= max_lat and
+                              min_lon <= point[1] <= max_lon)
+
+    def __repr__(self):
+        return f'WITHIN {self.bbox!r}'
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Return the great-circle (haversine) distance between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) *
+         math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class Near:
+    """(latitude, longitude) attributes within km of a point"""
+
+    def __init__(self, lat, lon, km):
+        self.lat = lat
+        self.lon = lon
+        self.km = km
+
+    def bbox(self):
+        """Return a (min_lat, min_lon, max_lat, max_lon) box holding the
+        circle (all longitudes when it reaches a pole or the antimeridian)
+        """
+        degrees = math.degrees(self.km / EARTH_RADIUS_KM)
+        min_lat, max_lat = self.lat - degrees, self.lat + degrees
+        if min_lat <= -90 or max_lat >= 90:
+            return max(min_lat, -90), -180, min(max_lat, 90), 180
+        spread = degrees / math.cos(math.radians(self.lat))
+        if self.lon - spread < -180 or self.lon + spread > 180:
+            return min_lat, -180, max_lat, 180
+        return min_lat, self.lon - spread, max_lat, self.lon + spread
+
+    def test(self, normalize=_same):
+        return lambda point: (point is not None and None not in point and
+                              distance_km(self.lat, self.lon, *point) <=
+                              self.km)
+
+    def __repr__(self):
+        return f'NEAR ({self.lat!r}, {self.lon!r}) {self.km!r} km'
+
+
+PREDICATES = (Eq, In, Range, Within, Near)
+
+
+def predicate(condition):
+    """Return condition as a predicate; plain values mean equality"""
+    return condition if isinstance(condition, PREDICATES) else Eq(condition)
+
+
+def conditions(where):
+    """Return the (attr_name, predicate) pairs of a where clause"""
+    return [(attr_name, predicate(condition))
+            for attr_name, condition in (where or {}).items()]
+
+
+def matcher(conditions):
+    """Return a function telling whether an object satisfies conditions,
+    comparing raw attribute values
+    """
+    tests = [(attr_name, pred.test()) for attr_name, pred in conditions]
+    return lambda obj: all(test(value_of(obj, attr_name))
+                           for attr_name, test in tests)
+
+
+def parse_order(order_by):
+    """Split 'attr' / '-attr' into (attr, descending)"""
+    if order_by.startswith('-'):
+        return order_by[1:], True
+    return order_by, False
+
+
+def sort_items(items, order_by):
+    """Sort (position, obj) pairs on an attribute, None values last.
+
+    The sort is stable, so ties stay in position order.
+    """
+    attr_name, descending = parse_order(order_by)
+    present, missing = [], []
+    for item in items:
+        value = value_of(item[1], attr_name)
+        (missing if value is None else present).append((value, item))
+    present.sort(key=lambda entry: entry[0], reverse=descending)
+    return [item for _, item in present] + [item for _, item in missing]
+
+
+def offset_page(items, cursor, limit):
+    """Page through a sorted list of (position, obj) by offset"""
+    start = decode_cursor(cursor)
+    return page_of(
+        itertools.islice(enumerate(obj for _, obj in items), start, None),
+        limit)
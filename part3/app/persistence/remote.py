@@ -0,0 +1,406 @@
+"""Repository server process, and the RemoteRepository talking to it.
+
+The server keeps the repositories of every table in one process and
+serves the API workers over a Unix domain socket (see protocol.py for
+the frames). Run it with:
+
+    python -m app.persistence.remote --socket hbnb.sock
+
+Each client connection is served by a thread, so the backend must be
+thread-safe, like the default ConcurrentRepository. Every write is
+appended to the server's ChangeLog, from which clients fetch the writes
+of the other workers (see RemoteRepository.refresh).
+"""
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+import uuid
+from contextlib import contextmanager
+from app.persistence.changes import (
+    ChangeLog, CapturingRepository, ResyncRequired)
+from app.persistence.concurrent import ConcurrentRepository
+from app.persistence.protocol import (
+    OK, INVALID, ERROR, MalformedFrame, pack_frame, read_frame)
+from app.persistence.repository import Repository
+
+# Repository calls a client may make
+METHODS = frozenset((
+    'add', 'add_many', 'add_if_absent', 'get', 'get_many', 'get_all',
+    'page', 'find', 'explain', 'within_bbox', 'get_by_attribute',
+    'get_all_by_attribute', 'update', 'update_many', 'delete',
+    'delete_many', 'add_index', 'add_spatial_index', 'add_column_store'))
+DECLARATIONS = frozenset(('add_index', 'add_spatial_index',
+                          'add_column_store'))
+# Index normalizations, which are sent by name
+NORMALIZERS = {'casefold': str.casefold, 'lower': str.lower}
+_NORMALIZER_NAMES = {func: name for name, func in NORMALIZERS.items()}
+
+
+class RemoteError(RuntimeError):
+    """The server failed to run a call"""
+
+
+class RepositoryServer(socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+    """Serve the repositories built by factory(table) on a Unix socket.
+
+    Indexes declared again by another client (every worker declares the
+    same ones at startup) are only built once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, factory=None, log_capacity=65536):
+        self.factory = factory or (lambda table: ConcurrentRepository())
+        self._caller = threading.local()
+        # Changes are marked with the client that made them
+        self.changes = ChangeLog(log_capacity, origin=lambda: getattr(
+            self._caller, 'client', None))
+        self.repositories = {}
+        self._declared = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)  # left by a server that did not shut down
+        super().__init__(path, _ConnectionHandler)
+
+    def repository(self, table):
+        with self._lock:
+            repo = self.repositories.get(table)
+            if repo is None:
+                repo = self.repositories[table] = CapturingRepository(
+                    self.factory(table), self.changes, table)
+            return repo
+
+    def hello(self, client):
+        """Start a connection of client; returns the last change"""
+        self._caller.client = client
+        return self.changes.last_seq
+
+    def changes_since(self, after, client):
+        """Return (last_seq, changes) with the (op, table, id) of the
+        changes after after that other clients made.
+
+        A client that fell more than the log's capacity behind skips the
+        changes it missed.
+        """
+        try:
+            changes = self.changes.read(after)
+        except ResyncRequired:
+            return self.changes.last_seq, []
+        last_seq = changes[-1].seq if changes else after
+        return last_seq, [
+            (change.op, change.entity, change.id) for change in changes
+            if change.origin != client]
+
+    def call(self, table, method, args, kwargs):
+        if table == '' and method == 'hello':
+            return self.hello(*args)
+        if table == '' and method == 'changes':
+            return self.changes_since(*args)
+        if table == '' or method not in METHODS:
+            raise ValueError(f"Unknown repository method '{method}'")
+        repo = self.repository(table)
+        if method in DECLARATIONS:
+            if 'normalize' in kwargs and kwargs['normalize'] is not None:
+                kwargs['normalize'] = NORMALIZERS[kwargs['normalize']]
+            key = (table, method, args, tuple(sorted(kwargs.items())))
+            with self._lock:
+                if key not in self._declared:
+                    getattr(repo, method)(*args, **kwargs)
+                    self._declared.add(key)
+            return None
+        result = getattr(repo, method)(*args, **kwargs)
+        return list(result) if method == 'get_all' else result
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """Answer the frames of one connection, in order"""
+
+    wbufsize = -1  # responses are flushed once written
+
+    def _run(self, calls):
+        """Run the calls of a frame; returns their (status, value)"""
+        results = []
+        for table, method, args, kwargs in calls:
+            try:
+                results.append((OK, self.server.call(
+                    table, method, tuple(args), kwargs)))
+            except ValueError as exc:
+                results.append((INVALID, str(exc)))
+            except Exception as exc:
+                results.append((ERROR, f"{type(exc).__name__}: {exc}"))
+        return results
+
+    def handle(self):
+        while True:
+            try:
+                frame = read_frame(self.rfile)
+            except MalformedFrame as exc:
+                # Refused as a whole; the connection stays usable
+                results = [(INVALID, str(exc))]
+                request_id = exc.request_id
+            except (ValueError, ConnectionError):
+                return
+            else:
+                if frame is None:
+                    return
+                request_id, calls = frame
+                results = self._run(calls)
+            self.wfile.write(pack_frame(request_id, results))
+            self.wfile.flush()
+
+
+class _Connection:
+    def __init__(self, path, client, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.stream = self.sock.makefile('rb')
+        self._next_id = 0
+        self.last_seq = self.request([('', 'hello', (client,), {})])[0]
+
+    # Frames sent ahead of their responses. Bounded, so that neither
+    # side blocks writing to a full socket while the other does too.
+    WINDOW = 8
+
+    def _send(self, batch):
+        self.sock.sendall(pack_frame(self._next_id & 0xffffffff, batch))
+        self._next_id += 1
+
+    def _receive(self, request_id, results):
+        frame = read_frame(self.stream)
+        if frame is None or frame[0] != request_id & 0xffffffff:
+            raise ConnectionError("Unexpected response from the server")
+        for status, value in frame[1]:
+            if status == INVALID:
+                value = ValueError(value)
+            elif status == ERROR:
+                value = RemoteError(value)
+            results.append(value)
+
+    def request_many(self, batches):
+        """Send the batches of calls as pipelined frames and return the
+        results of every call, in order (exceptions for failed calls)
+        """
+        first = self._next_id
+        results = []
+        for n, batch in enumerate(batches):
+            if n >= self.WINDOW:
+                self._receive(first + n - self.WINDOW, results)
+            self._send(batch)
+        for request_id in range(max(first, self._next_id - self.WINDOW),
+                                self._next_id):
+            self._receive(request_id, results)
+        return results
+
+    def request(self, calls):
+        results = self.request_many([calls])
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+class RemoteClient:
+    """Pool of up to pool_size connections to a RepositoryServer.
+
+    Threads borrow a connection per call; once pool_size are in use,
+    the others wait for one to be returned.
+    """
+
+    def __init__(self, path, pool_size=4, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self.client_id = uuid.uuid4().hex
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._watchers = {}  # table -> callbacks
+        self._position = None
+        self._refresh_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = _Connection(self.path, self.client_id, self.timeout)
+                if self._position is None:
+                    self._position = conn.last_seq
+            broken = False
+            try:
+                yield conn
+            except OSError:
+                broken = True
+                conn.close()  # the stream may be out of step
+                raise
+            finally:
+                if not broken:
+                    self._idle.put(conn)
+
+    def call(self, table, method, *args, **kwargs):
+        with self.connection() as conn:
+            return conn.request([(table, method, args, kwargs)])[0]
+
+    def call_many(self, calls, batch_size=64):
+        """Run (table, method, args, kwargs) calls, pipelined.
+
+        The calls are sent as frames of batch_size calls without waiting
+        for the responses. Returns their results in order; if some
+        failed, raises the first error once all were answered.
+        """
+        calls = list(calls)
+        batches = [calls[i:i + batch_size]
+                   for i in range(0, len(calls), batch_size)]
+        with self.connection() as conn:
+            results = conn.request_many(batches)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def watch(self, table, callback):
+        self._watchers.setdefault(table, []).append(callback)
+
+    def refresh(self):
+        """Report the writes of other clients since the last refresh to
+        the watchers of their tables
+        """
+        with self._refresh_lock:
+            if self._position is None:
+                with self.connection():
+                    pass  # connecting sets the position
+            self._position, changes = self.call(
+                '', 'changes', self._position, self.client_id)
+        for op, table, obj_id in changes:
+            for callback in self._watchers.get(table, ()):
+                callback(op, obj_id)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemoteRepository(Repository):
+    """Repository whose calls are run by a RepositoryServer.
+
+    Objects are copies: update them with update(), as with SQLite.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+
+    def _call(self, method, *args, **kwargs):
+        return self.client.call(self.table, method, *args, **kwargs)
+
+    def add(self, obj):
+        self._call('add', obj)
+
+    def add_many(self, objs):
+        self._call('add_many', list(objs))
+
+    def add_if_absent(self, obj, attr_name):
+        return self._call('add_if_absent', obj, attr_name)
+
+    def get(self, obj_id):
+        return self._call('get', obj_id)
+
+    def get_many(self, obj_ids):
+        return self._call('get_many', list(obj_ids))
+
+    def get_all(self):
+        return self._call('get_all')
+
+    def page(self, cursor=None, limit=None):
+        return tuple(self._call('page', cursor, limit))
+
+    def find(self, where=None, order_by=None, limit=None, cursor=None):
+        return tuple(self._call('find', where, order_by, limit, cursor))
+
+    def explain(self, where=None, order_by=None, limit=None, cursor=None):
+        return self._call('explain', where, order_by, limit, cursor)
+
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        return tuple(self._call('within_bbox', tuple(bbox), cursor, limit))
+
+    def get_by_attribute(self, attr_name, attr_value):
+        return self._call('get_by_attribute', attr_name, attr_value)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        return self._call('get_all_by_attribute', attr_name, attr_value)
+
+    def update(self, obj_id, data):
+        return self._call('update', obj_id, data)
+
+    def update_many(self, updates):
+        return self._call(
+            'update_many', [tuple(update) for update in updates])
+
+    def delete(self, obj_id):
+        return self._call('delete', obj_id)
+
+    def delete_many(self, obj_ids):
+        return self._call('delete_many', list(obj_ids))
+
+    def add_index(self, attr_name, unique=False, normalize=None):
+        if normalize is not None and normalize not in _NORMALIZER_NAMES:
+            raise ValueError(
+                f"Normalization {normalize!r} cannot be sent to the server")
+        self._call('add_index', attr_name, unique=unique,
+                   normalize=_NORMALIZER_NAMES.get(normalize))
+
+    def add_spatial_index(self, lat_attr, lon_attr):
+        self._call('add_spatial_index', lat_attr, lon_attr)
+
+    def add_column_store(self, attrs):
+        self._call('add_column_store', tuple(attrs))
+
+    def refresh(self):
+        self.client.refresh()
+
+    def watch(self, callback):
+        self.client.watch(self.table, callback)
+
+
+def main():
+    from config import Config
+    from app.persistence import repository_factory
+    parser = argparse.ArgumentParser(
+        description="Serve the HBnB repositories on a Unix socket")
+    parser.add_argument('--socket', default=Config.REMOTE_SOCKET)
+    parser.add_argument('--repository', default='memory',
+                        choices=('memory', 'sqlite', 'durable'),
+                        help='backend of the served repositories')
+    args = parser.parse_args()
+    config = {key: getattr(Config, key) for key in dir(Config)
+              if key.isupper()}
+    config['REPOSITORY'] = args.repository
+    server = RepositoryServer(args.socket, repository_factory(config))
+    print(f"Serving {args.repository} repositories on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,14 @@
+import copy
+import itertools
+import threading
 from abc import ABC, abstractmethod
+from app.persistence.cursors import decode_cursor, page_of
+from app.persistence.indexes import HashIndex, index_name, value_of
+from app.persistence.query import (
+    In, Eq, Within, conditions, matcher, offset_page, sort_items)
+from app.persistence.snapshot import SnapshotStorage
+from app.persistence.spatial import GridIndex
+from app.persistence.versioned import DELETED, RadixMap, RepositoryView
 
 
 class Repository(ABC):
@@ -16,7 +26,12 @@ class Repository(ABC):
 
     @abstractmethod
     def update(self, obj_id, data):
-        pass
+        """Apply the attribute values of data to the object with obj_id.
+
+        Returns the attributes that changed, by name (see
+        BaseModel.changes), or None when no object has obj_id. Updates
+        changing nothing write nothing.
+        """
 
     @abstractmethod
     def delete(self, obj_id):
@@ -26,32 +41,667 @@ class Repository(ABC):
     def get_by_attribute(self, attr_name, attr_value):
         pass
 
+    @abstractmethod
+    def get_all_by_attribute(self, attr_name, attr_value):
+        """Return every object whose attr_name equals attr_value, oldest
+        first
+        """
+
+    @abstractmethod
+    def add_index(self, attr_name, unique=False, normalize=None):
+        pass
+
+    @abstractmethod
+    def add_spatial_index(self, lat_attr, lon_attr):
+        pass
+
+    def add_column_store(self, attrs):
+        """Keep numeric attrs in columns for vectorized find() filters.
+
+        An optimization only: backends without a columnar store (like
+        SQLite, which filters on its indexes) ignore it.
+        """
+
+    @abstractmethod
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        """Return a page of the objects inside bbox, in insertion order.
+
+        bbox is (min_lat, min_lon, max_lat, max_lon), bounds included;
+        a spatial index must have been declared. Returns (objects,
+        next_cursor) like page().
+        """
+
+    def find(self, where=None, order_by=None, limit=None, cursor=None):
+        """Return a page of the objects satisfying where.
+
+        where maps attributes to values or predicates (see query.py).
+        Objects come in insertion order, or sorted on order_by ('attr',
+        or '-attr' for descending, None values last). Returns (objects,
+        next_cursor) like page().
+        """
+        return self._run(where, order_by, limit, cursor)[:2]
+
+    def explain(self, where=None, order_by=None, limit=None, cursor=None):
+        """Run a find() and describe how it was answered.
+
+        Returns a dict with the plan, the indexes used and how many
+        index entries and rows were read.
+        """
+        objects, _, plan = self._run(where, order_by, limit, cursor)
+        plan['returned'] = len(objects)
+        return plan
+
+    def _run(self, where, order_by, limit, cursor):
+        """Answer a find() by scanning get_all(); returns (objects,
+        next_cursor, plan)
+        """
+        test = matcher(conditions(where))
+        plan = {'plan': 'scan', 'indexes': [], 'index_entries': 0,
+                'rows_examined': 0}
+        items = []
+        for position, obj in enumerate(self.get_all()):
+            plan['rows_examined'] += 1
+            if test(obj):
+                items.append((position, obj))
+        if order_by is not None:
+            items = sort_items(items, order_by)
+        return offset_page(items, cursor, limit) + (plan,)
+
+    def refresh(self):
+        """Catch up with the writes of other processes.
+
+        Only backends whose data is shared by processes but read from a
+        local copy need it; the others read the latest data anyway.
+        """
+
+    def watch(self, callback):
+        """Call callback(op, obj_id) for the writes of other processes
+        to the shared data, as refresh() applies them
+        """
+
+    def page(self, cursor=None, limit=None):
+        """Return up to limit objects from cursor, in insertion order.
+
+        Returns (objects, next_cursor); next_cursor is None on the last
+        page. This default skips the objects before the cursor; backends
+        override it to seek to the cursor instead.
+        """
+        start = decode_cursor(cursor)
+        return page_of(
+            itertools.islice(enumerate(self.get_all()), start, None), limit)
+
+    # Batch operations. These defaults loop over the single-object calls;
+    # backends override them to apply a batch under one lock or in one
+    # transaction.
+    def add_many(self, objs):
+        """Add several objects"""
+        for obj in objs:
+            self.add(obj)
+
+    def get_many(self, obj_ids):
+        """Return the objects of several ids, in order (None if missing)"""
+        return [self.get(obj_id) for obj_id in obj_ids]
+
+    def update_many(self, updates):
+        """Apply several (obj_id, data) updates; returns the attributes
+        that changed of each object updated, by id
+        """
+        changed = {}
+        for obj_id, data in updates:
+            fields = self.update(obj_id, data)
+            if fields is not None:
+                changed[obj_id] = {**changed.get(obj_id, {}), **fields}
+        return changed
+
+    def delete_many(self, obj_ids):
+        """Delete several objects; return whether each one existed"""
+        return [self.delete(obj_id) for obj_id in obj_ids]
+
+    def add_if_absent(self, obj, attr_name):
+        """Add obj unless an object with the same attr_name value exists.
+
+        attr_name may be a tuple of attributes. Returns the existing
+        object, or None once obj is added. This is atomic when attr_name
+        has a unique index.
+        """
+        value = value_of(obj, attr_name)
+        existing = self.get_by_attribute(attr_name, value)
+        if existing is not None:
+            return existing
+        try:
+            self.add(obj)
+        except ValueError:
+            existing = self.get_by_attribute(attr_name, value)
+            if existing is None:
+                raise
+            return existing
+        return None
+
 
 class InMemoryRepository(Repository):
+    """Repository keeping objects in process memory.
+
+    Besides the id -> object dict used for point reads, every committed
+    write publishes a new immutable version (see versioned.py): get_all()
+    returns an O(1) view of the current version that iterates lazily and
+    is not affected by later writes. Updates replace the stored object
+    with an updated copy, so a view never sees a half-applied update.
+
+    Insertion sequence numbers are the internal integer keys of the
+    objects: the views are keyed on them, and cursors hold them. As ids
+    are time-ordered (see models/ids.py), sequence order is normally id
+    order too, and order_by='id' or '-id' is then a range scan.
+    """
+
     def __init__(self):
         self._storage = {}
+        self._indexes = {}
+        self._spatial = None
+        self._columns = None
+        # Indexes the records of a loaded snapshot are not scanned into yet
+        self._unfilled = []
+        self._snapshot = None
+        self._seqs = {}  # obj_id -> insertion sequence number
+        self._entries = RadixMap()  # seq -> object, for the views
+        self._next_seq = 0
+        self._count = 0
+        # Whether sequence order is id order (None: not checked yet), and
+        # the id of the last object inserted
+        self._ids_ordered = True
+        self._last_id = None
+        self._commit_lock = threading.Lock()
+
+    def load_snapshot(self, section):
+        """Serve the records of a snapshot section, decoded on first use.
+
+        Must be called before any object is added or index declared.
+        """
+        self._storage = SnapshotStorage(section)
+        self._snapshot = section
+        self._next_seq = self._count = section.count
+        self._ids_ordered = None
+
+    def snapshot(self):
+        """Return a consistent view of the current version"""
+        with self._commit_lock:
+            return RepositoryView(
+                self._entries, self._count, self._storage,
+                self._snapshot.count if self._snapshot else 0)
+
+    def snapshot_section(self):
+        """Return the (objects, indexes) to write to a snapshot"""
+        return list(self.snapshot()), self._snapshot_indexes()
+
+    def _snapshot_indexes(self):
+        """Return the indexes whose keys are stored in snapshots"""
+        return [index for index in self._indexes.values()
+                if isinstance(index, HashIndex)]
+
+    def _seq_of(self, obj_id):
+        seq = self._seqs.get(obj_id)
+        if (seq is None and self._snapshot is not None and
+                obj_id in self._storage):
+            seq = self._snapshot.find(obj_id)
+        return seq
+
+    def _ids_in_seq_order(self):
+        """Return whether sequence order is also id order; checked once
+        after a snapshot is loaded, from the ids of its records
+        """
+        with self._commit_lock:
+            if self._ids_ordered is None:
+                ids = itertools.chain(
+                    (self._snapshot.record_id(recno)
+                     for recno in range(self._snapshot.count)),
+                    (obj.id for _, obj in
+                     self._entries.items(self._snapshot.count)))
+                last = None
+                self._ids_ordered = True
+                for obj_id in ids:
+                    if last is not None and obj_id <= last:
+                        self._ids_ordered = False
+                        break
+                    last = obj_id
+                self._last_id = last
+            return self._ids_ordered
+
+    def _put(self, obj):
+        """Store obj and publish a new version, without index checks"""
+        self._put_many([obj])
+
+    def _put_many(self, objs):
+        """Store objs and publish them as one new version"""
+        with self._commit_lock:
+            entries = self._entries
+            for obj in objs:
+                seq = self._seq_of(obj.id)
+                if seq is None:
+                    seq = self._seqs[obj.id] = self._next_seq
+                    self._next_seq += 1
+                    self._count += 1
+                    if self._ids_ordered:
+                        if self._last_id is not None and (
+                                obj.id <= self._last_id):
+                            self._ids_ordered = False
+                        self._last_id = obj.id
+                self._storage[obj.id] = obj
+                entries = entries.set(seq, obj)
+            self._entries = entries
+
+    def _remove(self, obj_id):
+        """Remove an object and publish a new version, if it is stored"""
+        return self._remove_many([obj_id])[0]
+
+    def _remove_many(self, obj_ids):
+        """Remove objects and publish one new version.
+
+        Returns whether each object was stored.
+        """
+        removed = []
+        with self._commit_lock:
+            entries = self._entries
+            for obj_id in obj_ids:
+                seq = self._seq_of(obj_id)
+                removed.append(seq is not None)
+                if seq is None:
+                    continue
+                del self._storage[obj_id]
+                self._seqs.pop(obj_id, None)
+                self._count -= 1
+                if self._snapshot is not None and seq < self._snapshot.count:
+                    entries = entries.set(seq, DELETED)
+                else:
+                    entries = entries.delete(seq)
+            self._entries = entries
+        return removed
+
+    def add_index(self, attr_name, unique=False, normalize=None):
+        """Declare a secondary index used by get_by_attribute.
+
+        With unique=True, add/update raise ValueError on duplicates.
+        normalize is applied to stored and looked up values alike
+        (e.g. str.casefold for case-insensitive emails).
+        """
+        base = None
+        if self._snapshot is not None:
+            base = self._snapshot.indexes.get(index_name(attr_name))
+            if base is not None and base.unique != unique:
+                base = None
+        index = HashIndex(
+            attr_name, unique=unique, normalize=normalize, base=base)
+        if base is not None:
+            # Keys of the snapshot records are read from the snapshot
+            for obj_id in self._storage.deleted():
+                index.remove(obj_id)
+            objects = self._storage.overrides()
+        else:
+            objects = self._storage.items()
+        for obj_id, obj in objects:
+            key = index.key_of(obj)
+            index.check(obj_id, key)
+            index.insert(obj_id, key)
+        self._indexes[attr_name] = index
+
+    def _fill(self, index):
+        """Insert the keys of the stored objects that index does not hold.
+
+        Without a snapshot, this reads the objects in memory. Otherwise,
+        it would decode every record, so it waits until the first query
+        of the index (see _filled); writes keep the index up to date in
+        the meantime.
+        """
+        if self._snapshot is not None:
+            self._unfilled.append(index)
+            return
+        for obj_id, obj in self._storage.items():
+            index.insert(obj_id, index.key_of(obj))
+
+    def _filled(self, index):
+        """Return index, once the snapshot records are inserted into it"""
+        if index in self._unfilled:
+            # Objects are stored before their keys are inserted, so a
+            # write concurrent with the scan is inserted after it
+            with self._commit_lock:
+                if index in self._unfilled:
+                    for obj_id, obj in self._storage.items():
+                        if obj_id not in index:
+                            index.insert(obj_id, index.key_of(obj))
+                    self._unfilled.remove(index)
+        return index
+
+    def add_spatial_index(self, lat_attr, lon_attr, cell_size=0.1):
+        """Declare a grid index of coordinates, used by within_bbox.
+
+        cell_size is the side of a grid cell in degrees. The records of
+        a loaded snapshot are only decoded into it by its first query.
+        """
+        index = GridIndex(lat_attr, lon_attr, cell_size)
+        self._fill(index)
+        self._indexes[index.attr_name] = index
+        self._spatial = index
+
+    def add_column_store(self, attrs):
+        """Declare a NumPy column store of numeric attrs (see columnar.py).
+
+        find() then answers range, In, bounding-box and Near conditions on
+        them with vectorized masks. Like the grid of add_spatial_index,
+        it is only filled with the records of a loaded snapshot by its
+        first query.
+        """
+        from app.persistence.columnar import ColumnStore
+        store = ColumnStore(attrs)
+        self._fill(store)
+        self._indexes[store.attr_name] = store
+        self._columns = store
+
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        if self._spatial is None:
+            raise ValueError("No spatial index declared")
+        start = decode_cursor(cursor)
+        items = []
+        for obj_id in self._filled(self._spatial).within(*bbox):
+            seq = self._seq_of(obj_id)
+            obj = self._storage.get(obj_id)
+            if seq is not None and seq >= start and obj is not None:
+                items.append((seq, obj))
+        items.sort(key=lambda item: item[0])
+        return page_of(items, limit)
+
+    # ----- Queries -----
+    # A further index is intersected with the candidates only if it holds
+    # at most this many times as many ids; otherwise its condition is
+    # checked on the candidate objects
+    INTERSECT_RATIO = 8
+    # Rows a column store filters in the time a candidate row is checked
+    VECTOR_SPEEDUP = 64
+
+    def _matcher(self, conds):
+        """Return a test of conditions, comparing values under the
+        normalization of their index (e.g. case-folded emails)
+        """
+        tests = []
+        for attr_name, pred in conds:
+            index = self._indexes.get(attr_name)
+            if isinstance(index, HashIndex):
+                tests.append((index.key_of, pred.test(index.key_for)))
+            else:
+                tests.append((
+                    lambda obj, attr_name=attr_name: value_of(obj, attr_name),
+                    pred.test()))
+        return lambda obj: all(test(key_of(obj)) for key_of, test in tests)
+
+    def _access_paths(self, conds):
+        """Return the ways indexes can answer conditions, cheapest first.
+
+        Each path is (estimated cost in rows, index name, fetch the ids);
+        'id' stands for the primary key. The column store answers all
+        the conditions it covers at once, at a fraction of a scan.
+        """
+        paths = []
+        equal = {attr_name: pred.value
+                 for attr_name, pred in conds if isinstance(pred, Eq)}
+        for attr_name, pred in conds:
+            index = self._indexes.get(attr_name)
+            if isinstance(pred, (Eq, In)):
+                values = [pred.value] if isinstance(pred, Eq) else pred.values
+                if attr_name == 'id':
+                    paths.append((len(values), 'id', lambda values=values: [
+                        obj_id for obj_id in dict.fromkeys(values)
+                        if obj_id in self._storage]))
+                elif isinstance(index, HashIndex):
+                    paths.append((
+                        sum(index.count(value) for value in values),
+                        index.name,
+                        lambda index=index, values=values: list(dict.fromkeys(
+                            obj_id for value in values
+                            for obj_id in index.lookup(value)))))
+            elif (isinstance(pred, Within) and self._spatial is not None and
+                  attr_name == (self._spatial.lat_attr,
+                                self._spatial.lon_attr)):
+                ids = self._filled(self._spatial).within(*pred.bbox)
+                paths.append((len(ids), self._spatial.name,
+                              lambda ids=ids: ids))
+        if self._columns is not None:
+            covered = [(attr_name, pred) for attr_name, pred in conds
+                       if self._columns.covers(attr_name, pred)]
+            if covered:
+                columns = self._filled(self._columns)
+                paths.append((len(columns) // self.VECTOR_SPEEDUP,
+                              columns.name,
+                              lambda: columns.select(covered)))
+        # Composite indexes whose attributes all have equality conditions
+        for attr_name, index in self._indexes.items():
+            if (isinstance(attr_name, tuple) and attr_name not in equal and
+                    all(name in equal for name in attr_name)):
+                value = tuple(equal[name] for name in attr_name)
+                paths.append((index.count(value), index.name,
+                              lambda index=index, value=value:
+                              index.lookup(value)))
+        paths.sort(key=lambda path: path[0])
+        return paths
+
+    def _candidates(self, paths, plan):
+        """Read the cheapest path, then intersect it with the paths that
+        are not much bigger (a single candidate is cheaper to check)
+        """
+        _, name, fetch = paths[0]
+        ids = fetch()
+        plan.update(plan='index', indexes=[name], index_entries=len(ids))
+        for estimate, name, fetch in paths[1:]:
+            if len(ids) < 2 or estimate > len(ids) * self.INTERSECT_RATIO:
+                break
+            other = set(fetch())
+            plan['plan'] = 'intersect'
+            plan['indexes'].append(name)
+            plan['index_entries'] += len(other)
+            ids = [obj_id for obj_id in ids if obj_id in other]
+        return ids
+
+    @staticmethod
+    def _scan(items, test, plan):
+        for seq, obj in items:
+            plan['rows_examined'] += 1
+            if test(obj):
+                yield seq, obj
+
+    def _run(self, where, order_by, limit, cursor):
+        """Answer a find() from the most selective indexes, scanning the
+        current version only when no index applies.
+
+        Cursors are insertion sequence numbers in insertion order, and
+        offsets with order_by. Ordering on id reads the objects in (or
+        against) insertion order when it is id order, rather than
+        sorting them: a page then reads only the rows up to its end.
+        """
+        conds = conditions(where)
+        test = self._matcher(conds)
+        paths = self._access_paths(conds)
+        plan = {'plan': 'scan', 'indexes': [], 'index_entries': 0,
+                'rows_examined': 0}
+        by_seq = order_by in ('id', '-id') and self._ids_in_seq_order()
+        if order_by is not None:
+            plan['order'] = 'seq' if by_seq else 'sort'
+        start = decode_cursor(cursor) if order_by is None else 0
+        if not paths:
+            view = self.snapshot()
+            items = self._scan(
+                view.reversed_items() if order_by == '-id' and by_seq
+                else view.items(start), test, plan)
+            if order_by is None:
+                return page_of(items, limit) + (plan,)
+            if by_seq:
+                return offset_page(items, cursor, limit) + (plan,)
+            items = list(items)
+        else:
+            items = []
+            for obj_id in self._candidates(paths, plan):
+                obj = self._storage.get(obj_id)
+                seq = self._seq_of(obj_id)
+                if obj is None or seq is None or seq < start:
+                    continue
+                plan['rows_examined'] += 1
+                if test(obj):
+                    items.append((seq, obj))
+            items.sort(key=lambda item: item[0])
+            if order_by is None:
+                return page_of(items, limit) + (plan,)
+            if by_seq:
+                if order_by == '-id':
+                    items.reverse()
+                return offset_page(items, cursor, limit) + (plan,)
+        return offset_page(sort_items(items, order_by), cursor, limit) + (
+            plan,)
+
+    def _check_indexes(self, obj_id, obj, data=None):
+        """Check the keys of obj, with the changes of data, against the
+        indexes (only those of the attributes in data, if given)
+        """
+        keys = []
+        for index in self._indexes.values():
+            if data is not None and data.keys().isdisjoint(index.attrs):
+                continue
+            key = index.key_of(obj, data)
+            index.check(obj_id, key)
+            keys.append((index, key))
+        return keys
+
+    def _check_batch(self, changes):
+        """Check the index keys of several (obj_id, obj, data) changes.
+
+        Unique keys are also checked against the other changes of the
+        batch. Returns the keys of each change.
+        """
+        keys = []
+        claimed = {}  # (attr_name, key) -> id of the change taking it
+        for obj_id, obj, data in changes:
+            change_keys = self._check_indexes(obj_id, obj, data)
+            for index, key in change_keys:
+                if not index.unique or key is None:
+                    continue
+                owner = claimed.setdefault((index.name, key), obj_id)
+                if owner != obj_id:
+                    raise ValueError(
+                        f"Duplicate value for unique attribute '{index.name}'")
+            keys.append(change_keys)
+        return keys
 
     def add(self, obj):
-        self._storage[obj.id] = obj
+        keys = self._check_indexes(obj.id, obj)
+        self._put(obj)
+        for index, key in keys:
+            index.insert(obj.id, key)
+
+    def add_many(self, objs):
+        """Add objects as one version; none is added if one is rejected"""
+        objs = list(objs)
+        keys = self._check_batch([(obj.id, obj, None) for obj in objs])
+        self._put_many(objs)
+        for obj, obj_keys in zip(objs, keys):
+            for index, key in obj_keys:
+                index.insert(obj.id, key)
 
     def get(self, obj_id):
         return self._storage.get(obj_id)
 
+    def get_many(self, obj_ids):
+        return [self._storage.get(obj_id) for obj_id in obj_ids]
+
     def get_all(self):
-        return list(self._storage.values())
+        return self.snapshot()
+
+    def page(self, cursor=None, limit=None):
+        """Return a page of objects; cursors are insertion sequence
+        numbers, so a page costs O(limit + log n).
+        """
+        return page_of(self.snapshot().items(decode_cursor(cursor)), limit)
+
+    @staticmethod
+    def _updated(obj, changed):
+        """Return an updated copy of obj; changed is a changes() result"""
+        updated = copy.copy(obj)
+        updated.update(changed)
+        return updated
 
     def update(self, obj_id, data):
         obj = self.get(obj_id)
-        if obj:
-            obj.update(data)
+        if obj is None:
+            return None
+        changed = obj.changes(data)
+        if changed:
+            self._check_indexes(obj_id, obj, changed)
+            self._replace(self._updated(obj, changed), changed)
+        return changed
+
+    def _replace(self, obj, changed=None):
+        """Store obj in place of the object with its id, and re-key it in
+        the indexes of the attributes changed (all of them by default)
+        """
+        self._put(obj)
+        self._rekey(obj, changed)
+
+    def _rekey(self, obj, changed=None):
+        for index in self._indexes.values():
+            if changed is None or not changed.keys().isdisjoint(
+                    index.attrs):
+                index.insert(obj.id, index.key_of(obj))
+
+    @staticmethod
+    def _merged(updates):
+        """Merge (obj_id, data) updates into one change per id, in order"""
+        merged = {}
+        for obj_id, data in updates:
+            merged[obj_id] = {**merged.get(obj_id, {}), **data}
+        return merged
+
+    def update_many(self, updates):
+        """Apply updates as one version; none is applied if one is
+        rejected. Ids that are not stored are skipped.
+        """
+        changed = {}
+        changes = []
+        for obj_id, data in self._merged(updates).items():
+            obj = self.get(obj_id)
+            if obj is not None:
+                fields = changed[obj_id] = obj.changes(data)
+                if fields:
+                    changes.append((obj_id, obj, fields))
+        self._check_batch(changes)
+        updated = [(self._updated(obj, fields), fields)
+                   for _, obj, fields in changes]
+        self._put_many([obj for obj, _ in updated])
+        for obj, fields in updated:
+            self._rekey(obj, fields)
+        return changed
 
     def delete(self, obj_id):
-        if obj_id in self._storage:
-            del self._storage[obj_id]
+        if self._remove(obj_id):
+            for index in self._indexes.values():
+                index.remove(obj_id)
             return True
         return False
 
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        removed = self._remove_many(obj_ids)
+        for obj_id, was_removed in zip(obj_ids, removed):
+            if was_removed:
+                for index in self._indexes.values():
+                    index.remove(obj_id)
+        return removed
+
     def get_by_attribute(self, attr_name, attr_value):
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            obj_id = index.first(attr_value)
+            return self._storage.get(obj_id) if obj_id is not None else None
         return next(
-            (obj for obj in self._storage.values() if getattr(
-                obj, attr_name) == attr_value), None)
+            (obj for obj in self.snapshot()
+             if value_of(obj, attr_name) == attr_value), None)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            objs = map(self._storage.get, index.lookup(attr_value))
+            return [obj for obj in objs if obj is not None]
+        return [obj for obj in self.snapshot()
+                if value_of(obj, attr_name) == attr_value]
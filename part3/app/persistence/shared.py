@@ -0,0 +1,403 @@
+"""Repository shared by the processes of a host through shared memory.
+
+Layout (native byte order, as segments never leave their host):
+
+    control segment   <name>: magic, version, current generation
+    data segment      <name>.<generation>: header (magic, end of the
+                      records, successor generation or 0, end of the
+                      compacted records, next insertion sequence number)
+                      then RECORD header (length, op, sequence number,
+                      id) + encoded object, for every write
+
+Every process keeps a decoded replica of the records (a plain
+InMemoryRepository with its indexes), so reads are local memory
+accesses; before a read, a process compares the end of the records with
+what it applied and replays the new ones. Writes take an exclusive lock
+on a file shared by the processes, so there is one writer at a time: it
+catches up, applies the write to its replica (which checks the unique
+indexes against the latest data), appends the records and then
+publishes their end. A full segment is compacted into the next
+generation, holding one record per live object.
+"""
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from app.persistence.changes import ADD, DELETE, UPDATE
+from app.persistence.codec import encode, decode
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import ID_WIDTH, _fixed, _text
+from app.persistence.wal import OP_ADD, OP_UPDATE, OP_DELETE
+
+MAGIC = b'HBNBSHM1'
+VERSION = 1
+
+CONTROL = struct.Struct('=8sHQ')
+# magic, end of records, successor generation, end of the compacted
+# records, next insertion sequence number
+DATA_HEADER = struct.Struct('=8sQQQQ')
+# Words of DATA_HEADER, read and written through a memoryview
+END, SUCCESSOR, BASE = 1, 2, 3
+# payload length, operation, insertion sequence number, object id
+RECORD = struct.Struct(f'=IBQ{ID_WIDTH}s')
+
+CHANGES = {OP_ADD: ADD, OP_UPDATE: UPDATE, OP_DELETE: DELETE}
+
+
+def _untrack(segment):
+    # Segments outlive the processes using them: only unlink() removes
+    # them, not the exit of the process that created them
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _attach(name):
+    return _untrack(shared_memory.SharedMemory(name))
+
+
+def _create(name, size):
+    try:
+        return _untrack(shared_memory.SharedMemory(name, True, size))
+    except FileExistsError:
+        # Left behind by a process that crashed while compacting
+        _unlink(name)
+        return _untrack(shared_memory.SharedMemory(name, True, size))
+
+
+def _unlink(name):
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    segment.unlink()  # also unregisters the segment
+    segment.close()
+
+
+def _header(segment):
+    """Return the words of the header of a data segment"""
+    return segment.buf[:DATA_HEADER.size].cast('Q')
+
+
+def _pack(op, seq, obj_id, payload=b''):
+    return RECORD.pack(len(payload), op, seq, _fixed(obj_id, ID_WIDTH)) + \
+        payload
+
+
+def _records(buffer, start, end):
+    """Yield (op, seq, obj_id, payload) for the records in [start, end)"""
+    while start < end:
+        length, op, seq, obj_id = RECORD.unpack_from(buffer, start)
+        start += RECORD.size
+        yield op, seq, _text(obj_id), bytes(buffer[start:start + length])
+        start += length
+
+
+class SharedMemoryRepository(InMemoryRepository):
+    """In-memory repository whose data is shared by every process
+    opening the same name (e.g. prefork web workers).
+
+    Indexes are declared per process, like with InMemoryRepository.
+    capacity is the initial size of a data segment in bytes; pages of
+    shared memory are only allocated as records are written. lock_path
+    is the file whose lock serializes the writers (by default in the
+    temporary directory).
+    """
+
+    def __init__(self, name, capacity=64 << 20, lock_path=None):
+        super().__init__()
+        self.name = name
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._watchers = []
+        self._lock_file = open(lock_path or os.path.join(
+            tempfile.gettempdir(), f'{name}.lock'), 'ab')
+        with self._exclusive():
+            try:
+                self._control = _attach(name)
+            except FileNotFoundError:
+                self._control = _create(name, CONTROL.size)
+                self._start_generation(1, b'', 0)
+            magic, version, generation = CONTROL.unpack_from(
+                self._control.buf)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"'{name}' is not a shared repository")
+            self._segment = self._header = self._retired = None
+            self._resync()
+
+    def _segment_name(self, generation):
+        return f'{self.name}.{generation}'
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the write lock of the threads and processes"""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _start_generation(self, generation, records, next_seq):
+        """Write a data segment holding records and make it current"""
+        end = DATA_HEADER.size + len(records)
+        segment = _create(self._segment_name(generation),
+                          max(self.capacity, 2 * end))
+        segment.buf[DATA_HEADER.size:end] = records
+        DATA_HEADER.pack_into(segment.buf, 0, MAGIC, end, 0, end, next_seq)
+        CONTROL.pack_into(self._control.buf, 0, MAGIC, VERSION, generation)
+        return segment, end
+
+    def _use(self, segment, generation, position):
+        """Make segment the current data segment.
+
+        The previous one is only closed at the next switch, as reader
+        threads may still be checking its header.
+        """
+        if self._retired is not None:
+            self._close(*self._retired)
+        if self._segment is not None:
+            self._retired = (self._segment, self._header)
+        self._segment, self._header = segment, _header(segment)
+        self._generation, self._position = generation, position
+
+    @staticmethod
+    def _close(segment, header):
+        header.release()
+        segment.close()
+
+    # ----- Following the other processes -----
+    def watch(self, callback):
+        """Call callback(op, obj_id) for every write of another process,
+        once this process applied it; op is 'add', 'update' or 'delete'
+        """
+        self._watchers.append(callback)
+
+    def _notify(self, changes):
+        for op, obj_id in changes:
+            for callback in self._watchers:
+                callback(op, obj_id)
+
+    def _apply(self, op, seq, obj_id, payload):
+        """Apply a record to the replica; returns its (op, obj_id)"""
+        if op == OP_DELETE:
+            InMemoryRepository.delete(self, obj_id)
+            return DELETE, obj_id
+        obj = decode(payload)
+        if obj_id in self._storage:
+            self._replace(obj)
+            return UPDATE, obj_id
+        # Insertion sequence numbers, and so cursors, are the same in
+        # every process
+        self._next_seq = seq
+        InMemoryRepository.add(self, obj)
+        return CHANGES[op], obj_id
+
+    def _catch_up(self):
+        """Apply the records written since the last call (with the lock
+        held); returns the changes applied
+        """
+        changes = []
+        while True:
+            # The end is final once a successor is set
+            successor = self._header[SUCCESSOR]
+            end = self._header[END]
+            for record in _records(self._segment.buf, self._position, end):
+                changes.append(self._apply(*record))
+            self._position = end
+            if not successor:
+                return changes
+            try:
+                segment = _attach(self._segment_name(successor))
+            except FileNotFoundError:
+                # Compacted again since: reload the current generation
+                return changes + self._resync()
+            self._use(segment, successor,
+                      DATA_HEADER.unpack_from(segment.buf)[BASE])
+
+    def _resync(self):
+        """Make the replica match the current generation, whichever
+        records it missed; returns the changes applied
+        """
+        while True:
+            generation = CONTROL.unpack_from(self._control.buf)[2]
+            try:
+                segment = _attach(self._segment_name(generation))
+                break
+            except FileNotFoundError:
+                continue  # replaced while reading the control segment
+        _, end, _, _, next_seq = DATA_HEADER.unpack_from(segment.buf)
+        live = {}
+        for op, seq, obj_id, payload in _records(
+                segment.buf, DATA_HEADER.size, end):
+            if op == OP_DELETE:
+                live.pop(obj_id, None)
+            else:
+                live[obj_id] = (seq, payload)
+        changes = [self._apply(OP_DELETE, 0, obj_id, b'')
+                   for obj_id in list(self._storage) if obj_id not in live]
+        for obj_id, (seq, payload) in sorted(
+                live.items(), key=lambda item: item[1][0]):
+            changes.append(self._apply(OP_ADD, seq, obj_id, payload))
+        self._next_seq = max(self._next_seq, next_seq)
+        self._use(segment, generation, end)
+        return changes
+
+    def refresh(self):
+        """Apply the writes of the other processes"""
+        header = self._header
+        if header[END] == self._position and not header[SUCCESSOR]:
+            return
+        with self._lock:
+            changes = self._catch_up()
+        self._notify(changes)
+
+    # ----- Writes -----
+    @contextmanager
+    def _writing(self):
+        """Hold the write lock, with the replica caught up"""
+        changes = []
+        try:
+            with self._exclusive():
+                changes = self._catch_up()
+                yield
+        finally:
+            self._notify(changes)
+
+    def _record(self, op, obj_id):
+        """Pack the record of a write applied to the replica"""
+        if op == OP_DELETE:
+            return _pack(op, 0, obj_id)
+        return _pack(op, self._seq_of(obj_id), obj_id,
+                     encode(self._storage[obj_id]))
+
+    def _append(self, records):
+        """Append records and publish them at once"""
+        data = b''.join(records)
+        if not data:
+            return
+        buffer = self._segment.buf
+        end = self._position + len(data)
+        if end > len(buffer):
+            self._compact()  # the replica already holds these writes
+            return
+        buffer[self._position:end] = data
+        self._header[END] = end
+        self._position = end
+
+    def _compact(self):
+        """Start the next generation with one record per live object"""
+        records = b''.join(
+            _pack(OP_ADD, seq, obj.id, encode(obj))
+            for seq, obj in self.snapshot().items())
+        old_name = self._segment_name(self._generation)
+        generation = self._generation + 1
+        segment, end = self._start_generation(
+            generation, records, self._next_seq)
+        # Readers of the old segment move on once they applied it
+        self._header[SUCCESSOR] = generation
+        _unlink(old_name)
+        self._use(segment, generation, end)
+
+    def compact(self):
+        """Rewrite the shared records, dropping the superseded ones"""
+        with self._writing():
+            self._compact()
+
+    def add(self, obj):
+        with self._writing():
+            super().add(obj)
+            self._append([self._record(OP_ADD, obj.id)])
+
+    def add_many(self, objs):
+        objs = list(objs)
+        with self._writing():
+            super().add_many(objs)
+            self._append([self._record(OP_ADD, obj.id) for obj in objs])
+
+    def update(self, obj_id, data):
+        with self._writing():
+            changed = super().update(obj_id, data)
+            if changed:
+                self._append([self._record(OP_UPDATE, obj_id)])
+        return changed
+
+    def update_many(self, updates):
+        updates = list(updates)
+        with self._writing():
+            changed = super().update_many(updates)
+            self._append([self._record(OP_UPDATE, obj_id)
+                          for obj_id, fields in changed.items() if fields])
+        return changed
+
+    def delete(self, obj_id):
+        with self._writing():
+            if not super().delete(obj_id):
+                return False
+            self._append([self._record(OP_DELETE, obj_id)])
+        return True
+
+    def delete_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        with self._writing():
+            removed = super().delete_many(obj_ids)
+            self._append([
+                self._record(OP_DELETE, obj_id)
+                for obj_id, was_removed in zip(obj_ids, removed)
+                if was_removed])
+        return removed
+
+    # ----- Reads -----
+    # Point reads check the header inline, saving a call on the hottest
+    # path
+    def get(self, obj_id):
+        if self._header[END] != self._position or self._header[SUCCESSOR]:
+            self.refresh()
+        return self._storage.get(obj_id)
+
+    def get_many(self, obj_ids):
+        if self._header[END] != self._position or self._header[SUCCESSOR]:
+            self.refresh()
+        return [self._storage.get(obj_id) for obj_id in obj_ids]
+
+    def get_all(self):
+        self.refresh()
+        return super().get_all()
+
+    def page(self, cursor=None, limit=None):
+        self.refresh()
+        return super().page(cursor, limit)
+
+    def _run(self, where, order_by, limit, cursor):
+        self.refresh()
+        return super()._run(where, order_by, limit, cursor)
+
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        self.refresh()
+        return super().within_bbox(bbox, cursor, limit)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        self.refresh()
+        return super().get_by_attribute(attr_name, attr_value)
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        self.refresh()
+        return super().get_all_by_attribute(attr_name, attr_value)
+
+    def close(self):
+        """Unmap the segments of this process"""
+        if self._retired is not None:
+            self._close(*self._retired)
+        self._close(self._segment, self._header)
+        self._control.close()
+        self._lock_file.close()
+
+    def unlink(self):
+        """Remove the shared segments; processes that still map them
+        keep their data, but no new process will see it
+        """
+        with self._exclusive():
+            _unlink(self._segment_name(self._generation))
+            _unlink(self.name)
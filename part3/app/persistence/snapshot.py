@@ -0,0 +1,326 @@
+"""Memory-mapped snapshot files of repository contents.
+
+Layout (little-endian, version 1):
+
+    file header      magic, version, section count, sequence number
+    section table    one SECTION entry per repository
+    per section:
+      records        RECORD header (length, crc, id) + encoded object
+      offset table   file offset of every record, in insertion order
+      id directory   (id, record number) sorted by id
+      index table    one INDEX entry per secondary index, each pointing
+                     to (key offset, key length, record number) entries
+                     sorted by key and to a heap of JSON-encoded keys
+
+Opening a snapshot only maps the file: objects are decoded the first
+time they are read, and ids and index keys are found by binary search.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import MutableMapping
+from app.persistence.codec import encode, decode
+
+MAGIC = b'HBNBSNAP'
+VERSION = 1
+ID_WIDTH = 36
+NAME_WIDTH = 32
+
+FILE_HEADER = struct.Struct('<8sHHQ')
+# name, record count, offset table, id directory, index table, index count
+SECTION = struct.Struct(f'<{NAME_WIDTH}sQQQQQ')
+# payload length, CRC32 of the payload, object id
+RECORD = struct.Struct(f'<II{ID_WIDTH}s')
+OFFSET = struct.Struct('<Q')
+DIRECTORY_ENTRY = struct.Struct(f'<{ID_WIDTH}sI')
+# attribute name, unique flag, entry count, entries offset
+INDEX = struct.Struct(f'<{NAME_WIDTH}s?QQ')
+KEY_ENTRY = struct.Struct('<QII')
+
+
+def _fixed(text, width):
+    data = text.encode('utf-8')
+    if len(data) > width:
+        raise ValueError(f"'{text}' is longer than {width} bytes")
+    return data.ljust(width, b'\0')
+
+
+def _text(data):
+    return data.rstrip(b'\0').decode('utf-8')
+
+
+def encode_key(key):
+    return json.dumps(key, separators=(',', ':')).encode('utf-8')
+
+
+def write_snapshot(path, sections, seq=0):
+    """Atomically write a snapshot file.
+
+    sections maps a name to (objects, indexes): the objects to store and
+    the HashIndex instances whose keys are stored next to them.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(FILE_HEADER.pack(MAGIC, VERSION, len(sections), seq))
+        table_offset = out.tell()
+        out.write(b'\0' * SECTION.size * len(sections))
+        descriptors = []
+        for name, (objects, indexes) in sections.items():
+            descriptors.append(_write_section(out, name, objects, indexes))
+        out.seek(table_offset)
+        out.write(b''.join(descriptors))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_section(out, name, objects, indexes):
+    offsets, ids = [], []
+    for obj in objects:
+        payload = encode(obj)
+        offsets.append(out.tell())
+        ids.append(obj.id)
+        out.write(RECORD.pack(
+            len(payload), zlib.crc32(payload), _fixed(obj.id, ID_WIDTH)))
+        out.write(payload)
+
+    offset_table = out.tell()
+    out.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+
+    id_directory = out.tell()
+    out.write(b''.join(
+        DIRECTORY_ENTRY.pack(_fixed(obj_id, ID_WIDTH), recno)
+        for recno, obj_id in sorted(
+            enumerate(ids), key=lambda entry: entry[1].encode('utf-8'))))
+
+    index_entries = []
+    for index in indexes:
+        keys = sorted(
+            (encode_key(index.key_of(obj)), recno)
+            for recno, obj in enumerate(objects))
+        heap = out.tell()
+        out.write(b''.join(key for key, _ in keys))
+        entries = out.tell()
+        position = heap
+        for key, recno in keys:
+            out.write(KEY_ENTRY.pack(position, len(key), recno))
+            position += len(key)
+        index_entries.append(INDEX.pack(
+            _fixed(index.name, NAME_WIDTH), index.unique,
+            len(keys), entries))
+    index_table = out.tell()
+    out.write(b''.join(index_entries))
+
+    return SECTION.pack(
+        _fixed(name, NAME_WIDTH), len(ids), offset_table, id_directory,
+        index_table, len(index_entries))
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            self._map = mmap.mmap(
+                snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.seq = FILE_HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        self.sections = {}
+        for i in range(count):
+            section = SnapshotSection(
+                self._map, FILE_HEADER.size + i * SECTION.size)
+            self.sections[section.name] = section
+
+    def close(self):
+        self._map.close()
+
+
+class _Sorted:
+    """Sequence view over fixed-width sorted entries, for bisect"""
+
+    def __init__(self, length, item):
+        self._length = length
+        self._item = item
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        return self._item(i)
+
+
+class SnapshotSection:
+    """Records and indexes of one repository within a snapshot"""
+
+    def __init__(self, buffer, offset):
+        (name, self.count, self._offsets, self._directory, index_table,
+         index_count) = SECTION.unpack_from(buffer, offset)
+        self.name = _text(name)
+        self._buffer = buffer
+        self._ids = _Sorted(self.count, self._directory_id)
+        self.indexes = {}
+        for i in range(index_count):
+            index = SnapshotIndex(self, index_table + i * INDEX.size)
+            self.indexes[index.name] = index
+
+    def _record_offset(self, recno):
+        return OFFSET.unpack_from(
+            self._buffer, self._offsets + recno * OFFSET.size)[0]
+
+    def _directory_id(self, i):
+        return self._buffer[
+            self._directory + i * DIRECTORY_ENTRY.size:
+            self._directory + i * DIRECTORY_ENTRY.size + ID_WIDTH]
+
+    def record_id(self, recno):
+        """Return the id of a record from its fixed-width header"""
+        _, _, obj_id = RECORD.unpack_from(
+            self._buffer, self._record_offset(recno))
+        return _text(obj_id)
+
+    def record(self, recno):
+        """Decode a record into a model instance"""
+        offset = self._record_offset(recno)
+        length, crc, _ = RECORD.unpack_from(self._buffer, offset)
+        start = offset + RECORD.size
+        payload = self._buffer[start:start + length]
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupted record {recno} in '{self.name}'")
+        return decode(payload)
+
+    def find(self, obj_id):
+        """Return the record number of obj_id, or None"""
+        try:
+            key = _fixed(obj_id, ID_WIDTH)
+        except ValueError:
+            return None
+        i = bisect.bisect_left(self._ids, key)
+        if i < self.count and self._ids[i] == key:
+            entry = self._directory + i * DIRECTORY_ENTRY.size
+            return DIRECTORY_ENTRY.unpack_from(self._buffer, entry)[1]
+        return None
+
+
+class SnapshotIndex:
+    """Sorted keys of one secondary index of a section"""
+
+    def __init__(self, section, offset):
+        name, self.unique, self.count, self._entries = \
+            INDEX.unpack_from(section._buffer, offset)
+        self.name = _text(name)
+        self._section = section
+        self._keys = _Sorted(self.count, self._key)
+
+    def _entry(self, i):
+        return KEY_ENTRY.unpack_from(
+            self._section._buffer, self._entries + i * KEY_ENTRY.size)
+
+    def _key(self, i):
+        position, length, _ = self._entry(i)
+        return self._section._buffer[position:position + length]
+
+    def count(self, key):
+        """Return the number of entries stored under key"""
+        encoded = encode_key(key)
+        return (bisect.bisect_right(self._keys, encoded) -
+                bisect.bisect_left(self._keys, encoded))
+
+    def lookup(self, key):
+        """Return the ids stored under key, in record order"""
+        encoded = encode_key(key)
+        i = bisect.bisect_left(self._keys, encoded)
+        recnos = []
+        while i < self.count and self._keys[i] == encoded:
+            recnos.append(self._entry(i)[2])
+            i += 1
+        return [self._section.record_id(recno) for recno in sorted(recnos)]
+
+    def holds(self, obj_id):
+        """Return whether obj_id is a record of the section"""
+        return self._section.find(obj_id) is not None
+
+
+class SnapshotStorage(MutableMapping):
+    """Id -> object mapping backed by a snapshot section.
+
+    Records are decoded on first access and then kept; objects added,
+    replaced or deleted afterwards only change the in-memory overlay.
+    """
+
+    def __init__(self, section):
+        self._section = section
+        self._loaded = {}  # snapshot records already decoded, unchanged
+        self._changed = {}  # objects replacing a snapshot record
+        self._added = {}  # objects that are not in the snapshot
+        self._deleted = set()
+
+    def _in_snapshot(self, obj_id):
+        return (obj_id not in self._deleted and
+                self._section.find(obj_id) is not None)
+
+    def original(self, recno):
+        """Return the object stored in record recno of the snapshot"""
+        obj_id = self._section.record_id(recno)
+        obj = self._loaded.get(obj_id)
+        if obj is None:
+            obj = self._loaded[obj_id] = self._section.record(recno)
+        return obj
+
+    def __getitem__(self, obj_id):
+        obj = self._changed.get(obj_id) or self._added.get(obj_id)
+        if obj is not None:
+            return obj
+        if obj_id in self._deleted:
+            raise KeyError(obj_id)
+        obj = self._loaded.get(obj_id)
+        if obj is not None:
+            return obj
+        recno = self._section.find(obj_id)
+        if recno is None:
+            raise KeyError(obj_id)
+        return self.original(recno)
+
+    def __setitem__(self, obj_id, obj):
+        if obj_id in self._changed or self._section.find(obj_id) is not None:
+            self._deleted.discard(obj_id)
+            self._changed[obj_id] = obj
+        else:
+            self._added[obj_id] = obj
+
+    def __delitem__(self, obj_id):
+        if obj_id in self._added:
+            del self._added[obj_id]
+        elif self._in_snapshot(obj_id):
+            self._changed.pop(obj_id, None)
+            self._deleted.add(obj_id)
+        else:
+            raise KeyError(obj_id)
+
+    def __contains__(self, obj_id):
+        return (obj_id in self._changed or obj_id in self._added or
+                self._in_snapshot(obj_id))
+
+    def __iter__(self):
+        for recno in range(self._section.count):
+            obj_id = self._section.record_id(recno)
+            if obj_id not in self._deleted:
+                yield obj_id
+        yield from list(self._added)
+
+    def __len__(self):
+        return self._section.count - len(self._deleted) + len(self._added)
+
+    def deleted(self):
+        """Return the ids of the snapshot records deleted since loading"""
+        return set(self._deleted)
+
+    def overrides(self):
+        """Return the (id, object) pairs that differ from the snapshot"""
+        return list(self._changed.items()) + list(self._added.items())
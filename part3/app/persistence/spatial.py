@@ -0,0 +1,111 @@
+import math
+import threading
+
+_MISSING = object()
+
+
+class GridIndex:
+    """Spatial index bucketing (latitude, longitude) points into a grid.
+
+    Keys are (lat, lon) tuples, or None for objects without coordinates.
+    It offers the same maintenance calls as HashIndex (key_of, check,
+    insert, remove, indexed_key), so repositories keep it up to date on
+    every write like their other indexes. Like ColumnStore, it has its
+    own lock: concurrent writers lock the points they move, but points
+    of one cell share its dict.
+    """
+
+    unique = False
+
+    def __init__(self, lat_attr, lon_attr, cell_size=0.1):
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+        self.attrs = (lat_attr, lon_attr)
+        self.attr_name = self.name = f'{lat_attr},{lon_attr}'
+        self.cell_size = cell_size
+        self._cells = {}  # (row, col) -> {obj_id: (lat, lon)}
+        self._keys = {}  # obj_id -> (lat, lon) it is indexed under
+        self._lock = threading.Lock()
+
+    def __contains__(self, obj_id):
+        return obj_id in self._keys
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size),
+                math.floor(lon / self.cell_size))
+
+    def key_of(self, obj, data=None):
+        """Return the point of an object, optionally with pending changes"""
+        point = []
+        for attr in (self.lat_attr, self.lon_attr):
+            if data is not None and attr in data:
+                value = data[attr]
+            else:
+                value = getattr(obj, attr, None)
+            if value is None:
+                return None
+            point.append(float(value))
+        return tuple(point)
+
+    def indexed_key(self, obj_id, obj):
+        """Return the point obj is currently indexed under"""
+        key = self._keys.get(obj_id, _MISSING)
+        return self.key_of(obj) if key is _MISSING else key
+
+    def check(self, obj_id, key):
+        """Points are never unique"""
+
+    def insert(self, obj_id, key):
+        with self._lock:
+            if self._keys.get(obj_id, _MISSING) == key:
+                return
+            self._remove(obj_id)
+            if key is None:
+                return
+            self._cells.setdefault(self._cell(*key), {})[obj_id] = key
+            self._keys[obj_id] = key
+
+    def remove(self, obj_id):
+        with self._lock:
+            self._remove(obj_id)
+
+    def _remove(self, obj_id):
+        key = self._keys.pop(obj_id, None)
+        if key is None:
+            return
+        cell = self._cell(*key)
+        ids = self._cells[cell]
+        del ids[obj_id]
+        if not ids:
+            del self._cells[cell]
+
+    def within(self, min_lat, min_lon, max_lat, max_lon):
+        """Return the ids of the points inside a box, bounds included.
+
+        Only the cells overlapping the box are visited (or, for boxes
+        spanning more cells than are occupied, the occupied ones), and
+        only points of the cells on its border are compared to it.
+        """
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        area = (high_row - low_row + 1) * (high_col - low_col + 1)
+        with self._lock:
+            if area <= len(self._cells):
+                cells = (((row, col), self._cells.get((row, col)))
+                         for row in range(low_row, high_row + 1)
+                         for col in range(low_col, high_col + 1))
+            else:
+                cells = ((cell, ids) for cell, ids in self._cells.items()
+                         if low_row <= cell[0] <= high_row and
+                         low_col <= cell[1] <= high_col)
+            found = []
+            for (row, col), ids in cells:
+                if not ids:
+                    continue
+                if low_row < row < high_row and low_col < col < high_col:
+                    found.extend(ids)
+                    continue
+                found.extend(
+                    obj_id for obj_id, (lat, lon) in ids.items()
+                    if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon)
+            return found
@@ -0,0 +1,410 @@
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.persistence.codec import dumps, decode
+from app.persistence.indexes import HashIndex
+from app.persistence.cursors import decode_cursor, page_of
+from app.persistence.query import (
+    Eq, In, Near, Range, Within, conditions, distance_km, parse_order)
+from app.persistence.repository import Repository
+
+
+# Ids per "IN (...)" query, below SQLite's default variable limit
+_BATCH_SIZE = 500
+
+_USING_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+def _same(value):
+    return value
+
+
+class SQLiteRepository(Repository):
+    """Repository storing one entity type per table of a SQLite database.
+
+    Objects are stored as encoded JSON next to one column per declared
+    index, so get_by_attribute is answered by a real SQL index.
+    Connections are pooled per thread and run in WAL journal mode. The
+    *_many calls run a whole batch in one transaction.
+    """
+
+    def __init__(self, database, table, cached_statements=128):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name '{table}'")
+        self.database = database
+        self.table = table
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._spatial = None  # (lat_attr, lon_attr, index name)
+        self._connection().execute(
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            '(id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        self._prepare_statements()
+
+    def _connection(self):
+        """Return the calling thread's connection, opening it if needed"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.database,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.cached_statements)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.create_function(
+                'distance_km', 4, distance_km, deterministic=True)
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block in one write transaction on this thread's connection.
+
+        Constraint violations are raised as ValueError, like the in-memory
+        unique indexes do.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except sqlite3.IntegrityError as error:
+            conn.execute('ROLLBACK')
+            raise ValueError(str(error)) from error
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _attrs(attr_name):
+        """Return the attributes of attr_name, checked for use in SQL"""
+        attrs = attr_name if isinstance(attr_name, tuple) else (attr_name,)
+        for name in attrs:
+            if not name.isidentifier():
+                raise ValueError(f"Invalid attribute name '{name}'")
+        return attrs
+
+    @classmethod
+    def _column(cls, attr_name):
+        return 'idx_' + '__'.join(cls._attrs(attr_name))
+
+    @staticmethod
+    def _sql_key(key):
+        """Composite keys are stored as JSON arrays"""
+        return json.dumps(key) if isinstance(key, tuple) else key
+
+    def _prepare_statements(self):
+        """Build the SQL text once so sqlite3 reuses prepared statements"""
+        columns = ['id', 'data'] + [
+            self._column(name) for name in self._indexes]
+        placeholders = ', '.join('?' for _ in columns)
+        assignments = ', '.join(f'{column} = ?' for column in columns[1:])
+        self._insert_sql = (f'INSERT INTO {self.table} '
+                            f'({", ".join(columns)}) VALUES ({placeholders})')
+        self._update_sql = (f'UPDATE {self.table} SET {assignments} '
+                            'WHERE id = ?')
+        self._get_sql = f'SELECT data FROM {self.table} WHERE id = ?'
+        self._get_all_sql = f'SELECT data FROM {self.table} ORDER BY rowid'
+        self._page_sql = (f'SELECT rowid, data FROM {self.table} '
+                          'WHERE rowid >= ? ORDER BY rowid LIMIT ?')
+        self._delete_sql = f'DELETE FROM {self.table} WHERE id = ?'
+
+    def _index_values(self, obj):
+        return [self._sql_key(index.key_of(obj))
+                for index in self._indexes.values()]
+
+    def add_index(self, attr_name, unique=False, normalize=None):
+        """Add an indexed column for attr_name and fill it from the rows.
+
+        A tuple of attributes gets one column holding their values.
+        """
+        index = HashIndex(attr_name, unique=unique, normalize=normalize)
+        column = self._column(attr_name)
+        with self._transaction() as conn:
+            existing = {row[1] for row in conn.execute(
+                f'PRAGMA table_info({self.table})')}
+            if column not in existing:
+                conn.execute(
+                    f'ALTER TABLE {self.table} ADD COLUMN {column}')
+            for obj_id, data in conn.execute(
+                    f'SELECT id, data FROM {self.table}').fetchall():
+                conn.execute(
+                    f'UPDATE {self.table} SET {column} = ? WHERE id = ?',
+                    (self._sql_key(index.key_of(decode(data))), obj_id))
+            conn.execute(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS '
+                f'{self.table}_{"__".join(self._attrs(attr_name))} '
+                f'ON {self.table} ({column})')
+        self._indexes[attr_name] = index
+        self._prepare_statements()
+
+    def add_spatial_index(self, lat_attr, lon_attr):
+        """Index both coordinates, then the pair, for within_bbox.
+
+        The composite index narrows a box to its latitude band; SQLite
+        then filters the band's entries by longitude.
+        """
+        for attr_name in (lat_attr, lon_attr):
+            if attr_name not in self._indexes:
+                self.add_index(attr_name)
+        name = f'{self.table}_{lat_attr}_{lon_attr}'
+        self._connection().execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {self.table} '
+            f'({self._column(lat_attr)}, {self._column(lon_attr)})')
+        self._spatial = (lat_attr, lon_attr, name)
+
+    def within_bbox(self, bbox, cursor=None, limit=None):
+        if self._spatial is None:
+            raise ValueError("No spatial index declared")
+        lat_attr, lon_attr, name = self._spatial
+        lat_column, lon_column = map(self._column, (lat_attr, lon_attr))
+        min_lat, min_lon, max_lat, max_lon = bbox
+        # Without INDEXED BY the planner prefers walking the rowids
+        rows = self._connection().execute(
+            f'SELECT rowid, data FROM {self.table} INDEXED BY {name} '
+            f'WHERE {lat_column} BETWEEN ? AND ? '
+            f'AND {lon_column} BETWEEN ? AND ? '
+            'AND rowid >= ? ORDER BY rowid LIMIT ?',
+            (min_lat, max_lat, min_lon, max_lon, decode_cursor(cursor),
+             -1 if limit is None else limit + 1))
+        return page_of(
+            ((rowid, decode(data)) for rowid, data in rows), limit)
+
+    def add(self, obj):
+        try:
+            self._connection().execute(
+                self._insert_sql,
+                [obj.id, dumps(obj)] + self._index_values(obj))
+        except sqlite3.IntegrityError as error:
+            raise ValueError(str(error)) from error
+
+    def add_many(self, objs):
+        with self._transaction() as conn:
+            conn.executemany(
+                self._insert_sql,
+                ([obj.id, dumps(obj)] + self._index_values(obj)
+                 for obj in objs))
+
+    def get(self, obj_id):
+        row = self._connection().execute(self._get_sql, (obj_id,)).fetchone()
+        return decode(row[0]) if row else None
+
+    def get_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        unique_ids = list(dict.fromkeys(obj_ids))
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(unique_ids), _BATCH_SIZE):
+            batch = unique_ids[start:start + _BATCH_SIZE]
+            placeholders = ', '.join('?' for _ in batch)
+            for obj_id, data in conn.execute(
+                    f'SELECT id, data FROM {self.table} '
+                    f'WHERE id IN ({placeholders})', batch):
+                found[obj_id] = decode(data)
+        return [found.get(obj_id) for obj_id in obj_ids]
+
+    def get_all(self):
+        return [decode(data) for data, in
+                self._connection().execute(self._get_all_sql)]
+
+    def page(self, cursor=None, limit=None):
+        """Return a page of objects; cursors are rowids, so a page is one
+        range scan of the primary key.
+        """
+        rows = self._connection().execute(
+            self._page_sql,
+            (decode_cursor(cursor), -1 if limit is None else limit + 1))
+        return page_of(
+            ((rowid, decode(data)) for rowid, data in rows), limit)
+
+    def update(self, obj_id, data):
+        with self._transaction() as conn:
+            obj = self.get(obj_id)
+            if obj is None:
+                return None
+            changed = obj.update(data)
+            if changed:
+                conn.execute(
+                    self._update_sql,
+                    [dumps(obj)] + self._index_values(obj) + [obj_id])
+            return changed
+
+    def update_many(self, updates):
+        changed = {}
+        with self._transaction() as conn:
+            for obj_id, data in updates:
+                obj = self.get(obj_id)
+                if obj is None:
+                    continue
+                fields = obj.update(data)
+                changed[obj_id] = {**changed.get(obj_id, {}), **fields}
+                if fields:
+                    conn.execute(
+                        self._update_sql,
+                        [dumps(obj)] + self._index_values(obj) + [obj_id])
+        return changed
+
+    def delete(self, obj_id):
+        cursor = self._connection().execute(self._delete_sql, (obj_id,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, obj_ids):
+        with self._transaction() as conn:
+            return [conn.execute(self._delete_sql, (obj_id,)).rowcount > 0
+                    for obj_id in obj_ids]
+
+    def _where(self, attr_name, attr_value):
+        """Return the WHERE clause and parameters matching attr_name"""
+        attrs = self._attrs(attr_name)
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return (f'{self._column(attr_name)} = ?',
+                    [self._sql_key(index.key_for(attr_value))])
+        if isinstance(attr_name, tuple):
+            values = list(attr_value)
+        else:
+            values = [attr_value]
+        return ' AND '.join(
+            f"json_extract(data, '$.{name}') = ?" for name in attrs), values
+
+    def get_by_attribute(self, attr_name, attr_value):
+        where, values = self._where(attr_name, attr_value)
+        row = self._connection().execute(
+            f'SELECT data FROM {self.table} WHERE {where} '
+            'ORDER BY rowid LIMIT 1', values).fetchone()
+        return decode(row[0]) if row else None
+
+    def get_all_by_attribute(self, attr_name, attr_value):
+        where, values = self._where(attr_name, attr_value)
+        return [decode(data) for data, in self._connection().execute(
+            f'SELECT data FROM {self.table} WHERE {where} ORDER BY rowid',
+            values)]
+
+    # ----- Queries -----
+    def _expression(self, attr_name):
+        """Return the SQL expression of an attribute, and the function
+        turning values into its parameters
+        """
+        if attr_name == 'id':
+            return 'id', _same
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return self._column(attr_name), (
+                lambda value: self._sql_key(index.key_for(value)))
+        if isinstance(attr_name, tuple):
+            raise ValueError(f"No index on {attr_name!r}")
+        self._attrs(attr_name)
+        return f"json_extract(data, '$.{attr_name}')", _same
+
+    def _condition(self, attr_name, pred):
+        """Return the SQL and parameters of one find() condition"""
+        if isinstance(pred, (Within, Near)):
+            attrs = self._attrs(attr_name)
+            if len(attrs) != 2:
+                raise ValueError(f"{type(pred).__name__} needs "
+                                 "(latitude, longitude)")
+            lat, lon = (self._expression(name)[0] for name in attrs)
+            bbox = pred.bbox if isinstance(pred, Within) else pred.bbox()
+            min_lat, min_lon, max_lat, max_lon = bbox
+            sql = f'{lat} BETWEEN ? AND ? AND {lon} BETWEEN ? AND ?'
+            params = [min_lat, max_lat, min_lon, max_lon]
+            if isinstance(pred, Near):
+                sql += f' AND distance_km(?, ?, {lat}, {lon}) <= ?'
+                params += [pred.lat, pred.lon, pred.km]
+            return sql, params
+        if (isinstance(attr_name, tuple) and isinstance(pred, Eq) and
+                attr_name not in self._indexes):
+            parts = [self._condition(name, Eq(value)) for name, value
+                     in zip(self._attrs(attr_name), pred.value)]
+            return (' AND '.join(sql for sql, _ in parts),
+                    [param for _, params in parts for param in params])
+        expression, key = self._expression(attr_name)
+        if isinstance(pred, Eq):
+            return f'{expression} = ?', [key(pred.value)]
+        if isinstance(pred, In):
+            if not pred.values:
+                return '0', []
+            placeholders = ', '.join('?' for _ in pred.values)
+            return (f'{expression} IN ({placeholders})',
+                    [key(value) for value in pred.values])
+        clauses, params = [f'{expression} IS NOT NULL'], []
+        if pred.low is not None:
+            clauses.append(f'{expression} >= ?')
+            params.append(key(pred.low))
+        if pred.high is not None:
+            clauses.append(f'{expression} <= ?')
+            params.append(key(pred.high))
+        return ' AND '.join(clauses), params
+
+    def _run(self, where, order_by, limit, cursor):
+        """Translate a find() into one SQL query over the indexed columns.
+
+        Without order_by, cursors are rowids and a page is a range of
+        them; with it, cursors are offsets into the sorted result.
+        """
+        conds = conditions(where)
+        clauses, params = [], []
+        for attr_name, pred in conds:
+            sql, values = self._condition(attr_name, pred)
+            clauses.append(sql)
+            params.extend(values)
+        source = self.table
+        if (self._spatial is not None and len(conds) == 1 and
+                isinstance(conds[0][1], (Within, Near)) and
+                conds[0][0] == self._spatial[:2]):
+            # As in within_bbox, the planner would walk the rowids instead
+            source += f' INDEXED BY {self._spatial[2]}'
+        start = decode_cursor(cursor)
+        fetch = -1 if limit is None else limit + 1
+        if order_by is None:
+            clauses.append('rowid >= ?')
+            sql = (f'SELECT rowid, data FROM {source} '
+                   f'WHERE {" AND ".join(clauses)} ORDER BY rowid LIMIT ?')
+            params += [start, fetch]
+        else:
+            attr_name, descending = parse_order(order_by)
+            expression, _ = self._expression(attr_name)
+            sql = (f'SELECT rowid, data FROM {source} '
+                   f'WHERE {" AND ".join(clauses) or "1"} '
+                   f'ORDER BY {expression} IS NULL, {expression}'
+                   f'{" DESC" if descending else ""}, rowid '
+                   'LIMIT ? OFFSET ?')
+            params += [fetch, start]
+        rows = self._connection().execute(sql, params)
+        if order_by is None:
+            items = ((rowid, decode(data)) for rowid, data in rows)
+        else:
+            items = ((position, decode(data)) for position, (_, data)
+                     in enumerate(rows, start))
+        plan = {'plan': 'sql', 'sql': sql, 'params': params}
+        return page_of(items, limit) + (plan,)
+
+    def explain(self, where=None, order_by=None, limit=None, cursor=None):
+        """Describe a find() with SQLite's EXPLAIN QUERY PLAN.
+
+        SQLite does not report the rows it reads, so the plan lists its
+        steps and the indexes they use instead.
+        """
+        plan = super().explain(where, order_by, limit, cursor)
+        steps = [row[-1] for row in self._connection().execute(
+            f'EXPLAIN QUERY PLAN {plan["sql"]}', plan.pop('params'))]
+        plan['steps'] = steps
+        plan['indexes'] = [match.group(1) for step in steps
+                           for match in _USING_INDEX.finditer(step)]
+        return plan
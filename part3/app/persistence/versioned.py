@@ -0,0 +1,166 @@
+"""Persistent (immutable, structurally shared) storage of repository
+versions.
+
+Every committed write produces a new RadixMap sharing all untouched
+nodes with the previous one, so taking a consistent view of a repository
+is O(1) and iterating it never blocks, nor is disturbed by, writers.
+"""
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_EMPTY_NODE = (None,) * _WIDTH
+
+# Marks a snapshot record deleted in a version
+DELETED = object()
+
+
+def _set(node, shift, key, value):
+    children = list(node if node is not None else _EMPTY_NODE)
+    i = (key >> shift) & _MASK
+    if shift == 0:
+        children[i] = value
+    else:
+        children[i] = _set(children[i], shift - _BITS, key, value)
+    if value is None and all(child is None for child in children):
+        return None
+    return tuple(children)
+
+
+def _items(node, shift, base, start):
+    step = 1 << shift
+    first = max(0, (start - base) >> shift)
+    for i in range(first, _WIDTH):
+        child = node[i]
+        if child is None:
+            continue
+        key = base + i * step
+        if shift == 0:
+            yield key, child
+        else:
+            yield from _items(child, shift - _BITS, key, start)
+
+
+def _reversed_items(node, shift, base):
+    step = 1 << shift
+    for i in range(_WIDTH - 1, -1, -1):
+        child = node[i]
+        if child is None:
+            continue
+        key = base + i * step
+        if shift == 0:
+            yield key, child
+        else:
+            yield from _reversed_items(child, shift - _BITS, key)
+
+
+class RadixMap:
+    """Persistent map of non-negative integers, iterated in key order.
+
+    A 32-way trie: set() and delete() copy the path to the key and
+    return a new map, leaving this one untouched.
+    """
+
+    __slots__ = ('_root', '_shift', '_count')
+
+    def __init__(self, root=None, shift=0, count=0):
+        self._root = root
+        self._shift = shift
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key, default=None):
+        if key >> (self._shift + _BITS):
+            return default
+        node, shift = self._root, self._shift
+        while node is not None and shift > 0:
+            node = node[(key >> shift) & _MASK]
+            shift -= _BITS
+        if node is None:
+            return default
+        value = node[key & _MASK]
+        return default if value is None else value
+
+    def set(self, key, value):
+        root, shift = self._root, self._shift
+        while key >> (shift + _BITS):
+            if root is not None:
+                root = (root,) + _EMPTY_NODE[1:]
+            shift += _BITS
+        count = self._count + (self.get(key) is None)
+        return RadixMap(_set(root, shift, key, value), shift, count)
+
+    def delete(self, key):
+        if self.get(key) is None:
+            return self
+        return RadixMap(
+            _set(self._root, self._shift, key, None),
+            self._shift, self._count - 1)
+
+    def items(self, start=0):
+        """Yield (key, value) pairs with key >= start, in key order"""
+        if self._root is None:
+            return iter(())
+        return _items(self._root, self._shift, 0, start)
+
+    def reversed_items(self):
+        """Yield (key, value) pairs in descending key order"""
+        if self._root is None:
+            return iter(())
+        return _reversed_items(self._root, self._shift, 0)
+
+
+class RepositoryView:
+    """Consistent, read-only view of a repository at one version.
+
+    Objects are yielded in insertion order. Records of a loaded snapshot
+    that were not changed in this version are read from the snapshot.
+    """
+
+    def __init__(self, entries, count, storage=None, base_count=0):
+        self._entries = entries
+        self._count = count
+        self._storage = storage
+        self._base_count = base_count
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for _, obj in self.items():
+            yield obj
+
+    def items(self, start=0):
+        """Yield (seq, object) pairs with seq >= start, in seq order"""
+        entries = self._entries.items(start)
+        if start < self._base_count:
+            changed = next(entries, None)
+            for seq in range(start, self._base_count):
+                if changed is not None and changed[0] == seq:
+                    obj = changed[1]
+                    changed = next(entries, None)
+                else:
+                    obj = self._storage.original(seq)
+                if obj is not DELETED:
+                    yield seq, obj
+            if changed is not None:
+                yield changed
+        yield from entries
+
+    def reversed_items(self):
+        """Yield (seq, object) pairs in descending seq order"""
+        entries = self._entries.reversed_items()
+        changed = next(entries, None)
+        while changed is not None and changed[0] >= self._base_count:
+            yield changed
+            changed = next(entries, None)
+        for seq in range(self._base_count - 1, -1, -1):
+            if changed is not None and changed[0] == seq:
+                obj = changed[1]
+                changed = next(entries, None)
+            else:
+                obj = self._storage.original(seq)
+            if obj is not DELETED:
+                yield seq, obj
@@ -0,0 +1,182 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+OP_ADD = 1
+OP_UPDATE = 2
+OP_DELETE = 3
+OP_PATCH = 4  # payload: the attributes changed by an update
+
+# Record header: body length, CRC32 of the body, sequence number
+HEADER = struct.Struct('<IIQ')
+# Record body prefix: operation, length of the object id
+BODY = struct.Struct('<BH')
+
+
+def pack_record(seq, op, obj_id, payload=b''):
+    """Encode one log record"""
+    obj_id = obj_id.encode('utf-8')
+    body = BODY.pack(op, len(obj_id)) + obj_id + payload
+    return HEADER.pack(len(body), zlib.crc32(body), seq) + body
+
+
+def read_records(path):
+    """Yield (seq, op, obj_id, payload) for every intact record of a log.
+
+    Reading stops at the first torn or corrupted record, which is what a
+    crash in the middle of an append leaves behind.
+    """
+    with open(path, 'rb') as log:
+        data = log.read()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc, seq = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        body = data[start:start + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            break
+        op, id_length = BODY.unpack_from(body)
+        obj_id = body[BODY.size:BODY.size + id_length].decode('utf-8')
+        yield seq, op, obj_id, body[BODY.size + id_length:]
+        offset = start + length
+
+
+class WriteAheadLog:
+    """Append-only log file with group commit.
+
+    append() returns once its record is on disk. With commit_delay=0
+    every append is written and fsynced by the caller. Otherwise a
+    background thread fsyncs the queued records together, waiting up to
+    commit_delay seconds for the other writers in flight (see writer())
+    to queue theirs first. A lone writer is never delayed.
+    """
+
+    def __init__(self, path, commit_delay=0.002, last_seq=0):
+        self.path = path
+        self.commit_delay = commit_delay
+        self._file = open(path, 'ab')
+        self._seq = last_seq
+        self._durable_seq = last_seq
+        self._buffer = []
+        self._writers = 0
+        self._lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        self._pending = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._closed = False
+        self._flusher = None
+        if commit_delay > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name='wal-flusher', daemon=True)
+            self._flusher.start()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    @contextmanager
+    def writer(self):
+        """Mark the calling thread as about to log a mutation.
+
+        The flusher holds a batch back while marked writers are still
+        to queue their records.
+        """
+        with self._lock:
+            self._writers += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._writers -= 1
+                self._pending.notify()
+
+    def append(self, op, obj_id, payload=b''):
+        """Log one mutation and return its sequence number once durable"""
+        with self.writer():
+            return self.wait(self.enqueue(op, obj_id, payload))
+
+    def enqueue(self, op, obj_id, payload=b''):
+        """Queue one mutation without waiting for it to be durable"""
+        return self.enqueue_many([(op, obj_id, payload)])
+
+    def enqueue_many(self, records):
+        """Queue (op, obj_id, payload) mutations to be written together.
+
+        Returns the sequence number of the last one.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("Write-ahead log is closed")
+            for op, obj_id, payload in records:
+                self._seq += 1
+                self._buffer.append(
+                    pack_record(self._seq, op, obj_id, payload))
+            seq = self._seq
+            if self._flusher is not None:
+                self._pending.notify()
+        if self._flusher is None:
+            self.flush()
+        return seq
+
+    def wait(self, seq):
+        """Block until every record up to seq is on disk"""
+        with self._lock:
+            while self._durable_seq < seq:
+                self._durable.wait()
+        return seq
+
+    def flush(self):
+        """Write and fsync every queued record"""
+        with self._io_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+                seq = self._seq
+            if records:
+                self._file.write(b''.join(records))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            with self._lock:
+                self._durable_seq = max(self._durable_seq, seq)
+                self._durable.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._pending.wait()
+                if self._closed:
+                    return
+                # Give the writers in flight the latency budget to join
+                deadline = time.monotonic() + self.commit_delay
+                remaining = self.commit_delay
+                while (remaining > 0 and not self._closed and
+                       len(self._buffer) < self._writers):
+                    self._pending.wait(remaining)
+                    remaining = deadline - time.monotonic()
+            self.flush()
+
+    def rotate(self, path):
+        """Flush the current file and continue logging into path.
+
+        Returns the sequence number of the last record of the old file.
+        """
+        with self._io_lock:
+            self.flush()
+            self._file.close()
+            self.path = path
+            self._file = open(path, 'ab')
+            return self._durable_seq
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._file.close()
@@ -1,3 +1,5 @@
 from app.services.facade import HBnBFacade
+from app.services.async_facade import AsyncHBnBFacade
 
 facade = HBnBFacade()
+async_facade = AsyncHBnBFacade(facade)
@@ -0,0 +1,91 @@
+import asyncio
+from app.persistence.async_repository import ThreadedAsyncRepository
+
+
+class AsyncHBnBFacade:
+    """Coroutine variants of the read methods of HBnBFacade.
+
+    They return the same data as their synchronous counterparts, reading
+    through AsyncRepository objects: by default the facade's own
+    repositories, offloaded to threads unless the backend is in memory.
+    repositories maps entity names ('users', 'places'...) to other
+    AsyncRepository objects, e.g. natively asynchronous ones.
+    """
+
+    def __init__(self, facade, repositories=None):
+        self.facade = facade
+        self._repositories = repositories
+
+    def _repo(self, entity):
+        if self._repositories is not None:
+            return self._repositories[entity]
+        # Built on each call, as init_app may switch the backend
+        offload = self.facade.backend != 'memory'
+        return ThreadedAsyncRepository(
+            self.facade.repositories[entity], offload)
+
+    async def _get(self, entity, obj_id):
+        obj = await self._repo(entity).get(obj_id)
+        return self.facade.public_dict(obj) if obj else None
+
+    async def _page(self, entity, cursor, limit, where=None, encoded=False):
+        objs, next_cursor = await self._repo(entity).find(
+            where=where, limit=limit, cursor=cursor)
+        return self.facade.public_list(objs, encoded), next_cursor
+
+    async def _search_page(self, entity, q, cursor, limit, **filters):
+        """Run a q= search of the synchronous facade: the search index
+        lives in this process, so only its object reads may block
+        """
+        method = getattr(self.facade, f'get_{entity}_page')
+        return await asyncio.to_thread(
+            method, cursor=cursor, limit=limit, q=q, **filters)
+
+    async def get_user(self, user_id):
+        return await self._get('users', user_id)
+
+    async def get_users_page(self, cursor=None, limit=None, encoded=False):
+        return await self._page('users', cursor, limit, encoded=encoded)
+
+    async def get_amenity(self, amenity_id):
+        return await self._get('amenities', amenity_id)
+
+    async def get_amenities_page(self, cursor=None, limit=None,
+                                 encoded=False):
+        return await self._page('amenities', cursor, limit, encoded=encoded)
+
+    async def get_review(self, review_id):
+        return await self._get('reviews', review_id)
+
+    async def get_reviews_page(self, cursor=None, limit=None, q=None,
+                               encoded=False):
+        if q:
+            return await self._search_page(
+                'reviews', q, cursor, limit, encoded=encoded)
+        return await self._page('reviews', cursor, limit, encoded=encoded)
+
+    async def get_reviews_by_place(self, place_id):
+        reviews, _ = await self._page(
+            'reviews', None, None, where={'place': place_id})
+        return reviews
+
+    async def get_place(self, place_id):
+        return await self._get('places', place_id)
+
+    async def get_place_with_reviews(self, place_id):
+        """Return a place with its reviews, both read concurrently"""
+        place, reviews = await asyncio.gather(
+            self.get_place(place_id), self.get_reviews_by_place(place_id))
+        if place is not None:
+            place['reviews'] = reviews
+        return place
+
+    async def get_places_page(self, cursor=None, limit=None, bbox=None,
+                              q=None, min_price=None, max_price=None,
+                              near=None, encoded=False):
+        if q:
+            return await self._search_page(
+                'places', q, cursor, limit, bbox=bbox, min_price=min_price,
+                max_price=max_price, near=near, encoded=encoded)
+        where = self.facade.place_filters(bbox, min_price, max_price, near)
+        return await self._page('places', cursor, limit, where, encoded)
@@ -1,22 +1,229 @@
-from app.persistence.repository import InMemoryRepository
+import itertools
+import os
+import threading
+from app.persistence import backend_settings, repository_factory
+from app.persistence.changes import (
+    ADD, DELETE, ChangeLog, CapturingRepository)
+from app.persistence.cursors import decode_cursor, page_of
+from app.persistence.query import (
+    Near, Range, Within, conditions, matcher)
+from app.persistence.snapshot import Snapshot, write_snapshot
 from app.models.user import User
 from app.models.amenity import Amenity
 from app.models.place import Place
 from app.models.review import Review
+from app.services.search import FullTextIndex
 
 
 class HBnBFacade:
-    def __init__(self):
-        self.user_repo = InMemoryRepository()
-        self.place_repo = InMemoryRepository()
-        self.review_repo = InMemoryRepository()
-        self.amenity_repo = InMemoryRepository()
+    def __init__(self, config=None):
+        self._backend = None
+        self.init_repositories(config or {})
+
+    def init_repositories(self, config):
+        """Create the repositories with the backend selected by config"""
+        factory = repository_factory(config)
+        self._backend = backend_settings(config)
+        # Every write is logged, for derived views and change feeds
+        self.changes = ChangeLog(config.get('CHANGE_LOG_SIZE', 65536),
+                                 config.get('CHANGE_RETENTION'))
+
+        def capturing(table):
+            return CapturingRepository(factory(table), self.changes, table)
+        self.user_repo = capturing('users')
+        self.place_repo = capturing('places')
+        self.review_repo = capturing('reviews')
+        self.amenity_repo = capturing('amenities')
+
+        snapshot_path = config.get('SNAPSHOT_PATH')
+        if (config.get('REPOSITORY', 'memory') == 'memory' and
+                snapshot_path and os.path.exists(snapshot_path)):
+            self.load_snapshot(snapshot_path)
+
+        # Emails are looked up on every registration and login
+        self.user_repo.add_index('email', unique=True, normalize=str.casefold)
+        # Relationship lookups: reviews of a place or by a user, places
+        # of an owner
+        self.review_repo.add_index('place')
+        self.review_repo.add_index('user')
+        # A user reviews a place at most once
+        self.review_repo.add_index(('user', 'place'), unique=True)
+        self.place_repo.add_index('owner')
+        # Map views list the places of a bounding box
+        self.place_repo.add_spatial_index('latitude', 'longitude')
+        # Price and distance filters run as vectorized masks
+        self.place_repo.add_column_store(('price', 'latitude', 'longitude'))
+        self._build_search_indexes()
+
+    def _build_search_indexes(self):
+        """Set up the full-text indexes of places and reviews for q=
+        queries.
+
+        They live in this process and are filled by the first search,
+        rather than on startup. A thread consuming the change log then
+        keeps them up to date, off the write path.
+        """
+        if getattr(self, '_search_consumer', None) is not None:
+            self._search_consumer.stop()  # follows the replaced log
+        self.place_search = FullTextIndex(('title', 'description'))
+        self.review_search = FullTextIndex(('text',))
+        self._searches = {
+            'places': (self.place_search, self.place_repo),
+            'reviews': (self.review_search, self.review_repo)}
+        self._search_consumer = None
+        self._search_lock = threading.Lock()
+
+    def _search_index(self, entity):
+        """Return the full-text index of entity, with every write made
+        so far applied
+        """
+        with self._search_lock:
+            if self._search_consumer is None:
+                # Changes made while the objects are read are applied
+                # again by the consumer
+                after = self.changes.last_seq
+                for search, repo in self._searches.values():
+                    search.add_many(repo.get_all())
+                self._search_consumer = self.changes.consume(
+                    self._index_change, after=after)
+        search, repo = self._searches[entity]
+        repo.refresh()  # logs the writes made to shared data
+        self._search_consumer.drain()
+        return search
+
+    def _index_change(self, change):
+        """Apply a change to the search index of its entity"""
+        search, repo = self._searches.get(change.entity, (None, None))
+        if search is None:
+            return
+        if change.op == DELETE:
+            search.remove(change.id)
+        elif (change.op == ADD or change.fields is None or
+              set(change.fields) & set(search.fields)):
+            obj = repo.get(change.id)
+            if obj is not None:
+                search.add(obj)
+
+    def search_stats(self):
+        """Return the size and memory of the full-text indexes (empty
+        until the first search)
+        """
+        return {'places': self.place_search.stats(),
+                'reviews': self.review_search.stats()}
+
+    @staticmethod
+    def _search_page(search, repo, q, cursor, limit, keep=None):
+        """Return a page of the objects matching q, best first.
+
+        Cursors are ranks, and only the ranks up to the end of the page
+        are sorted and fetched.
+        """
+        start = decode_cursor(cursor)
+        top = None
+        if limit is not None and keep is None:
+            top = start + limit + 1
+        matches = (obj for obj in map(repo.get, search.search(q, top))
+                   if obj is not None and (keep is None or keep(obj)))
+        return page_of(
+            itertools.islice(enumerate(matches), start, None), limit)
+
+    def init_app(self, app):
+        """Switch to the backend configured for app.
+
+        The current repositories, and their data, are kept when the app
+        uses the same backend.
+        """
+        if backend_settings(app.config) != self._backend:
+            self.init_repositories(app.config)
+
+    @property
+    def backend(self):
+        """Name of the storage backend ('memory', 'sqlite'...)"""
+        return self._backend[0]
+
+    @property
+    def repositories(self):
+        return {
+            'users': self.user_repo,
+            'places': self.place_repo,
+            'reviews': self.review_repo,
+            'amenities': self.amenity_repo,
+        }
+
+    def load_snapshot(self, path):
+        """Serve the data of a snapshot file written by save_snapshot.
+
+        The file is memory-mapped and entities are only decoded when they
+        are first read, so startup does not depend on the data size.
+        """
+        snapshot = Snapshot(path)
+        for name, repo in self.repositories.items():
+            if name in snapshot.sections:
+                repo.load_snapshot(snapshot.sections[name])
+
+    def save_snapshot(self, path):
+        """Write the data of the in-memory repositories to a snapshot file"""
+        write_snapshot(path, {
+            name: repo.snapshot_section()
+            for name, repo in self.repositories.items()})
+
+    # ----- Change Feed -----
+    @staticmethod
+    def public_dict(obj):
+        """Return obj as its list endpoint shows it"""
+        return obj.to_public_dict()
+
+    @staticmethod
+    def public_list(objs, encoded=False):
+        """Return objs as their list endpoint shows them: a list of
+        dictionaries or, if encoded, the JSON array as bytes, joined from
+        the JSON the objects keep (see BaseModel.to_json)
+        """
+        if encoded:
+            return b'[' + b','.join([obj.to_json() for obj in objs]) + b']'
+        return [obj.to_public_dict() for obj in objs]
+
+    def get_changes(self, since=0, limit=None):
+        """Return the writes numbered after since, for clients syncing
+        incrementally.
+
+        Each object changed appears once, at the sequence number of its
+        last change, with its current data or as a tombstone if it was
+        deleted. Raises ResyncRequired (a ValueError) when since is
+        older than the change log retains; clients then reload the lists
+        and continue from the log's last_seq read beforehand.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be at least 1")
+        changes = self.changes.read(since, limit)
+        latest = {}
+        for change in changes:
+            key = (change.entity, change.id)
+            latest.pop(key, None)
+            latest[key] = change
+        items = []
+        for (entity, obj_id), change in latest.items():
+            obj = None
+            if change.op != DELETE:
+                obj = self.repositories[entity].get(obj_id)
+            item = {'seq': change.seq, 'type': entity, 'id': obj_id}
+            if obj is None:
+                item['deleted'] = True
+            else:
+                item['data'] = self.public_dict(obj)
+            items.append(item)
+        next_since = changes[-1].seq if changes else since
+        return {'changes': items,
+                'next_since': next_since,
+                'has_more': next_since < self.changes.last_seq}
 
     # ----- User Methods -----
     def create_user(self, user_data):
         user = User(**user_data)
         user.hash_password(user_data['password'])
-        self.user_repo.add(user)
+        # Checked atomically against concurrent registrations
+        if self.user_repo.add_if_absent(user, 'email') is not None:
+            raise ValueError("Email already registered")
         return user.to_dict()
 
     def get_user(self, user_id):
@@ -28,20 +235,18 @@ class HBnBFacade:
         return user.to_dict() if user else None
 
     def get_all_users(self):
-        users = [user.to_dict() for user in self.user_repo.get_all()]
-        for user in users:
-            user.pop('password', None)  # Exclude password from user dictionary
-        return users
+        return self.get_users_page()[0]
+
+    def get_users_page(self, cursor=None, limit=None, encoded=False):
+        """Return (users, next_cursor); see Repository.find"""
+        users, next_cursor = self.user_repo.find(limit=limit, cursor=cursor)
+        return self.public_list(users, encoded), next_cursor
 
     def update_user(self, user_id, user_data):
-        user = self.user_repo.get(user_id)
-        if not user:
+        # The repository only writes, and logs, the fields that changed
+        if self.user_repo.update(user_id, user_data) is None:
             return None
-
-        user.update(user_data)
-        user_dict = user.to_dict()
-        self.user_repo.update(user_id, user_dict)
-        return user_dict
+        return self.user_repo.get(user_id).to_dict()
 
     def delete_user(self, user_id):
         return self.user_repo.delete(user_id)
@@ -61,14 +266,13 @@ class HBnBFacade:
             k: v for k, v in place_data.items() if k != 'owner_id'}
 
         place = Place(owner=owner_id, **place_data_without_owner_id)
-        self.place_repo.add(place)
 
-        # Add amenities to the place
-        for amenity_id in amenities_ids:
-            amenity = self.amenity_repo.get(amenity_id)
+        # Add amenities to the place before storing it
+        for amenity in self.amenity_repo.get_many(amenities_ids):
             if amenity:
                 place.add_amenity(amenity)
 
+        self.place_repo.add(place)
         return place.to_dict_with_owner_id()
 
     def get_place(self, place_id):
@@ -76,33 +280,67 @@ class HBnBFacade:
         return place.to_dict() if place else None
 
     def get_all_places(self):
-        return [place.to_dict() for place in self.place_repo.get_all()]
+        return self.get_places_page()[0]
+
+    def get_places_by_owner(self, owner_id):
+        """Retrieve all places owned by a user"""
+        places, _ = self.place_repo.find(where={'owner': owner_id})
+        return [place.to_dict() for place in places]
+
+    @staticmethod
+    def place_filters(bbox=None, min_price=None, max_price=None, near=None):
+        """Return the find() conditions of the place list filters"""
+        where = {}
+        if bbox is not None:
+            where[('latitude', 'longitude')] = Within(bbox)
+        if near is not None:
+            if bbox is not None:
+                raise ValueError("bbox and near cannot be combined")
+            where[('latitude', 'longitude')] = Near(*near)
+        if min_price is not None or max_price is not None:
+            where['price'] = Range(min_price, max_price)
+        return where
+
+    def get_places_page(self, cursor=None, limit=None, bbox=None, q=None,
+                        min_price=None, max_price=None, near=None,
+                        encoded=False):
+        """Return (places, next_cursor), optionally only those inside
+        bbox = (min_lat, min_lon, max_lat, max_lon), within near =
+        (lat, lon, km), priced between min_price and max_price and/or
+        matching the search query q (then ordered by relevance).
+
+        With encoded, places is the JSON array as bytes (see
+        public_list), like for the other pages.
+        """
+        where = self.place_filters(bbox, min_price, max_price, near)
+        if q:
+            places, next_cursor = self._search_page(
+                self._search_index('places'), self.place_repo, q, cursor,
+                limit, matcher(conditions(where)) if where else None)
+        else:
+            places, next_cursor = self.place_repo.find(
+                where=where, limit=limit, cursor=cursor)
+        return self.public_list(places, encoded), next_cursor
 
     def update_place(self, place_id, place_data):
-        place = self.place_repo.get(place_id)
-        if not place:
-            return None
-
         owner_id = place_data.pop('owner_id', None)
         amenities_ids = place_data.pop('amenities', [])
 
         if owner_id:
             owner = self.user_repo.get(owner_id)
             if owner:
-                place.owner = owner_id
-
-        place.update(place_data)
+                place_data['owner'] = owner_id
 
         # Update amenities
-        place.amenities = []
-        for amenity_id in amenities_ids:
-            amenity = self.amenity_repo.get(amenity_id)
-            if amenity:
-                place.add_amenity(amenity)
+        place_data['amenities'] = [
+            amenity for amenity in self.amenity_repo.get_many(amenities_ids)
+            if amenity]
 
-        place_dict = place.to_dict()
-        self.place_repo.update(place_id, place_dict)
-        return place_dict
+        # The repository applies the whole change at once, and only
+        # writes the fields that changed
+        if self.place_repo.update(place_id, place_data) is None:
+            return None
+        return self.place_repo.get(place_id).to_dict()
 
     def delete_place(self, place_id):
         return self.place_repo.delete(place_id)
@@ -120,20 +358,45 @@ class HBnBFacade:
         return amenity.to_dict() if amenity else None
 
     def get_all_amenities(self):
-        return [amenity.to_dict() for amenity in self.amenity_repo.get_all()]
+        return self.get_amenities_page()[0]
+
+    def get_amenities_page(self, cursor=None, limit=None, encoded=False):
+        amenities, next_cursor = self.amenity_repo.find(
+            limit=limit, cursor=cursor)
+        return self.public_list(amenities, encoded), next_cursor
 
     def update_amenity(self, amenity_id, amenity_data):
-        amenity = self.amenity_repo.get(amenity_id)
-        if not amenity:
+        changed = self.amenity_repo.update(amenity_id, amenity_data)
+        if changed is None:
             return None
-
-        amenity.update(amenity_data)
-        amenity_dict = amenity.to_dict()
-        self.amenity_repo.update(amenity_id, amenity_dict)
-        return amenity_dict
+        amenity = self.amenity_repo.get(amenity_id)
+        if changed:
+            self._replace_amenity(amenity_id, amenity)
+        return amenity.to_dict()
 
     def delete_amenity(self, amenity_id):
-        return self.amenity_repo.delete(amenity_id)
+        deleted = self.amenity_repo.delete(amenity_id)
+        if deleted:
+            self._replace_amenity(amenity_id, None)
+        return deleted
+
+    def _replace_amenity(self, amenity_id, amenity):
+        """Update the places embedding an amenity with its new version,
+        or without it once deleted (amenity None).
+
+        Places keep a copy of each of their amenities, which writes to the
+        amenity do not change. Every place is read, as amenities are
+        rarely written.
+        """
+        updates = []
+        for place in self.place_repo.get_all():
+            if any(item.id == amenity_id for item in place.amenities):
+                updates.append((place.id, {'amenities': [
+                    item if item.id != amenity_id else amenity
+                    for item in place.amenities
+                    if item.id != amenity_id or amenity is not None]}))
+        if updates:
+            self.place_repo.update_many(updates)
 
     # ----- Review Methods -----
     def create_review(self, review_data):
@@ -166,7 +429,10 @@ class HBnBFacade:
             user=user_id,
             place=place_id,
             **review_data_without_place_id)
-        self.review_repo.add(review)
+        # Checked atomically against concurrent submissions
+        if self.review_repo.add_if_absent(
+                review, ('user', 'place')) is not None:
+            raise ValueError("You have already reviewed this place")
         return review.to_dict_with_ids()
 
     def get_review(self, review_id):
@@ -174,45 +440,45 @@ class HBnBFacade:
         return review.to_dict_with_ids() if review else None
 
     def get_all_reviews(self):
-        return [review.to_dict_with_ids()
-                for review in self.review_repo.get_all()]
+        return self.get_reviews_page()[0]
+
+    def get_reviews_page(self, cursor=None, limit=None, q=None,
+                         encoded=False):
+        """Return (reviews, next_cursor), optionally only those matching
+        the search query q (then ordered by relevance)
+        """
+        if q:
+            reviews, next_cursor = self._search_page(
+                self._search_index('reviews'), self.review_repo, q, cursor,
+                limit)
+        else:
+            reviews, next_cursor = self.review_repo.find(
+                limit=limit, cursor=cursor)
+        return self.public_list(reviews, encoded), next_cursor
 
-    # to fix
     def get_reviews_by_place(self, place_id):
         """Retrieve all reviews for a specific place"""
-        # Get all reviews from the repository
-        all_reviews = self.review_repo.get_all()
-
-        # Filter reviews by place_id
-        reviews_by_place_id = [
-            review for review in all_reviews if review.place == place_id]
-
-        # Convert each review to a dictionary with IDs
-        reviews_by_place_id_dicts = [
-            review.to_dict_with_ids() for review in reviews_by_place_id]
+        reviews, _ = self.review_repo.find(where={'place': place_id})
+        return [review.to_dict_with_ids() for review in reviews]
 
-        return reviews_by_place_id_dicts
+    def get_reviews_by_user(self, user_id):
+        """Retrieve all reviews written by a user"""
+        reviews, _ = self.review_repo.find(where={'user': user_id})
+        return [review.to_dict_with_ids() for review in reviews]
 
     def update_review(self, review_id, review_data):
-        review = self.review_repo.get(review_id)
-        if not review:
+        if self.review_repo.update(review_id, review_data) is None:
             return None
-
-        review.update(review_data)
-        review_dict = review.to_dict()
-        self.review_repo.update(review_id, review_dict)
-        return review.to_dict_with_ids()
+        return self.review_repo.get(review_id).to_dict_with_ids()
 
     def delete_review(self, review_id):
         return self.review_repo.delete(review_id)
 
     def get_user_review_for_place(self, user_id, place_id):
         """Check if a user has already reviewed a specific place."""
-        reviews = self.get_reviews_by_place(place_id)
-        for review in reviews:
-            if review['user_id'] == user_id:
-                return review
-        return None
+        reviews, _ = self.review_repo.find(
+            where={'user': user_id, 'place': place_id}, limit=1)
+        return reviews[0].to_dict_with_ids() if reviews else None
 
     # ----- Auth Methods -----
     def get_verified_user(self, email, password):
@@ -0,0 +1,165 @@
+import heapq
+import math
+import re
+import sys
+import threading
+
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into case-folded words"""
+    return _TOKEN.findall(text.casefold()) if text else []
+
+
+class FullTextIndex:
+    """In-process inverted index ranking documents with BM25.
+
+    A document is an object, identified by its id, whose attributes
+    named in fields are indexed together. Each term maps to a posting
+    list of {doc_id: term frequency}.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._postings = {}  # term -> {doc_id: term frequency}
+        self._terms = {}  # doc_id -> distinct terms of the document
+        self._lengths = {}  # doc_id -> number of tokens
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def _tokens(self, obj):
+        tokens = []
+        for field in self.fields:
+            value = getattr(obj, field, None)
+            if isinstance(value, str):
+                tokens.extend(tokenize(value))
+        return tokens
+
+    def add(self, obj):
+        """Index obj, replacing the previous version of it if any"""
+        tokens = self._tokens(obj)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        with self._lock:
+            self._remove(obj.id)
+            for term, frequency in frequencies.items():
+                self._postings.setdefault(term, {})[obj.id] = frequency
+            self._terms[obj.id] = tuple(frequencies)
+            self._lengths[obj.id] = len(tokens)
+            self._total_length += len(tokens)
+
+    def add_many(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query, top=None):
+        """Return the ids of the documents matching any query term.
+
+        Ids are ordered by decreasing BM25 score; with top, only the top
+        best are returned. Terms are scored rarest first, and once the
+        documents already scored are sure to hold the top ones, the
+        remaining (more common) terms only score those documents.
+        """
+        with self._lock:
+            count = len(self._lengths)
+            if not count:
+                return []
+            average = self._total_length / count or 1
+            lengths = self._lengths
+            short = K1 * (1 - B)
+            per_token = K1 * B / average
+            terms = []
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings:
+                    matches = len(postings)
+                    # A term adds less than weight to any score
+                    weight = math.log(
+                        1 + (count - matches + 0.5) / (matches + 0.5)
+                    ) * (K1 + 1)
+                    terms.append((weight, postings))
+            terms.sort(key=_weight, reverse=True)
+            bound = sum(weight for weight, _ in terms)
+            scores = {}
+            for weight, postings in terms:
+                if not scores:
+                    scores = {
+                        doc_id: weight * frequency /
+                        (frequency + short + per_token * lengths[doc_id])
+                        for doc_id, frequency in postings.items()}
+                    bound -= weight
+                    continue
+                if (top is not None and len(scores) >= top and
+                        heapq.nlargest(top, scores.values())[-1] >= bound):
+                    # Only the documents already scored can make the top
+                    if len(scores) < len(postings):
+                        entries = [(doc_id, postings[doc_id])
+                                   for doc_id in scores if doc_id in postings]
+                    else:
+                        entries = [(doc_id, frequency) for doc_id, frequency
+                                   in postings.items() if doc_id in scores]
+                else:
+                    entries = postings.items()
+                get = scores.get
+                for doc_id, frequency in entries:
+                    scores[doc_id] = get(doc_id, 0.0) + (
+                        weight * frequency /
+                        (frequency + short + per_token * lengths[doc_id]))
+                bound -= weight
+        if top is not None:
+            ranked = heapq.nlargest(top, scores.items(), key=_score)
+        else:
+            ranked = sorted(scores.items(), key=_score, reverse=True)
+        return [doc_id for doc_id, _ in ranked]
+
+    def stats(self):
+        """Return the size of the index, with an estimate of its memory.
+
+        bytes counts the index's own dicts, tuples, terms and integers;
+        the document ids are shared with the stored objects and are not
+        counted.
+        """
+        with self._lock:
+            size = sum(map(sys.getsizeof, (
+                self._postings, self._terms, self._lengths)))
+            postings = 0
+            for term, entries in self._postings.items():
+                postings += len(entries)
+                size += sys.getsizeof(term) + sys.getsizeof(entries)
+            size += sum(map(sys.getsizeof, self._terms.values()))
+            # Small ints are cached; only larger counts are allocated
+            size += sum(sys.getsizeof(length)
+                        for length in self._lengths.values() if length > 256)
+            return {'documents': len(self._lengths),
+                    'terms': len(self._postings),
+                    'postings': postings,
+                    'bytes': size}
+
+
+def _score(item):
+    return item[1]
+
+
+def _weight(term):
+    return term[0]
@@ -0,0 +1,144 @@
+"""Compare the throughput of concurrent place reads through the
+synchronous facade and the async one, over a backend with latency.
+
+Usage (from part3/):
+    python -m benchmarks.bench_async --requests 2000 --concurrency 1 16 256
+
+Every request reads a place and its reviews, as GET /places/<id> does.
+Each repository call first waits latency seconds, like a round trip to
+a database server. The synchronous facade serves requests from a pool
+of threads; the async facade runs them as coroutines, either through a
+ThreadedAsyncRepository (calls offloaded to a pool of as many threads)
+or through a natively asynchronous repository.
+"""
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.persistence.async_repository import ThreadedAsyncRepository
+from app.persistence.forwarding import ForwardingRepository
+from app.services.async_facade import AsyncHBnBFacade
+from app.services.facade import HBnBFacade
+from benchmarks.common import print_table
+
+
+class SlowRepository(ForwardingRepository):
+    """Repository blocking for latency seconds before each read"""
+
+    def __init__(self, repo, latency):
+        super().__init__(repo)
+        self.latency = latency
+
+    def get(self, obj_id):
+        time.sleep(self.latency)
+        return self.repo.get(obj_id)
+
+    def find(self, where=None, order_by=None, limit=None, cursor=None):
+        time.sleep(self.latency)
+        return self.repo.find(where, order_by, limit, cursor)
+
+
+class SlowAsyncRepository(ThreadedAsyncRepository):
+    """AsyncRepository awaiting latency seconds before each call"""
+
+    def __init__(self, repo, latency):
+        super().__init__(repo, offload=False)
+        self.latency = latency
+
+    async def _call(self, func, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return func(*args, **kwargs)
+
+
+def populate(places, reviews_per_place):
+    facade = HBnBFacade({'REPOSITORY': 'memory'})
+    owner = facade.create_user({
+        'first_name': "Ana", 'last_name': "Doe",
+        'email': "ana@example.com", 'password': "secret"})['id']
+    place_ids = []
+    for i in range(places):
+        place_ids.append(facade.create_place({
+            'title': f"Place {i}", 'description': "", 'price': 50.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': owner})['id'])
+    for n in range(reviews_per_place):
+        reviewer = facade.create_user({
+            'first_name': "Ben", 'last_name': "Doe",
+            'email': f"ben{n}@example.com", 'password': "secret"})['id']
+        for place_id in place_ids:
+            facade.create_review({'text': "Fine", 'rating': 4,
+                                  'user_id': reviewer,
+                                  'place_id': place_id})
+    return facade, place_ids
+
+
+def run_sync(facade, ids, concurrency):
+    def request(place_id):
+        place = facade.get_place(place_id)
+        place['reviews'] = facade.get_reviews_by_place(place_id)
+        return place
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(request, ids))
+    return len(ids) / (time.perf_counter() - start)
+
+
+def run_async(async_facade, ids, concurrency):
+    async def requests():
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(concurrency))
+        gate = asyncio.Semaphore(concurrency)
+
+        async def request(place_id):
+            async with gate:
+                return await async_facade.get_place_with_reviews(place_id)
+
+        await asyncio.gather(*map(request, ids))
+
+    start = time.perf_counter()
+    asyncio.run(requests())
+    return len(ids) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--places', type=int, default=1000)
+    parser.add_argument('--reviews', type=int, default=3,
+                        help='reviews per place')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds waited by every repository call')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 16, 256])
+    args = parser.parse_args()
+
+    facade, place_ids = populate(args.places, args.reviews)
+    ids = random.choices(place_ids, k=args.requests)
+    places, reviews = facade.place_repo, facade.review_repo
+    threaded = AsyncHBnBFacade(facade, {
+        'places': ThreadedAsyncRepository(
+            SlowRepository(places, args.latency)),
+        'reviews': ThreadedAsyncRepository(
+            SlowRepository(reviews, args.latency))})
+    native = AsyncHBnBFacade(facade, {
+        'places': SlowAsyncRepository(places, args.latency),
+        'reviews': SlowAsyncRepository(reviews, args.latency)})
+
+    table = []
+    for concurrency in args.concurrency:
+        facade.place_repo = SlowRepository(places, args.latency)
+        facade.review_repo = SlowRepository(reviews, args.latency)
+        sync_rate = run_sync(facade, ids, concurrency)
+        facade.place_repo, facade.review_repo = places, reviews
+        table.append([concurrency, f'{sync_rate:,.0f}',
+                      f'{run_async(threaded, ids, concurrency):,.0f}',
+                      f'{run_async(native, ids, concurrency):,.0f}'])
+    print(f"{args.latency * 1000:g} ms per repository call, "
+          f"{args.requests:,} requests")
+    print_table(['concurrency', 'sync threads', 'async offloaded',
+                 'async native'], table)
+
+
+if __name__ == '__main__':
+    main()
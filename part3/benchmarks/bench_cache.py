@@ -0,0 +1,70 @@
+"""Compare cached and uncached reads of a SQLite repository under a
+Zipfian access pattern.
+
+Usage (from part3/):
+    python -m benchmarks.bench_cache --rows 100000 --reads 200000
+
+The i-th most popular place is read with probability proportional to
+1 / i ** skew. TinyLFU admission is compared with a plain LRU cache of
+the same size.
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+from app.models import Place
+from app.persistence.caching import CachingRepository
+from app.persistence.sqlite_repository import SQLiteRepository
+from benchmarks.common import measure, print_table
+
+
+class LRURepository(CachingRepository):
+    """CachingRepository admitting every missed object"""
+
+    def _admits(self, obj_id, victim):
+        return True
+
+
+def zipf_reads(ids, count, skew):
+    weights = [1 / rank ** skew for rank in range(1, len(ids) + 1)]
+    cum_weights = list(itertools.accumulate(weights))
+    return random.choices(ids, cum_weights=cum_weights, k=count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--reads', type=int, default=200_000)
+    parser.add_argument('--skew', type=float, default=0.99)
+    parser.add_argument('--sizes', type=float, nargs='+',
+                        default=[0.01, 0.1],
+                        help='cache sizes, as shares of the rows')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite = SQLiteRepository(
+            os.path.join(directory, 'bench.db'), 'places')
+        places = [Place(f"Place {i}", "", 100.0, 0.0, 0.0, "owner-id")
+                  for i in range(args.rows)]
+        sqlite.add_many(places)
+        ids = [place.id for place in places]
+        random.shuffle(ids)
+        reads = zipf_reads(ids, args.reads, args.skew)
+
+        table = [['-', 'none', '-', f'{measure(sqlite.get, reads):,.0f}']]
+        for share in args.sizes:
+            size = max(1, int(args.rows * share))
+            for name, cache in (('LRU', LRURepository),
+                                ('TinyLFU', CachingRepository)):
+                repo = cache(sqlite, size)
+                rate = measure(repo.get, reads)
+                stats = repo.stats()
+                table.append([f'{size:,}', name, f"{stats['hit_ratio']:.1%}",
+                              f'{rate:,.0f}'])
+        sqlite.close()
+    print_table(['cache size', 'policy', 'hit ratio', 'reads/s'], table)
+
+
+if __name__ == '__main__':
+    main()
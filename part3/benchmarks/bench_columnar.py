@@ -0,0 +1,63 @@
+"""Time analytics-style place filters with and without the column store.
+
+Usage (from part3/):
+    python -m benchmarks.bench_columnar --places 100000 1000000
+
+Each query combines a price range with a region: a bounding box of a
+few degrees, or a 50 km radius around a random city centre.
+"""
+import argparse
+import random
+from app.persistence.query import Near, Range, Within
+from app.persistence.repository import InMemoryRepository
+from benchmarks.bench_spatial import make_places, time_queries
+from benchmarks.common import print_table
+
+AREA = ('latitude', 'longitude')
+
+
+def queries(centres, count):
+    for _ in range(count):
+        lat, lon = random.choice(centres)
+        low = random.uniform(20, 200)
+        price = Range(low, low + 50)
+        yield {'price': price,
+               AREA: Within((lat - 2, lon - 3, lat + 2, lon + 3))}
+        yield {'price': price, AREA: Near(lat, lon, 50)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--places', type=int, nargs='+',
+                        default=[100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--scans', type=int, default=4,
+                        help='full scans timed (they are slow)')
+    args = parser.parse_args()
+
+    table = []
+    for count in args.places:
+        places, centres = make_places(count)
+        for place in places:
+            place.price = random.uniform(10, 500)
+        wheres = list(queries(centres, args.queries))
+        scan = InMemoryRepository()
+        scan.add_many(places)
+        grid = InMemoryRepository()
+        grid.add_spatial_index('latitude', 'longitude')
+        grid.add_many(places)
+        columns = InMemoryRepository()
+        columns.add_column_store(('price', 'latitude', 'longitude'))
+        columns.add_many(places)
+        for name, repo, queried in (
+                ('column store', columns, wheres),
+                ('grid or scan', grid, wheres),
+                ('scan', scan, wheres[:args.scans])):
+            latency, found = time_queries(
+                lambda where: repo.find(where=where)[0], queried)
+            table.append([count, name, f'{found:,.0f}', f'{latency:,.3f}'])
+    print_table(['places', 'plan', 'places/query', 'ms/query'], table)
+
+
+if __name__ == '__main__':
+    main()
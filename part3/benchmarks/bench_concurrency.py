@@ -0,0 +1,95 @@
+"""Multi-threaded stress test of the in-memory repositories.
+
+Usage (from part3/):
+    python -m benchmarks.bench_concurrency --threads 1 2 4 8 16
+
+Every thread simulates requests: some GIL-releasing work (hashing, as
+bcrypt or socket I/O would do), then a registration through
+add_if_absent on a shared pool of emails, an indexed lookup and an
+update. The striped ConcurrentRepository is compared with the same
+store behind one global lock, and duplicate registrations are counted.
+"""
+import argparse
+import hashlib
+import threading
+import time
+from app.models import Amenity
+from app.persistence.concurrent import ConcurrentRepository
+from app.persistence.repository import InMemoryRepository
+from benchmarks.common import print_table
+
+
+class GlobalLockRepository(InMemoryRepository):
+    """Baseline: every mutation takes the same lock"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, obj):
+        with self._lock:
+            super().add(obj)
+
+    def update(self, obj_id, data):
+        with self._lock:
+            super().update(obj_id, data)
+
+    def delete(self, obj_id):
+        with self._lock:
+            return super().delete(obj_id)
+
+
+def stress(repo, threads, requests, pool, work):
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    payload = b'x' * work
+    registered = []
+
+    def client(n):
+        for i in range(requests):
+            if work:
+                hashlib.sha256(payload).digest()
+            amenity = Amenity(name=f"user{(n * requests + i) % pool}")
+            if repo.add_if_absent(amenity, 'name') is None:
+                registered.append(amenity.id)
+            found = repo.get_by_attribute('name', amenity.name)
+            repo.update(found.id, {'updated_at': amenity.created_at})
+
+    workers = [threading.Thread(target=client, args=(n,))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    duplicates = len(registered) - len(
+        {a.name for a in repo.get_all()})
+    return threads * requests / elapsed, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16])
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='requests per thread')
+    parser.add_argument('--pool', type=int, default=10000,
+                        help='distinct emails registered')
+    parser.add_argument('--work', type=int, default=256 * 1024,
+                        help='bytes hashed per request outside the GIL')
+    args = parser.parse_args()
+
+    rows = []
+    for threads in args.threads:
+        row = [threads]
+        for repo in (GlobalLockRepository(), ConcurrentRepository()):
+            rate, duplicates = stress(
+                repo, threads, args.requests, args.pool, args.work)
+            row += [f'{rate:,.0f}', duplicates]
+        rows.append(row)
+    print_table(['threads', 'global lock req/s', 'duplicates',
+                 'striped req/s', 'duplicates'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Measure id generation and newest-first pages.
+
+Usage (from part3/):
+    python -m benchmarks.bench_ids --rows 10000 100000
+
+Ids are generated with uuid4, as the models did before, and with the
+time-ordered new_id(). The first page of --page places ordered on '-id'
+is then read from an InMemoryRepository whose ids are time-ordered (a
+scan against insertion order) and from one whose ids are random (a
+sort of every place).
+"""
+import argparse
+import uuid
+from app.models import Place
+from app.models.ids import new_id
+from app.persistence.repository import InMemoryRepository
+from benchmarks.common import measure, print_table
+
+
+def newest_first_rate(rows, page, random_ids):
+    places = [Place(f"Place {i}", "", 100.0, 0.0, 0.0, "owner-id")
+              for i in range(rows)]
+    if random_ids:
+        for place in places:
+            place.id = str(uuid.uuid4())
+    repo = InMemoryRepository()
+    repo.add_many(places)
+    return measure(lambda _: repo.find(order_by='-id', limit=page),
+                   range(max(10, 1_000_000 // rows)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[10_000, 100_000])
+    parser.add_argument('--page', type=int, default=20)
+    args = parser.parse_args()
+
+    print_table(['generator', 'ids/s'], [
+        ['str(uuid.uuid4())',
+         f'{measure(lambda _: str(uuid.uuid4()), range(200_000)):,.0f}'],
+        ['new_id()', f'{measure(lambda _: new_id(), range(200_000)):,.0f}'],
+    ])
+    print()
+    print_table(
+        ['rows', 'random ids (pages/s)', 'time-ordered ids (pages/s)'],
+        [[f'{rows:,}',
+          f'{newest_first_rate(rows, args.page, True):,.0f}',
+          f'{newest_first_rate(rows, args.page, False):,.0f}']
+         for rows in args.rows])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Measure the memory taken by model instances.
+
+Usage (from part3/):
+    python -m benchmarks.bench_models --count 50000
+
+Entities are built as the API builds them, and as the repositories
+rebuild them from stored records (codec.decode). The memory allocated
+while they are kept alive, values included, is divided by their number;
+the list holding them is not counted. 'object' is the size of the
+instance itself, with its __dict__ if it has one.
+"""
+import argparse
+import copy
+import gc
+import sys
+import tracemalloc
+from app.models import User, Place, Review, Amenity
+from app.persistence.codec import encode, decode
+from benchmarks.common import print_table
+
+
+def build_user(template):
+    def build(n):
+        user = copy.copy(template)  # bcrypt is too slow to hash each one
+        user.id = f"{n:08d}-0000-4000-8000-000000000000"
+        user.email = f"user{n}@example.com"
+        return user
+    return build
+
+
+BUILDERS = {
+    'User': lambda: build_user(User("Ada", "Lovelace", "ada@example.com",
+                                    "secret")),
+    'Place': lambda: lambda n: Place(
+        f"Place {n}", "A quiet flat", 100.0 + n % 50, 48.85, 2.35,
+        "owner-id"),
+    'Review': lambda: lambda n: Review(
+        f"Great stay, number {n}", 4, "place-id", "user-id"),
+    'Amenity': lambda: lambda n: Amenity(f"Amenity {n}"),
+}
+
+
+def object_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def bytes_per_entity(build, count):
+    """Return the memory allocated per entity to keep count of them"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [build(n) for n in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return (used - sys.getsizeof(entities)) / count, entities[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50_000)
+    args = parser.parse_args()
+
+    table = []
+    for name, builder in BUILDERS.items():
+        build = builder()
+        built, sample = bytes_per_entity(build, args.count)
+        records = [encode(build(n)) for n in range(args.count)]
+        decoded, _ = bytes_per_entity(lambda n: decode(records[n]),
+                                      args.count)
+        del records
+        table.append([name, object_size(sample),
+                      f'{built:,.0f}', f'{decoded:,.0f}'])
+    print_table(['model', 'object', 'built (bytes)', 'decoded (bytes)'],
+                table)
+
+
+if __name__ == '__main__':
+    main()
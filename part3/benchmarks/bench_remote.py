@@ -0,0 +1,100 @@
+"""Measure the reads of a RemoteRepository served by another process.
+
+Usage (from part3/):
+    python -m benchmarks.bench_remote --rows 10000 --reads 20000
+
+Places are read one call per round trip, pipelined in frames of
+--batch calls, through get_many, and from several client threads
+sharing a connection pool. The in-process ConcurrentRepository is the
+baseline.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from app.models import Place
+from app.persistence.concurrent import ConcurrentRepository
+from app.persistence.remote import (
+    RemoteClient, RemoteRepository, RepositoryServer)
+from benchmarks.common import measure, print_table
+
+
+def serve(path, ready):
+    server = RepositoryServer(path)
+    ready.set()
+    server.serve_forever()
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def threaded_rate(repo, ids, threads):
+    chunks = [ids[n::threads] for n in range(threads)]
+    workers = [threading.Thread(target=lambda chunk=chunk: [
+        repo.get(obj_id) for obj_id in chunk]) for chunk in chunks]
+
+    def run():
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    return len(ids) / timed(run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--reads', type=int, default=20_000)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    places = [Place(f"Place {i}", "", 100.0, 0.0, 0.0, "owner-id")
+              for i in range(args.rows)]
+    ids = random.choices([place.id for place in places], k=args.reads)
+    local = ConcurrentRepository()
+    local.add_many(places)
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'repositories.sock')
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    server = context.Process(target=serve, args=(path, ready), daemon=True)
+    server.start()
+    ready.wait()
+    client = RemoteClient(path, pool_size=args.threads)
+    try:
+        repo = RemoteRepository(client, 'places')
+        repo.add_many(places)
+        calls = [('places', 'get', (obj_id,), {}) for obj_id in ids]
+        batches = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+        pipelined = len(ids) / timed(
+            lambda: client.call_many(calls, args.batch))
+        table = [
+            ['in process', f'{measure(local.get, ids):,.0f}'],
+            ['remote, one call per round trip',
+             f'{measure(repo.get, ids):,.0f}'],
+            [f'remote, pipelined ({args.batch} calls per frame)',
+             f'{pipelined:,.0f}'],
+            ['remote, get_many of 100 ids',
+             f'{measure(repo.get_many, batches) * 100:,.0f}'],
+            [f'remote, {args.threads} threads',
+             f'{threaded_rate(repo, ids, args.threads):,.0f}'],
+        ]
+    finally:
+        client.close()
+        server.terminate()
+        server.join()
+        os.remove(path)
+        os.rmdir(directory)
+    print_table(['reads', 'places/s'], table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compare the facade's CRUD calls on the in-memory and SQLite backends.
+
+Usage (from part3/):
+    python -m benchmarks.bench_repositories --rows 10000 100000 1000000
+
+Rows are seeded in batches through the repositories; users share one
+password hash so that seeding does not run bcrypt once per user.
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+from app.models import Amenity, User
+from app.models.ids import new_id
+from app.services.facade import HBnBFacade
+from benchmarks.common import measure, print_table
+
+
+def seed(facade, rows):
+    template = User("Bench", "User", "bench@example.com", "password")
+    users = []
+    for i in range(rows):
+        user = copy.copy(template)
+        user.id = new_id()
+        user.email = f"user{i}@example.com"
+        users.append(user)
+    facade.user_repo.add_many(users)
+    facade.amenity_repo.add_many(
+        Amenity(name=f"Amenity {i}") for i in range(rows))
+    return [user.email for user in users]
+
+
+def run(backend, rows, ops, directory):
+    config = {'REPOSITORY': backend,
+              'SQLITE_DATABASE': os.path.join(directory, f'bench{rows}.db')}
+    facade = HBnBFacade(config)
+    emails = seed(facade, rows)
+    amenities = list(facade.amenity_repo.get_all())
+    ids = [a.id for a in random.sample(amenities, ops)]
+    lookups = random.sample(emails, ops)
+    return [
+        ('create_amenity', measure(
+            facade.create_amenity,
+            ({'name': f"New {i}"} for i in range(ops)))),
+        ('get_amenity', measure(facade.get_amenity, ids)),
+        ('update_amenity', measure(
+            lambda amenity_id: facade.update_amenity(
+                amenity_id, {'name': "Renamed"}), ids)),
+        ('get_user_by_email', measure(facade.get_user_by_email, lookups)),
+        ('delete_amenity', measure(facade.delete_amenity, ids)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--ops', type=int, default=1000,
+                        help='calls timed per operation')
+    parser.add_argument('--backends', nargs='+', default=['memory', 'sqlite'])
+    args = parser.parse_args()
+
+    table = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            results = {backend: run(backend, rows, args.ops, directory)
+                       for backend in args.backends}
+            for i, (operation, _) in enumerate(results[args.backends[0]]):
+                table.append([rows, operation] + [
+                    f'{results[backend][i][1]:,.0f}'
+                    for backend in args.backends])
+    print_table(['rows', 'operation'] +
+                [f'{backend} ops/s' for backend in args.backends], table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Time full-text place searches and report the size of the index.
+
+Usage (from part3/):
+    python -m benchmarks.bench_search --documents 100000 1000000
+
+Titles and descriptions are drawn from a Zipf-distributed vocabulary,
+so queries mix rare, common and very common words. Each query returns
+the first page (--limit results) as the places endpoint does.
+"""
+import argparse
+import copy
+import random
+import time
+from app.models import Place
+from app.models.ids import new_id
+from app.services.search import FullTextIndex
+from benchmarks.common import print_table
+
+VOCABULARY = 50_000
+
+
+def make_words(count):
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    return random.choices(
+        [f'w{rank}' for rank in range(VOCABULARY)], weights, k=count)
+
+
+def make_places(count):
+    template = Place("", "", 100.0, 0.0, 0.0, "owner-id")
+    words = iter(make_words(count * 20))
+    places = []
+    for _ in range(count):
+        place = copy.copy(template)
+        place.id = new_id()
+        place.title = ' '.join(next(words) for _ in range(4))
+        place.description = ' '.join(next(words) for _ in range(16))
+        places.append(place)
+    return places
+
+
+def time_queries(index, queries, limit):
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, top=limit + 1)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, nargs='+',
+                        default=[100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    table = []
+    for count in args.documents:
+        index = FullTextIndex(('title', 'description'))
+        start = time.perf_counter()
+        index.add_many(make_places(count))
+        build = time.perf_counter() - start
+        stats = index.stats()
+        for name, ranks in (('rare', (1000, VOCABULARY)),
+                            ('common', (50, 1000)),
+                            ('very common', (0, 50))):
+            queries = [' '.join(f'w{random.randrange(*ranks)}'
+                                for _ in range(2))
+                       for _ in range(args.queries)]
+            latency = time_queries(index, queries, args.limit)
+            table.append([count, name, f'{latency:,.3f}'])
+        print(f'{count:,} documents: built in {build:.1f}s, '
+              f'{stats["terms"]:,} terms, {stats["postings"]:,} postings, '
+              f'{stats["bytes"] / 2 ** 20:,.0f} MiB')
+    print_table(['documents', 'query words', 'ms/query'], table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Measure how fast places are serialized for the list endpoints.
+
+Usage (from part3/):
+    python -m benchmarks.bench_serializers --rows 100000
+
+Places, a quarter of them with two amenities, are converted to
+dictionaries a page of --page at a time, then also to the JSON of the
+page. The generic loop, which the models used before their serializers
+were compiled, is the baseline. The pages are also joined from the JSON
+that the places keep (HBnBFacade.public_list with encoded=True), as the
+list endpoints do, once the JSON of every place is cached.
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from app.models import Place, Amenity
+from app.services.facade import HBnBFacade
+from benchmarks.common import print_table
+
+
+def loop_to_dict(obj):
+    """BaseModel.to_dict before the serializers were compiled"""
+    dictionary = {}
+    for key, value in obj.attributes().items():
+        if isinstance(value, datetime):
+            dictionary[key] = value.isoformat()
+        elif hasattr(value, 'to_dict'):
+            dictionary[key] = value.to_dict()
+        else:
+            dictionary[key] = value
+    return dictionary
+
+
+def loop_to_dict_with_owner_id(place):
+    place_dict = loop_to_dict(place)
+    place_dict['owner_id'] = place.owner
+    place_dict.pop('owner', None)
+    return place_dict
+
+
+def rate(serialize, pages, encode=False):
+    """Return the places serialized per second"""
+    count = 0
+    start = time.perf_counter()
+    for page in pages:
+        items = [serialize(place) for place in page]
+        if encode:
+            json.dumps(items, default=str)
+        count += len(items)
+    return count / (time.perf_counter() - start)
+
+
+def joined_rate(pages):
+    """Return the places per second of pages joined from cached JSON"""
+    for page in pages:
+        HBnBFacade.public_list(page, encoded=True)  # fills the caches
+    start = time.perf_counter()
+    for page in pages:
+        HBnBFacade.public_list(page, encoded=True)
+    return sum(map(len, pages)) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--page', type=int, default=100)
+    args = parser.parse_args()
+
+    amenities = [Amenity("Wi-Fi"), Amenity("Pool")]
+    places = []
+    for i in range(args.rows):
+        place = Place(f"Place {i}", "A quiet flat near the sea", 100.0,
+                      48.85, 2.35, "owner-id")
+        if i % 4 == 0:
+            for amenity in amenities:
+                place.add_amenity(amenity)
+        places.append(place)
+    pages = [places[i:i + args.page]
+             for i in range(0, len(places), args.page)]
+
+    serializers = [
+        ('to_dict, generic loop', loop_to_dict),
+        ('to_dict, compiled', Place.to_dict),
+        ('to_dict_with_owner_id, generic loop', loop_to_dict_with_owner_id),
+        ('to_dict_with_owner_id, compiled', Place.to_dict_with_owner_id),
+    ]
+    table = [[name, f'{rate(serialize, pages):,.0f}',
+              f'{rate(serialize, pages, encode=True):,.0f}']
+             for name, serialize in serializers]
+    table.append(['cached JSON, joined', '', f'{joined_rate(pages):,.0f}'])
+    print_table(['serializer', 'places/s', 'places/s with JSON'], table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Compare reads and writes of the shared-memory repository with the
+process-private in-memory one.
+
+Usage (from part3/):
+    python -m benchmarks.bench_shared --rows 100000 --processes 1 2 4
+
+Reads are id lookups and indexed lookups on a caught-up repository;
+"follow" is the rate at which another repository applies the writes
+it did not make. The last table forks reader processes that all open
+the same shared data.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import uuid
+from app.models import Place
+from app.persistence.concurrent import ConcurrentRepository
+from app.persistence.shared import SharedMemoryRepository
+from benchmarks.common import measure, print_table
+
+
+def make_places(count):
+    return [Place(f"Place {i}", "", 100.0, 0.0, 0.0, f"owner-{i % 1000}")
+            for i in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def read_in_process(name, ids, start, done):
+    repo = SharedMemoryRepository(name)
+    start.wait()
+    for obj_id in ids:
+        repo.get(obj_id)
+    done.put(len(ids))
+    repo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--reads', type=int, default=200_000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    places = make_places(args.rows)
+    ids = random.choices([place.id for place in places], k=args.reads)
+    owners = [f"owner-{i % 1000}" for i in range(args.reads // 10)]
+    name = f'hbnb-bench-{uuid.uuid4().hex[:8]}'
+    lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+
+    private = ConcurrentRepository()
+    writer = SharedMemoryRepository(name, lock_path=lock_path)
+    follower = SharedMemoryRepository(name, lock_path=lock_path)
+    table = []
+    try:
+        for label, repo in (('memory', private), ('shared', writer)):
+            repo.add_index('owner')
+            batch = places[:len(places) // 2]
+            add_rate = len(batch) / timed(lambda: repo.add_many(batch))
+            single = places[len(places) // 2:]
+            add_rate_single = len(single) / timed(
+                lambda: [repo.add(place) for place in single])
+            lookup_rate = measure(
+                lambda owner: repo.get_all_by_attribute('owner', owner),
+                owners)
+            table.append([label, f'{measure(repo.get, ids):,.0f}',
+                          f'{lookup_rate:,.0f}', f'{add_rate:,.0f}',
+                          f'{add_rate_single:,.0f}'])
+        follow_rate = args.rows / timed(follower.refresh)
+        print_table(['backend', 'get/s', 'indexed lookups/s',
+                     'batch adds/s', 'adds/s'], table)
+        print(f"\nfollow: {follow_rate:,.0f} writes/s applied by another "
+              "repository\n")
+
+        context = multiprocessing.get_context('fork')
+        rows = []
+        for count in args.processes:
+            # Timed once every reader loaded the data
+            start, done = context.Barrier(count + 1), context.Queue()
+            readers = [context.Process(
+                target=read_in_process,
+                args=(name, ids[:args.reads // count], start, done))
+                for _ in range(count)]
+            for reader in readers:
+                reader.start()
+            start.wait()
+            elapsed = timed(lambda: [done.get() for _ in readers])
+            for reader in readers:
+                reader.join()
+            reads = args.reads // count * count
+            rows.append([count, f'{reads / elapsed:,.0f}'])
+        print_table(['reader processes', 'get/s, all processes'], rows)
+    finally:
+        writer.unlink()
+        for repo in (writer, follower):
+            repo.close()
+        os.remove(lock_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Time bounding-box queries on places against a filtered full scan.
+
+Usage (from part3/):
+    python -m benchmarks.bench_spatial --places 100000 1000000
+
+Places are clustered around random city centres, and every query is a
+map view (about 0.2 x 0.3 degrees) centred on one of them.
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+from app.models import Place
+from app.models.ids import new_id
+from app.persistence.repository import InMemoryRepository
+from app.persistence.sqlite_repository import SQLiteRepository
+from benchmarks.common import print_table
+
+CITIES = 500
+
+
+def make_places(count):
+    centres = [(random.uniform(-50, 60), random.uniform(-170, 170))
+               for _ in range(CITIES)]
+    template = Place("Bench", "", 100.0, 0.0, 0.0, "owner-id")
+    places = []
+    for _ in range(count):
+        lat, lon = random.choice(centres)
+        place = copy.copy(template)
+        place.id = new_id()
+        place.latitude = random.gauss(lat, 0.3)
+        place.longitude = random.gauss(lon, 0.3)
+        places.append(place)
+    return places, centres
+
+
+def views(centres, count):
+    for lat, lon in random.sample(centres, count):
+        yield (lat - 0.1, lon - 0.15, lat + 0.1, lon + 0.15)
+
+
+def scan(repo, bbox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return [place for place in repo.get_all()
+            if min_lat <= place.latitude <= max_lat and
+            min_lon <= place.longitude <= max_lon]
+
+
+def time_queries(query, boxes):
+    """Return the mean latency in milliseconds and the mean result size"""
+    found = 0
+    start = time.perf_counter()
+    for bbox in boxes:
+        found += len(query(bbox))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(boxes) * 1000, found / len(boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--places', type=int, nargs='+',
+                        default=[100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scans', type=int, default=3,
+                        help='full scans timed (they are slow)')
+    args = parser.parse_args()
+
+    table = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.places:
+            places, centres = make_places(count)
+            boxes = list(views(centres, min(args.queries, CITIES)))
+            memory = InMemoryRepository()
+            memory.add_spatial_index('latitude', 'longitude')
+            memory.add_many(places)
+            sqlite = SQLiteRepository(
+                os.path.join(directory, f'bench{count}.db'), 'places')
+            sqlite.add_spatial_index('latitude', 'longitude')
+            sqlite.add_many(places)
+            for name, query, queried in (
+                    ('memory grid', lambda b: memory.within_bbox(b)[0],
+                     boxes),
+                    ('sqlite index', lambda b: sqlite.within_bbox(b)[0],
+                     boxes),
+                    ('memory scan', lambda b: scan(memory, b),
+                     boxes[:args.scans])):
+                latency, found = time_queries(query, queried)
+                table.append([count, name, f'{found:,.0f}',
+                              f'{latency:,.3f}'])
+            sqlite.close()
+    print_table(['places', 'query', 'places/view', 'ms/query'], table)
+
+
+if __name__ == '__main__':
+    main()
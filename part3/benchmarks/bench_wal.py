@@ -0,0 +1,90 @@
+"""Write throughput of the durable backend: fsync per op vs group commit.
+
+Usage (from part3/):
+    python -m benchmarks.bench_wal --threads 1 8 32 --recover 1000000
+
+--recover N also times the startup of a store holding N amenities,
+from a snapshot plus a log of N / 10 mutations made after it.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from app.models import Amenity
+from app.persistence.codec import encode
+from app.persistence.durable import DurableRepository
+from app.persistence.wal import OP_UPDATE
+from benchmarks.common import print_table
+
+
+def write_throughput(directory, commit_delay, threads, ops):
+    repo = DurableRepository(
+        directory, commit_delay=commit_delay, snapshot_every=0)
+
+    def writer():
+        for i in range(ops):
+            repo.add(Amenity(name=f"Amenity {i}"))
+
+    workers = [threading.Thread(target=writer) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    repo.close()
+    return threads * ops / elapsed
+
+
+def recovery_time(directory, rows):
+    repo = DurableRepository(directory, commit_delay=0, snapshot_every=0)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(rows)]
+    repo._put_many(amenities)  # straight into the snapshot, not the log
+    repo.checkpoint()
+    repo.close()
+    repo = DurableRepository(directory, commit_delay=0.01, snapshot_every=0)
+    for amenity in amenities[:rows // 10]:
+        amenity.name = "Renamed"
+        repo._wal.enqueue(OP_UPDATE, amenity.id, encode(amenity))
+    repo.close()
+
+    start = time.perf_counter()
+    repo = DurableRepository(directory)
+    seconds = time.perf_counter() - start
+    recovered = len(repo.get_all())
+    repo.close()
+    assert recovered == rows, f"recovered {recovered} of {rows} entities"
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--ops', type=int, default=200,
+                        help='adds per thread')
+    parser.add_argument('--delays', type=float, nargs='+',
+                        default=[0, 0.001, 0.005],
+                        help='group commit delays in seconds (0 = fsync/op)')
+    parser.add_argument('--recover', type=int, default=0, metavar='N')
+    args = parser.parse_args()
+
+    rows = []
+    for threads in args.threads:
+        row = [threads]
+        for delay in args.delays:
+            with tempfile.TemporaryDirectory() as directory:
+                adds = write_throughput(directory, delay, threads, args.ops)
+            row.append(f'{adds:,.0f}')
+        rows.append(row)
+    print_table(['threads'] + [
+        f'group {delay * 1000:g}ms adds/s' if delay else 'fsync/op adds/s'
+        for delay in args.delays], rows)
+
+    if args.recover:
+        with tempfile.TemporaryDirectory() as directory:
+            seconds = recovery_time(directory, args.recover)
+        print(f'\nRecovered {args.recover:,} entities in {seconds:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""Helpers shared by the benchmark scripts"""
+import time
+
+
+def measure(func, items):
+    """Call func on every item and return the number of calls per second"""
+    items = list(items)
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    return len(items) / elapsed if elapsed else float('inf')
+
+
+def print_table(headers, rows):
+    """Print rows as an aligned plain-text table"""
+    cells = [[str(cell) for cell in row] for row in [headers] + rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if n == 0:
+            print('  '.join('-' * width for width in widths))
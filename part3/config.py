@@ -5,6 +5,35 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'default_secret_key')
     DEBUG = False
+    # Storage backend of the facade: 'memory', 'sqlite', 'durable',
+    # 'shared' or 'remote'
+    REPOSITORY = os.getenv('HBNB_REPOSITORY', 'memory')
+    SQLITE_DATABASE = os.getenv('HBNB_SQLITE_DATABASE', 'hbnb.db')
+    # Write-ahead log of the 'durable' backend
+    DATA_DIRECTORY = os.getenv('HBNB_DATA_DIRECTORY', 'data')
+    WAL_COMMIT_DELAY = float(os.getenv('HBNB_WAL_COMMIT_DELAY', '0.002'))
+    SNAPSHOT_EVERY = int(os.getenv('HBNB_SNAPSHOT_EVERY', '100000'))
+    # Snapshot file the in-memory backend starts from, if it exists
+    SNAPSHOT_PATH = os.getenv('HBNB_SNAPSHOT_PATH')
+    # Shared memory segments of the 'shared' backend, and their initial
+    # size in bytes
+    SHARED_MEMORY_NAME = os.getenv('HBNB_SHARED_MEMORY_NAME', 'hbnb')
+    SHARED_MEMORY_SIZE = int(os.getenv('HBNB_SHARED_MEMORY_SIZE',
+                                       str(64 << 20)))
+    # Socket of the repository server used by the 'remote' backend (see
+    # app/persistence/remote.py), and connections per worker
+    REMOTE_SOCKET = os.getenv('HBNB_REMOTE_SOCKET', 'hbnb.sock')
+    REMOTE_POOL_SIZE = int(os.getenv('HBNB_REMOTE_POOL_SIZE', '4'))
+    # Objects cached by id in front of the 'sqlite' and 'durable' backends
+    # (0 disables the cache), and how many seconds they stay cached
+    CACHE_SIZE = int(os.getenv('HBNB_CACHE_SIZE', '0'))
+    CACHE_TTL = (float(os.getenv('HBNB_CACHE_TTL'))
+                 if os.getenv('HBNB_CACHE_TTL') else None)
+    # Latest writes kept by the change log (see app/persistence/changes.py)
+    CHANGE_LOG_SIZE = int(os.getenv('HBNB_CHANGE_LOG_SIZE', '65536'))
+    # Seconds a change stays in the feed (unset: until overwritten)
+    CHANGE_RETENTION = (float(os.getenv('HBNB_CHANGE_RETENTION'))
+                        if os.getenv('HBNB_CHANGE_RETENTION') else None)
 
 
 class DevelopmentConfig(Config):
@@ -13,6 +42,7 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     DEBUG = True
+    REPOSITORY = 'memory'
 
 
 class ProductionConfig(Config):
@@ -112,3 +112,25 @@ def test_delete_amenity(client, create_amenity):
     assert response.status_code == 404
     data = response.get_json()
     assert data["error"] == "Amenity not found"
+
+
+def test_get_amenities_by_page(client, create_amenity):
+    """Test following the cursors of the amenity list"""
+    created = {create_amenity(name) for name in ("Bar", "Spa", "Gym")}
+    seen, cursor = [], None
+    while True:
+        query = {'limit': 2}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/v1/amenities/', query_string=query)
+        assert response.status_code == 200
+        assert len(response.get_json()) <= 2
+        seen += [amenity["id"] for amenity in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen))
+    assert created <= set(seen)
+
+    response = client.get('/api/v1/amenities/?cursor=bogus')
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+from app.services import facade
+
+
+def test_change_feed_lists_each_object_once(client, create_amenity):
+    """Test reading the changes made after a sequence number"""
+    since = facade.changes.last_seq
+    kept = create_amenity("Sauna")
+    client.put(f'/api/v1/amenities/{kept}', json={"name": "Steam room"})
+    dropped = create_amenity("Hammock")
+    client.delete(f'/api/v1/amenities/{dropped}')
+
+    response = client.get(f'/api/v1/changes/?since={since}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [(c['type'], c['id']) for c in data['changes']] == [
+        ('amenities', kept), ('amenities', dropped)]
+    assert data['changes'][0]['data']['name'] == "Steam room"
+    assert data['changes'][1]['deleted'] is True
+    assert data['next_since'] == since + 4
+    assert data['has_more'] is False
+
+    response = client.get(f'/api/v1/changes/?since={since}&limit=1')
+    data = response.get_json()
+    assert data['changes'][0]['data']['name'] == "Steam room"
+    assert (data['next_since'], data['has_more']) == (since + 1, True)
+
+
+def test_change_feed_signals_resync(client):
+    """Test the resync signal for cursors the log does not hold"""
+    last_seq = facade.changes.last_seq
+    response = client.get(f'/api/v1/changes/?since={last_seq + 10}')
+    assert response.status_code == 410
+    assert response.get_json()['resync'] is True
+    assert response.get_json()['last_seq'] == last_seq
+
+    response = client.get('/api/v1/changes/?since=0&limit=0')
+    assert response.status_code == 400
@@ -163,3 +163,65 @@ def test_create_place_invalid_data(client, create_user, auth_header):
     data = response.get_json()
     assert data is not None, "Response JSON is None"
     assert "message" in data
+
+
+def test_get_places_in_bbox(client, create_user, create_place):
+    """Test listing the places of a bounding box"""
+    owner_id = create_user("Jane", "Map", "jane.map@example.com")
+    inside = create_place("Tokyo flat", "", 90.0, 35.68, 139.76,
+                          owner_id, "jane.map@example.com")
+    outside = create_place("Osaka flat", "", 80.0, 34.69, 135.50,
+                           owner_id, "jane.map@example.com")
+
+    response = client.get('/api/v1/places/?bbox=35.5,139.5,35.9,140.0')
+    assert response.status_code == 200
+    ids = [place["id"] for place in response.get_json()]
+    assert inside in ids
+    assert outside not in ids
+
+    response = client.get('/api/v1/places/?bbox=35.9,139.5,35.5,140.0')
+    assert response.status_code == 400
+    response = client.get('/api/v1/places/?bbox=north')
+    assert response.status_code == 400
+
+
+def test_search_places(client, create_user, create_place):
+    """Test searching places by title and description"""
+    owner_id = create_user("Sam", "Search", "sam.search@example.com")
+    cottage = create_place("Thatched cottage", "Cosy cottage in Devon",
+                           70.0, 50.7, -3.5, owner_id,
+                           "sam.search@example.com")
+    create_place("City flat", "Flat above a bakery", 90.0, 51.5, -0.1,
+                 owner_id, "sam.search@example.com")
+
+    response = client.get('/api/v1/places/?q=COTTAGE')
+    assert [place["id"] for place in response.get_json()] == [cottage]
+
+    response = client.get('/api/v1/places/?q=cottage&bbox=51,-1,52,0')
+    assert response.get_json() == []
+
+
+def test_filter_places_by_price_and_distance(client, create_user,
+                                             create_place):
+    """Test the price range and near filters"""
+    owner_id = create_user("Nia", "Near", "nia.near@example.com")
+    cheap = create_place("Lisbon room", "", 40.0, 38.72, -9.14,
+                         owner_id, "nia.near@example.com")
+    dear = create_place("Lisbon suite", "", 300.0, 38.71, -9.13,
+                        owner_id, "nia.near@example.com")
+    far = create_place("Porto room", "", 45.0, 41.15, -8.61,
+                       owner_id, "nia.near@example.com")
+
+    response = client.get('/api/v1/places/?near=38.72,-9.14,10')
+    ids = [place["id"] for place in response.get_json()]
+    assert cheap in ids and dear in ids and far not in ids
+
+    response = client.get(
+        '/api/v1/places/?near=38.72,-9.14,10&max_price=100')
+    assert [place["id"] for place in response.get_json()] == [cheap]
+
+    response = client.get('/api/v1/places/?near=38.72,-9.14')
+    assert response.status_code == 400
+    response = client.get(
+        '/api/v1/places/?near=38.72,-9.14,10&bbox=38,-10,39,-9')
+    assert response.status_code == 400
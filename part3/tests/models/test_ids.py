@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime, timedelta
+from app.models.amenity import Amenity
+from app.models.ids import id_time, new_id
+
+
+def test_ids_are_time_ordered_uuids():
+    ids = [new_id() for _ in range(10000)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(len(obj_id) == 36 for obj_id in ids)
+    assert uuid.UUID(ids[0]).version == 7
+    assert Amenity("Wi-Fi").id < Amenity("Pool").id
+
+
+def test_id_time_is_the_creation_time():
+    amenity = Amenity("Wi-Fi")
+
+    assert abs(id_time(amenity.id) - amenity.created_at) < timedelta(
+        seconds=1)
+    assert id_time(str(uuid.uuid4())) is None
+    assert id_time("not an id") is None
+    assert isinstance(id_time(new_id()), datetime)
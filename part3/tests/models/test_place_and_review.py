@@ -1,6 +1,8 @@
+import copy
 from app.models.place import Place
 from app.models.user import User
 from app.models.review import Review
+from app.models.amenity import Amenity
 
 
 def test_place_creation():
@@ -30,4 +32,55 @@ def test_place_creation():
     print("Place creation and relationship test passed!")
 
 
+def test_models_keep_their_attributes_in_slots():
+    place = Place("Loft", "Quiet", 80, 48.85, 2.35, "owner-id")
+    assert not hasattr(place, '__dict__')
+    assert place.created_at is place.updated_at
+    assert place.to_dict()['amenities'] == []
+    assert list(place.to_dict()) == [
+        'id', 'created_at', 'updated_at', 'title', 'description', 'price',
+        'latitude', 'longitude', 'owner', 'reviews', 'amenities']
+    assert place.update({'title': "Attic", 'price': 80.0, 'unknown': 1}) \
+        == {'title': "Attic"}
+    assert place.title == "Attic" and 'unknown' not in place.attributes()
+    saved_at = place.updated_at
+    assert place.update({'title': "Attic"}) == {}
+    assert place.updated_at is saved_at  # not saved again
+    # Related models compare by id and version: [] is no change from
+    # the initial (), nor is another instance of an amenity, but its
+    # updated version is
+    assert place.update({'amenities': []}) == {}
+    wifi = Amenity("Wi-Fi")
+    place.add_amenity(wifi)
+    assert place.update({'amenities': [copy.copy(wifi)]}) == {}
+    renamed = copy.copy(wifi)
+    renamed.update({'name': "Fiber"})
+    assert place.update({'amenities': [renamed]}) == {
+        'amenities': [renamed]}
+    review = Review.__new__(Review)  # as rebuilt from a partial record
+    review.text = "Great"
+    assert review.attributes() == {'text': "Great"}
+
+
+def test_serializers_rename_exclude_and_nest():
+    place = Place("Loft", "Quiet", 80, 48.85, 2.35, "owner-id")
+    place.add_amenity(Amenity("Wi-Fi"))
+    data = place.to_dict_with_owner_id()
+    assert data['owner_id'] == "owner-id" and 'owner' not in data
+    assert data['amenities'] == [place.amenities[0].to_dict()]
+    assert data['created_at'] == place.created_at.isoformat()
+    review = Review("Great", 5, place.id, "user-id")
+    assert review.to_dict_with_ids() == {
+        'id': review.id, 'created_at': review.created_at.isoformat(),
+        'updated_at': review.updated_at.isoformat(), 'text': "Great",
+        'rating': 5, 'place_id': place.id, 'user_id': "user-id"}
+    user = User("Ada", "Lovelace", "ada@example.com", "secret")
+    assert 'password' in user.to_dict()
+    assert 'password' not in user.to_public_dict()
+    # Instances with unset attributes take the generic path
+    del place.reviews
+    assert 'reviews' not in place.to_dict_with_owner_id()
+    assert place.to_dict_with_owner_id()['owner_id'] == "owner-id"
+
+
 test_place_creation()
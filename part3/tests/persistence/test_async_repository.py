@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.models import Place
+from app.persistence.async_repository import (
+    AsyncRepository, ThreadedAsyncRepository)
+from app.persistence.repository import InMemoryRepository
+
+
+def make_place(title, price=10.0):
+    return Place(title, "", price, 0.0, 0.0, "owner-id")
+
+
+@pytest.mark.parametrize('offload', [True, False])
+def test_threaded_async_repository_mirrors_the_sync_one(offload):
+    repo = InMemoryRepository()
+    repo.add_index('owner')
+    arepo = ThreadedAsyncRepository(repo, offload)
+
+    async def scenario():
+        places = [make_place(f"Place {i}", 10.0 * i) for i in range(3)]
+        for place in places:
+            await arepo.add(place)
+        assert (await arepo.get(places[0].id)).title == "Place 0"
+        assert await arepo.get("missing") is None
+        assert [p.title for p in await arepo.get_many(
+            [places[2].id, "missing"]) if p] == ["Place 2"]
+        assert len(await arepo.get_all()) == 3
+        assert len(await arepo.get_all_by_attribute(
+            'owner', "owner-id")) == 3
+
+        await arepo.update(places[1].id, {'title': "Renamed"})
+        assert (await arepo.get_by_attribute(
+            'title', "Renamed")).id == places[1].id
+
+        first, cursor = await arepo.page(limit=2)
+        rest, end = await arepo.page(cursor, 2)
+        assert len(first) == 2 and len(rest) == 1 and end is None
+
+        assert await arepo.delete(places[0].id)
+        found, _ = await arepo.find(where={'owner': "owner-id"})
+        assert len(found) == 2
+
+    asyncio.run(scenario())
+
+
+class SleepyRepository(AsyncRepository):
+    """Native AsyncRepository over a dict, waiting on every get"""
+
+    def __init__(self):
+        self.objs = {}
+        self.waiting = 0
+        self.max_waiting = 0
+
+    async def add(self, obj):
+        self.objs[obj.id] = obj
+
+    async def get(self, obj_id):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        await asyncio.sleep(0.01)
+        self.waiting -= 1
+        return self.objs.get(obj_id)
+
+    async def get_all(self):
+        return list(self.objs.values())
+
+    async def update(self, obj_id, data):
+        self.objs[obj_id].update(data)
+
+    async def delete(self, obj_id):
+        return self.objs.pop(obj_id, None) is not None
+
+    async def get_by_attribute(self, attr_name, attr_value):
+        return next((obj for obj in self.objs.values()
+                     if getattr(obj, attr_name) == attr_value), None)
+
+    async def find(self, where=None, order_by=None, limit=None, cursor=None):
+        objs = [obj for obj in self.objs.values()
+                if all(getattr(obj, attr) == value
+                       for attr, value in (where or {}).items())]
+        return objs[:limit], None
+
+
+def test_default_get_many_awaits_gets_concurrently():
+    repo = SleepyRepository()
+    places = [make_place(f"Place {i}") for i in range(4)]
+
+    async def scenario():
+        for place in places:
+            await repo.add(place)
+        found = await repo.get_many([p.id for p in places] + ["missing"])
+        assert found == places + [None]
+        assert len(await repo.get_all_by_attribute('title', "Place 1")) == 1
+
+    asyncio.run(scenario())
+    assert repo.max_waiting == 5
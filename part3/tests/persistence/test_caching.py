@@ -0,0 +1,104 @@
+from app.models.amenity import Amenity
+from app.persistence import repository_factory
+from app.persistence.caching import CachingRepository
+from app.persistence.repository import InMemoryRepository
+from app.persistence.sqlite_repository import SQLiteRepository
+
+
+class CountingRepository(InMemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get(self, obj_id):
+        self.reads += 1
+        return super().get(obj_id)
+
+    def get_many(self, obj_ids):
+        obj_ids = list(obj_ids)
+        self.reads += len(obj_ids)
+        return super().get_many(obj_ids)
+
+
+def _cached(maxsize=10, **kwargs):
+    inner = CountingRepository()
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(20)]
+    inner.add_many(amenities)
+    return CachingRepository(inner, maxsize, **kwargs), inner, amenities
+
+
+def test_reads_are_served_from_the_cache():
+    repo, inner, amenities = _cached()
+    first = amenities[0].id
+    assert repo.get(first).name == "Amenity 0"
+    assert repo.get(first).name == "Amenity 0"
+    assert inner.reads == 1
+
+    ids = [first, amenities[1].id, "missing", amenities[1].id]
+    assert [a and a.name for a in repo.get_many(ids)] == [
+        "Amenity 0", "Amenity 1", None, "Amenity 1"]
+    assert inner.reads == 3
+    stats = repo.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 3, 2)
+
+
+def test_writes_invalidate_cached_objects():
+    repo, inner, amenities = _cached()
+    amenity_id = amenities[0].id
+    repo.get(amenity_id)
+    repo.update(amenity_id, {'name': "Sauna"})
+    assert repo.get(amenity_id).name == "Sauna"
+    assert repo.delete(amenity_id) is True
+    assert repo.get(amenity_id) is None
+
+    repo.get(amenities[1].id)
+    repo.delete_many([amenities[1].id])
+    assert repo.get(amenities[1].id) is None
+
+
+def test_frequent_objects_are_kept_over_one_off_reads():
+    repo, inner, amenities = _cached(maxsize=4)
+    popular = [amenity.id for amenity in amenities[:4]]
+    for _ in range(5):
+        for amenity_id in popular:
+            repo.get(amenity_id)
+    for amenity in amenities[4:]:
+        repo.get(amenity.id)
+    stats = repo.stats()
+    assert stats['rejections'] == 16
+    assert stats['evictions'] == 0
+
+    reads = inner.reads
+    for amenity_id in popular:
+        repo.get(amenity_id)
+    assert inner.reads == reads
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    repo, inner, amenities = _cached(ttl=30, clock=lambda: now[0])
+    repo.get(amenities[0].id)
+    now[0] = 29.0
+    repo.get(amenities[0].id)
+    assert inner.reads == 1
+    now[0] = 31.0
+    repo.get(amenities[0].id)
+    assert inner.reads == 2
+    assert repo.stats()['expirations'] == 1
+
+
+def test_factory_caches_configured_backends(tmp_path):
+    factory = repository_factory({
+        'REPOSITORY': 'sqlite', 'CACHE_SIZE': 100,
+        'SQLITE_DATABASE': str(tmp_path / "hbnb.db")})
+    repo = factory('amenities')
+    assert isinstance(repo, CachingRepository)
+    assert isinstance(repo.repo, SQLiteRepository)
+    amenity = Amenity(name="Pool")
+    repo.add(amenity)
+    assert repo.get(amenity.id) is repo.get(amenity.id)
+    repo.close()
+
+    assert not isinstance(
+        repository_factory({'CACHE_SIZE': 100})('amenities'),
+        CachingRepository)
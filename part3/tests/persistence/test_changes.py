@@ -0,0 +1,109 @@
+import threading
+import pytest
+from app.models.amenity import Amenity
+from app.persistence.changes import (
+    ADD, DELETE, UPDATE, ChangeLog, CapturingRepository, ResyncRequired)
+from app.persistence.repository import InMemoryRepository
+
+
+def test_writes_are_logged_in_order():
+    log = ChangeLog()
+    repo = CapturingRepository(InMemoryRepository(), log, 'amenities')
+    wifi, pool = Amenity(name="Wi-Fi"), Amenity(name="Pool")
+    repo.add(wifi)
+    repo.add_many([pool])
+    repo.update(wifi.id, {'name': "Fiber", 'id': "other"})
+    repo.update(wifi.id, {'name': "Fiber"})  # changes nothing
+    repo.update("missing", {'name': "Ghost"})
+    repo.delete(pool.id)
+    repo.delete(pool.id)
+
+    assert [(c.seq, c.op, c.id, c.fields) for c in log.read()] == [
+        (1, ADD, wifi.id, None),
+        (2, ADD, pool.id, None),
+        (3, UPDATE, wifi.id, ('name',)),
+        (4, DELETE, pool.id, None)]
+    assert [c.seq for c in log.read(after=2, limit=1)] == [3]
+    assert log.read(after=4) == []
+
+
+def test_overwritten_changes_require_a_resync():
+    log = ChangeLog(capacity=3)
+    for i in range(5):
+        log.append(ADD, 'amenities', str(i))
+    assert (log.first_seq, log.last_seq) == (3, 5)
+    assert [c.id for c in log.read(after=2)] == ['2', '3', '4']
+    with pytest.raises(ResyncRequired):
+        log.read(after=1)
+    with pytest.raises(ResyncRequired):
+        log.read(after=6)
+
+
+def test_synchronous_subscribers_see_every_change():
+    log = ChangeLog()
+    seen = []
+    log.subscribe(seen.append)
+    log.append(ADD, 'places', 'a')
+    log.unsubscribe(seen.append)
+    log.append(ADD, 'places', 'b')
+    assert [c.id for c in seen] == ['a']
+
+
+def test_subscribers_do_not_block_other_writers():
+    log = ChangeLog()
+    entered, release = threading.Event(), threading.Event()
+
+    def slow(change):
+        if change.id == 'a':
+            entered.set()
+            release.wait(5)
+    log.subscribe(slow)
+    writer = threading.Thread(target=log.append, args=(ADD, 'places', 'a'))
+    writer.start()
+    assert entered.wait(5)
+    other = threading.Thread(target=log.append, args=(ADD, 'places', 'b'))
+    other.start()
+    other.join(1)
+    blocked = other.is_alive()
+    release.set()
+    writer.join()
+    other.join()
+    assert not blocked and log.last_seq == 2
+
+
+def test_consumer_thread_reports_back_pressure():
+    log = ChangeLog(capacity=4)
+    release = threading.Event()
+    seen = []
+
+    def slow(change):
+        release.wait()
+        seen.append(change.seq)
+
+    consumer = log.consume(slow, batch_size=1)
+    log.append(ADD, 'places', 'first')
+    for i in range(8):
+        log.append(ADD, 'places', str(i))
+    release.set()
+    assert consumer.drain(timeout=5)
+    consumer.stop()
+
+    stats = consumer.stats()
+    assert stats['position'] == 9
+    assert stats['lag'] == 0
+    assert stats['delivered'] + stats['dropped'] == 9
+    assert stats['dropped'] >= 4
+    assert seen == sorted(seen)
+
+
+def test_changes_expire_after_retention():
+    now = [0.0]
+    log = ChangeLog(retention=60, clock=lambda: now[0])
+    log.append(ADD, 'places', 'old')
+    now[0] = 50.0
+    log.append(ADD, 'places', 'new')
+    now[0] = 100.0
+    assert log.first_seq == 2
+    assert [c.id for c in log.read(after=1)] == ['new']
+    with pytest.raises(ResyncRequired):
+        log.read(after=0)
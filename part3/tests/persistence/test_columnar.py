@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from app.models.place import Place
+from app.persistence.columnar import ColumnStore
+from app.persistence.query import Eq, In, Near, Range, Within
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import Snapshot, write_snapshot
+
+
+def _point(obj_id, price, lat, lon):
+    return SimpleNamespace(id=obj_id, price=price, latitude=lat,
+                           longitude=lon)
+
+
+def test_select_combines_masks():
+    store = ColumnStore(('price', 'latitude', 'longitude'), capacity=2)
+    for obj in (_point('a', 50, 48.85, 2.35), _point('b', 150, 48.86, 2.34),
+                _point('c', 80, 51.50, -0.12), _point('d', None, 48.85, 2.35)):
+        store.insert(obj.id, store.key_of(obj))
+
+    assert store.select([('price', Range(high=100))]) == ['a', 'c']
+    assert store.select([('price', In([80, 150]))]) == ['b', 'c']
+    assert store.select([('price', Eq(50))]) == ['a']
+    paris = Near(48.8566, 2.3522, 5)
+    assert store.select([(('latitude', 'longitude'), paris)]) == [
+        'a', 'b', 'd']
+    assert store.select([(('latitude', 'longitude'), paris),
+                         ('price', Range(60))]) == ['b']
+    assert store.select([(('latitude', 'longitude'),
+                          Within((51, -1, 52, 0)))]) == ['c']
+    assert not store.covers('price', Eq("cheap"))
+
+
+def test_tombstones_and_compaction():
+    store = ColumnStore(('price',))
+    for i in range(10):
+        store.insert(str(i), (float(i),))
+    store.insert('3', (30.0,))
+    for i in range(6):
+        store.remove(str(i))
+    assert len(store) == 4
+    assert store.select([('price', Range(0))]) == ['6', '7', '8', '9']
+    assert store.indexed_key('9', None) == (9.0,)
+    store.insert('10', (10.0,))
+    assert store.select([('price', Range(9))]) == ['9', '10']
+
+
+def test_repository_plans_with_the_column_store():
+    repo = InMemoryRepository()
+    repo.add_column_store(('price', 'latitude', 'longitude'))
+    places = [Place("Flat", "", float(i), i / 100, i / 100, "owner-id")
+              for i in range(1000)]
+    repo.add_many(places)
+    repo.update(places[5].id, {'price': 500.5})
+    repo.delete(places[6].id)
+
+    where = {'price': Range(4, 8),
+             ('latitude', 'longitude'): Near(0, 0, 13)}
+    found, _ = repo.find(where=where)
+    assert [place.price for place in found] == [4.0, 7.0, 8.0]
+    plan = repo.explain(where=where)
+    assert plan['indexes'] == ['price,latitude,longitude']
+    assert plan['rows_examined'] == 3
+
+
+def test_snapshot_records_fill_the_columns_on_first_query(tmp_path):
+    source = InMemoryRepository()
+    source.add_many(Place("Flat", "", float(i), 0.0, 0.0, "owner-id")
+                    for i in range(10))
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {'places': source.snapshot_section()})
+    repo = InMemoryRepository()
+    repo.load_snapshot(Snapshot(path).sections['places'])
+    ids = list(repo._storage)
+
+    repo.add_column_store(('price', 'latitude', 'longitude'))
+    assert repo._storage._loaded == {}  # nothing decoded yet
+    repo.update(ids[1], {'title': "Loft"})
+    repo.update(ids[2], {'price': 50.0})
+    repo.delete(ids[3])
+    found, _ = repo.find(where={'price': Range(high=4)})
+    assert [place.price for place in found] == [0.0, 1.0, 4.0]
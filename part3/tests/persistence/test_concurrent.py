@@ -0,0 +1,91 @@
+import threading
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.persistence.concurrent import ConcurrentRepository
+
+
+def run_threads(target, count=8):
+    threads = [threading.Thread(target=target, args=(n,))
+               for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_add_if_absent_has_one_winner_per_value():
+    repo = ConcurrentRepository(stripes=4)
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    winners = []
+
+    def register(n):
+        for i in range(50):
+            amenity = Amenity(name=f"Amenity {i}")
+            if repo.add_if_absent(amenity, 'name') is None:
+                winners.append(amenity.id)
+
+    run_threads(register)
+    assert len(winners) == 50
+    assert sorted(a.id for a in repo.get_all()) == sorted(winners)
+
+
+def test_indexes_stay_consistent_under_concurrent_writes():
+    repo = ConcurrentRepository(stripes=4)
+    repo.add_index('name')
+    amenities = [Amenity(name="Wi-Fi") for _ in range(200)]
+
+    def churn(n):
+        mine = amenities[n::8]
+        for amenity in mine:
+            repo.add(amenity)
+        for amenity in mine[::2]:
+            repo.update(amenity.id, {'name': "Pool"})
+        for amenity in mine[1::4]:
+            repo.delete(amenity.id)
+
+    run_threads(churn)
+    stored = repo.get_all()
+    for name in ("Wi-Fi", "Pool"):
+        expected = sorted(a.id for a in stored if a.name == name)
+        assert sorted(repo._indexes['name'].lookup(name)) == expected
+    assert len(stored) == 200 - 8 * 6
+
+
+def test_add_if_absent_returns_existing():
+    repo = ConcurrentRepository()
+    repo.add_index('name', unique=True)
+    pool = Amenity(name="Pool")
+    assert repo.add_if_absent(pool, 'name') is None
+    assert repo.add_if_absent(Amenity(name="Pool"), 'name') is pool
+
+
+def test_batches_do_not_interleave_with_writers():
+    repo = ConcurrentRepository(stripes=4)
+    repo.add_index('name', unique=True)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(40)]
+    repo.add_many(amenities)
+    ids = [a.id for a in amenities]
+
+    def rename(n):
+        for _ in range(20):
+            repo.update_many((obj_id, {'name': f"{obj_id} {n}"})
+                             for obj_id in ids)
+
+    run_threads(rename, count=4)
+    suffixes = {a.name.rsplit(' ', 1)[1] for a in repo.get_all()}
+    assert len(suffixes) == 1
+
+
+def test_composite_unique_index_has_one_winner():
+    repo = ConcurrentRepository(stripes=4)
+    repo.add_index(('user', 'place'), unique=True)
+    winners = []
+
+    def review(n):
+        for place in range(30):
+            candidate = Review(f"Review {n}", 5, f"place-{place}", "ana")
+            if repo.add_if_absent(candidate, ('user', 'place')) is None:
+                winners.append(candidate.id)
+
+    run_threads(review)
+    assert len(winners) == len(repo.get_all()) == 30
@@ -0,0 +1,113 @@
+import os
+import threading
+from app.models.amenity import Amenity
+from app.persistence.durable import DurableRepository
+
+
+def test_mutations_survive_reopen(tmp_path):
+    repo = DurableRepository(str(tmp_path), commit_delay=0)
+    kept, renamed, deleted = (Amenity(name=name)
+                              for name in ("Wi-Fi", "Pool", "Gym"))
+    for amenity in (kept, renamed, deleted):
+        repo.add(amenity)
+    repo.update(renamed.id, {'name': "Spa"})
+    repo.delete(deleted.id)
+    repo.close()
+
+    reopened = DurableRepository(str(tmp_path))
+    assert reopened.get(kept.id).name == "Wi-Fi"
+    assert reopened.get(renamed.id).name == "Spa"
+    assert reopened.get(deleted.id) is None
+    assert reopened.get(kept.id).created_at == kept.created_at
+    reopened.close()
+
+
+def test_updates_log_only_the_changed_fields(tmp_path):
+    repo = DurableRepository(str(tmp_path), commit_delay=0)
+    amenity = Amenity(name="Wi-Fi")
+    repo.add(amenity)
+    assert repo.update(amenity.id, {'name': "Wi-Fi"}) == {}
+    assert repo.update_many([(amenity.id, {'name': "Fiber"}),
+                             ("missing", {'name': "Ghost"})]) == {
+        amenity.id: {'name': "Fiber"}}
+    updated = repo.get(amenity.id)
+    assert updated.updated_at is not amenity.updated_at
+    repo.close()
+    with open(repo._wal.path, 'rb') as log:
+        assert log.read().count(b'Fiber') == 1  # the patch, not the object
+
+    reopened = DurableRepository(str(tmp_path))
+    replayed = reopened.get(amenity.id)
+    assert (replayed.name, replayed.updated_at, replayed.created_at) == (
+        "Fiber", updated.updated_at, amenity.created_at)
+    reopened.close()
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    repo = DurableRepository(str(tmp_path), commit_delay=0)
+    amenity = Amenity(name="Wi-Fi")
+    repo.add(amenity)
+    repo.add(Amenity(name="Pool"))
+    repo.close()
+    # Simulate a crash in the middle of the last append
+    with open(repo._wal.path, 'r+b') as log:
+        log.truncate(os.path.getsize(repo._wal.path) - 5)
+
+    reopened = DurableRepository(str(tmp_path), commit_delay=0)
+    assert [a.id for a in reopened.get_all()] == [amenity.id]
+    reopened.add(Amenity(name="Sauna"))
+    reopened.close()
+
+    assert len(DurableRepository(str(tmp_path)).get_all()) == 2
+
+
+def test_checkpoint_bounds_replay(tmp_path):
+    repo = DurableRepository(str(tmp_path), commit_delay=0)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(10)]
+    for amenity in amenities:
+        repo.add(amenity)
+    repo.checkpoint()
+    repo.update(amenities[0].id, {'name': "After snapshot"})
+    repo.close()
+
+    assert len(repo._segments()) == 1
+    reopened = DurableRepository(str(tmp_path))
+    assert len(reopened.get_all()) == 10
+    assert reopened.get(amenities[0].id).name == "After snapshot"
+    reopened.close()
+
+
+def test_group_commit_with_concurrent_writers(tmp_path):
+    repo = DurableRepository(
+        str(tmp_path), commit_delay=0.001, snapshot_every=50)
+
+    def add_amenities():
+        for i in range(25):
+            repo.add(Amenity(name=f"Amenity {i}"))
+
+    threads = [threading.Thread(target=add_amenities) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with repo._checkpoint_lock:
+        repo.close()
+
+    reopened = DurableRepository(str(tmp_path))
+    assert len(reopened.get_all()) == 200
+    reopened.close()
+
+
+def test_batch_mutations_survive_reopen(tmp_path):
+    repo = DurableRepository(str(tmp_path), commit_delay=0)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(10)]
+    repo.add_many(amenities)
+    ids = [a.id for a in amenities]
+    repo.update_many([(ids[0], {'name': "Renamed"})])
+    assert repo.delete_many(ids[5:] + ["missing"]) == [True] * 5 + [False]
+    repo.close()
+
+    reopened = DurableRepository(str(tmp_path))
+    assert [a.name for a in reopened.get_all()] == [
+        "Renamed", "Amenity 1", "Amenity 2", "Amenity 3", "Amenity 4"]
+    reopened.close()
@@ -0,0 +1,128 @@
+import pytest
+from app.models.place import Place
+from app.persistence.query import In, Near, Range, Within
+from app.persistence.repository import InMemoryRepository
+from app.persistence.sqlite_repository import SQLiteRepository
+
+
+def _places():
+    return [Place(f"Place {i}", "", float(i), i / 10, i / 10, f"owner-{i % 5}")
+            for i in range(50)]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repo(request, tmp_path):
+    if request.param == 'memory':
+        repo = InMemoryRepository()
+    else:
+        repo = SQLiteRepository(str(tmp_path / "hbnb.db"), 'places')
+    repo.add_index('owner')
+    repo.add_spatial_index('latitude', 'longitude')
+    repo.add_many(_places())
+    return repo
+
+
+def _prices(objs):
+    return [place.price for place in objs]
+
+
+def test_find_combines_predicates(repo):
+    places, cursor = repo.find(where={'owner': 'owner-3',
+                                      'price': Range(10, 30)})
+    assert _prices(places) == [13.0, 18.0, 23.0, 28.0]
+    assert cursor is None
+
+    places, _ = repo.find(where={'owner': In(['owner-1', 'owner-2']),
+                                 ('latitude', 'longitude'):
+                                 Within((0.5, 0.5, 1.5, 1.5))})
+    assert _prices(places) == [6.0, 7.0, 11.0, 12.0]
+    assert repo.find(where={'owner': In([])}) == ([], None)
+
+    # (0.1, 0.1) is about 16 km from (0, 0)
+    places, _ = repo.find(where={('latitude', 'longitude'):
+                                 Near(0.0, 0.0, 16.0)})
+    assert _prices(places) == [0.0, 1.0]
+
+
+def test_find_orders_and_pages(repo):
+    where = {'price': Range(low=40)}
+    first, cursor = repo.find(where=where, order_by='-price', limit=4)
+    assert _prices(first) == [49.0, 48.0, 47.0, 46.0]
+    rest, cursor = repo.find(where=where, order_by='-price', limit=4,
+                             cursor=cursor)
+    assert _prices(rest) == [45.0, 44.0, 43.0, 42.0]
+
+    pages, cursor = [], None
+    while True:
+        places, cursor = repo.find(where={'owner': 'owner-0'}, limit=3,
+                                   cursor=cursor)
+        pages.append(_prices(places))
+        if cursor is None:
+            break
+    assert pages == [[0.0, 5.0, 10.0], [15.0, 20.0, 25.0],
+                     [30.0, 35.0, 40.0], [45.0]]
+
+
+def test_find_orders_on_id(repo):
+    ids = sorted(place.id for place in repo.get_all())
+    first, cursor = repo.find(order_by='-id', limit=5)
+    rest, _ = repo.find(order_by='-id', cursor=cursor)
+    assert [place.id for place in first + rest] == ids[::-1]
+    places, _ = repo.find(where={'owner': 'owner-2'}, order_by='id')
+    assert [place.id for place in places] == [
+        obj_id for obj_id in ids if repo.get(obj_id).owner == 'owner-2']
+
+
+def test_newest_first_is_a_range_scan():
+    repo = InMemoryRepository()
+    places = _places()
+    repo.add_many(places)
+
+    plan = repo.explain(order_by='-id', limit=5)
+    assert plan['order'] == 'seq'
+    assert plan['rows_examined'] == 6
+    assert repo.find(order_by='-id', limit=2)[0] == places[:-3:-1]
+
+    # An older id inserted last: sequence order is no longer id order
+    older = Place("Imported", "", 1.0, 0.0, 0.0, 'owner-0')
+    older.id = '00000000' + older.id[8:]
+    repo.add(older)
+    plan = repo.explain(order_by='id', limit=5)
+    assert plan['order'] == 'sort'
+    assert plan['rows_examined'] == 51
+    assert repo.find(order_by='id', limit=1)[0] == [older]
+
+
+def test_planner_reads_the_most_selective_index():
+    repo = InMemoryRepository()
+    repo.add_index('owner')
+    repo.add_index('title')
+    repo.add_spatial_index('latitude', 'longitude')
+    repo.add_many(_places())
+
+    plan = repo.explain(where={'owner': 'owner-1', 'title': "Place 6"})
+    assert plan['plan'] == 'index'
+    assert plan['indexes'] == ['title']
+    assert (plan['index_entries'], plan['rows_examined']) == (1, 1)
+    assert plan['returned'] == 1
+
+    plan = repo.explain(where={'owner': 'owner-1', ('latitude', 'longitude'):
+                               Within((0, 0, 2, 2))})
+    assert plan['plan'] == 'intersect'
+    assert plan['indexes'] == ['owner', 'latitude,longitude']
+    assert plan['rows_examined'] == plan['returned'] == 4
+
+    plan = repo.explain(where={'price': Range(high=9)}, limit=5)
+    assert plan['plan'] == 'scan'
+    assert plan['rows_examined'] == 6
+    assert plan['returned'] == 5
+
+
+def test_sqlite_explain_reports_indexes(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "hbnb.db"), 'places')
+    repo.add_index('owner')
+    repo.add_many(_places())
+
+    plan = repo.explain(where={'owner': 'owner-1'})
+    assert plan['indexes'] == ['places_owner']
+    assert plan['returned'] == 10
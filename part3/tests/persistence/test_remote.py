@@ -0,0 +1,139 @@
+import socket
+import threading
+from datetime import datetime
+import pytest
+from app.models import Place
+from app.models.amenity import Amenity
+from app.persistence.protocol import (
+    FRAME, INVALID, OK, dumps, loads, read_frame)
+from app.persistence.query import In, Near, Range, Within
+from app.persistence.remote import (
+    RemoteClient, RemoteRepository, RepositoryServer)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = RepositoryServer(str(tmp_path / 'repositories.sock'))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = RemoteClient(server.server_address, pool_size=2)
+    yield client
+    client.close()
+
+
+def test_values_round_trip():
+    place = Place("Loft", "Quiet", 80.5, 48.85, 2.35, "owner-id")
+    value = {'none': None, 'flags': [True, False], 'big': -2 ** 62,
+             ('lat', 'lon'): Within((1, 2, 3, 4)), 'when': datetime.now(),
+             'place': place, 'bytes': b'\x00\xff', 'price': Range(high=9)}
+    decoded = loads(dumps(value))
+    assert decoded['when'] == value['when']
+    assert decoded[('lat', 'lon')].bbox == (1, 2, 3, 4)
+    assert decoded['price'].high == 9 and decoded['price'].low is None
+    assert decoded['place'].to_dict() == place.to_dict()
+    assert {key: decoded[key] for key in ('none', 'flags', 'big', 'bytes')} \
+        == {key: value[key] for key in ('none', 'flags', 'big', 'bytes')}
+    with pytest.raises(ValueError):
+        dumps(2 ** 64)
+    with pytest.raises(ValueError):
+        loads(b'l\x05\x00\x00\x00N')
+
+
+def test_remote_repository_runs_calls_on_the_server(client):
+    repo = RemoteRepository(client, 'places')
+    repo.add_index('owner')
+    repo.add_column_store(('price', 'latitude', 'longitude'))
+    places = [Place(f"Place {i}", "", 10.0 * i, 0.0, 0.01 * i,
+                    f"owner-{i % 2}") for i in range(6)]
+    repo.add_many(places)
+    repo.update(places[1].id, {'title': "Renamed"})
+    assert repo.delete(places[0].id) is True
+
+    assert repo.get(places[1].id).title == "Renamed"
+    assert repo.get("missing") is None
+    assert [p.id for p in repo.get_all_by_attribute('owner', "owner-1")] == [
+        places[1].id, places[3].id, places[5].id]
+    found, cursor = repo.find(
+        where={'owner': In(["owner-0", "owner-1"]), 'price': Range(high=40)},
+        order_by='-price', limit=2)
+    assert [p.title for p in found] == ["Place 4", "Place 3"]
+    rest, _ = repo.find(
+        where={'owner': In(["owner-0", "owner-1"]), 'price': Range(high=40)},
+        order_by='-price', limit=2, cursor=cursor)
+    assert [p.title for p in rest] == ["Place 2", "Renamed"]
+    near, _ = repo.find(where={('latitude', 'longitude'): Near(0, 0, 3)})
+    assert len(near) == 2
+    assert repo.explain(where={'owner': "owner-0"})['indexes'] == ['owner']
+    first, cursor = repo.page(limit=3)
+    assert len(first) == 3 and len(repo.page(cursor)[0]) == 2
+
+
+def test_errors_are_raised_again_by_the_client(server, client):
+    repo = RemoteRepository(client, 'amenities')
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    repo.add(Amenity(name="Wi-Fi"))
+    with pytest.raises(ValueError):
+        repo.add(Amenity(name="WI-FI"))
+    with pytest.raises(ValueError):
+        repo.add_index('name', normalize=str.strip)
+    with pytest.raises(ValueError):
+        client.call('amenities', 'checkpoint')
+    # The connection is still usable after errors
+    assert repo.get_by_attribute('name', "wi-fi").name == "Wi-Fi"
+    # Indexes declared again, e.g. by another worker, are kept
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    assert len(server.repositories['amenities'].repo._indexes) == 1
+
+
+def test_unknown_model_attributes_are_refused(server):
+    # An Amenity with an attribute the model does not have
+    bogus = b'o' + dumps('Amenity') + dumps({'bogus': 1})
+    with pytest.raises(ValueError, match="no attribute 'bogus'"):
+        loads(bogus)
+    call = (b'l\x01\x00\x00\x00t\x04\x00\x00\x00' + dumps('amenities') +
+            dumps('add') + b't\x01\x00\x00\x00' + bogus + dumps({}))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(server.server_address)
+        stream = sock.makefile('rb')
+        sock.sendall(FRAME.pack(len(call), 7) + call)
+        request_id, [(status, message)] = read_frame(stream)
+        assert (request_id, status) == (7, INVALID)
+        # The connection still answers
+        hello = dumps([('', 'hello', ('test',), {})])
+        sock.sendall(FRAME.pack(len(hello), 8) + hello)
+        assert read_frame(stream) == (8, [(OK, 0)])
+
+
+def test_pipelined_calls_keep_their_order(client):
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(200)]
+    client.call_many([('amenities', 'add', (amenity,), {})
+                      for amenity in amenities], batch_size=16)
+    results = client.call_many(
+        [('amenities', 'get', (amenity.id,), {}) for amenity in amenities] +
+        [('amenities', 'delete', ("missing",), {})], batch_size=16)
+    assert [a.name for a in results[:-1]] == [a.name for a in amenities]
+    assert results[-1] is False
+
+
+def test_clients_are_told_of_the_writes_of_others(server):
+    first = RemoteClient(server.server_address)
+    second = RemoteClient(server.server_address)
+    seen = []
+    second_repo = RemoteRepository(second, 'amenities')
+    second_repo.watch(lambda op, obj_id: seen.append((op, obj_id)))
+    second_repo.refresh()
+    amenity = Amenity(name="Wi-Fi")
+    RemoteRepository(first, 'amenities').add(amenity)
+    second_repo.add(Amenity(name="Pool"))  # its own writes are not reported
+    RemoteRepository(first, 'amenities').delete(amenity.id)
+    second_repo.refresh()
+    assert seen == [('add', amenity.id), ('delete', amenity.id)]
+    first.close()
+    second.close()
@@ -0,0 +1,157 @@
+import pytest
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.persistence.repository import InMemoryRepository
+
+
+@pytest.fixture
+def repo():
+    """Amenity repository with a case-insensitive unique index on name"""
+    repo = InMemoryRepository()
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    return repo
+
+
+def test_get_by_attribute_uses_index(repo):
+    wifi = Amenity(name="Wi-Fi")
+    repo.add(wifi)
+    assert repo.get_by_attribute('name', "wi-fi") is wifi
+    assert repo.get_by_attribute('name', "Pool") is None
+
+
+def test_unique_index_rejects_duplicates(repo):
+    repo.add(Amenity(name="Pool"))
+    with pytest.raises(ValueError):
+        repo.add(Amenity(name="POOL"))
+    assert len(repo.get_all()) == 1
+
+
+def test_index_follows_update_and_delete(repo):
+    amenity = Amenity(name="Sauna")
+    repo.add(amenity)
+    repo.update(amenity.id, {'name': "Hammam"})
+    assert repo.get_by_attribute('name', "Sauna") is None
+    assert repo.get_by_attribute('name', "hammam").id == amenity.id
+
+    repo.delete(amenity.id)
+    assert repo.get_by_attribute('name', "Hammam") is None
+    repo.add(Amenity(name="Hammam"))
+
+
+def test_update_applies_and_returns_only_the_changes(repo):
+    amenity = Amenity(name="Wi-Fi")
+    repo.add(amenity)
+    stored = repo.get(amenity.id)
+    assert repo.update(amenity.id, {'name': "Wi-Fi", 'unknown': 1}) == {}
+    assert repo.get(amenity.id) is stored  # nothing was written
+    assert repo.update(amenity.id, {'name': "Fiber"}) == {'name': "Fiber"}
+    assert repo.get(amenity.id).updated_at is not stored.updated_at
+    assert stored.name == "Wi-Fi"  # stored objects are replaced, not changed
+    assert repo.update("missing", {'name': "Ghost"}) is None
+
+
+def test_update_rejects_taken_value(repo):
+    gym = Amenity(name="Gym")
+    repo.add(gym)
+    repo.add(Amenity(name="Spa"))
+    with pytest.raises(ValueError):
+        repo.update(gym.id, {'name': "spa"})
+    assert gym.name == "Gym"
+
+
+def test_non_unique_index_returns_oldest_match():
+    repo = InMemoryRepository()
+    first, second = Amenity(name="Wi-Fi"), Amenity(name="Wi-Fi")
+    repo.add(first)
+    repo.add(second)
+    repo.add_index('name')
+    assert repo.get_by_attribute('name', "Wi-Fi") is first
+    repo.delete(first.id)
+    assert repo.get_by_attribute('name', "Wi-Fi") is second
+
+
+def test_batch_operations_keep_input_order(repo):
+    amenities = [Amenity(name=name) for name in ("Wi-Fi", "Pool", "Gym")]
+    repo.add_many(amenities)
+    ids = [a.id for a in amenities]
+    assert [a.id for a in repo.get_all()] == ids
+    assert repo.get_many([ids[2], "missing", ids[0]]) == [
+        amenities[2], None, amenities[0]]
+
+    repo.update_many([(ids[0], {'name': "Fiber"}), ("missing", {}),
+                      (ids[1], {'name': "Spa"})])
+    assert [a.name for a in repo.get_many(ids)] == ["Fiber", "Spa", "Gym"]
+    assert repo.get_by_attribute('name', "spa").id == ids[1]
+
+    assert repo.delete_many([ids[1], "missing", ids[1]]) == [
+        True, False, False]
+    assert repo.get_by_attribute('name', "Spa") is None
+    assert len(repo.get_all()) == 2
+
+
+def test_batch_is_rejected_as_a_whole(repo):
+    repo.add(Amenity(name="Pool"))
+    with pytest.raises(ValueError):
+        repo.add_many([Amenity(name="Sauna"), Amenity(name="SAUNA")])
+    with pytest.raises(ValueError):
+        repo.add_many([Amenity(name="Gym"), Amenity(name="pool")])
+    assert [a.name for a in repo.get_all()] == ["Pool"]
+    assert repo.get_by_attribute('name', "Sauna") is None
+
+    gym = Amenity(name="Gym")
+    repo.add(gym)
+    with pytest.raises(ValueError):
+        repo.update_many([(gym.id, {'name': "Spa"}),
+                          (repo.get_by_attribute('name', "Pool").id,
+                           {'name': "spa"})])
+    assert repo.get(gym.id).name == "Gym"
+
+
+def test_page_follows_cursor_across_writes(repo):
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(5)]
+    repo.add_many(amenities)
+    first, cursor = repo.page(limit=2)
+    assert first == amenities[:2]
+
+    repo.delete(amenities[2].id)
+    repo.add(Amenity(name="Late"))
+    second, cursor = repo.page(cursor, limit=2)
+    assert second == amenities[3:]
+    last, cursor = repo.page(cursor, limit=2)
+    assert [a.name for a in last] == ["Late"]
+    assert cursor is None
+
+    assert repo.page()[0] == list(repo.get_all())
+    with pytest.raises(ValueError):
+        repo.page("not a cursor")
+
+
+def test_get_all_by_attribute_with_and_without_index():
+    repo = InMemoryRepository()
+    amenities = [Amenity(name=name) for name in ("Pool", "Gym", "Pool")]
+    repo.add_many(amenities)
+    assert repo.get_all_by_attribute('name', "Pool") == amenities[::2]
+
+    repo.add_index('name')
+    assert repo.get_all_by_attribute('name', "Pool") == amenities[::2]
+    repo.update(amenities[0].id, {'name': "Spa"})
+    assert [a.id for a in repo.get_all_by_attribute('name', "Pool")] == [
+        amenities[2].id]
+    assert repo.get_all_by_attribute('name', "Sauna") == []
+
+
+def test_composite_unique_index():
+    repo = InMemoryRepository()
+    repo.add_index(('user', 'place'), unique=True)
+    first = Review("Nice", 5, "loft", "ana")
+    assert repo.add_if_absent(first, ('user', 'place')) is None
+    assert repo.add_if_absent(
+        Review("Again", 1, "loft", "ana"), ('user', 'place')) is first
+    repo.add(Review("Nice", 4, "loft", "ben"))
+    repo.add(Review("Nice", 4, "cabin", "ana"))
+
+    assert repo.get_by_attribute(('user', 'place'), ("ana", "loft")) is first
+    with pytest.raises(ValueError):
+        repo.update(first.id, {'place': "cabin"})
+    repo.update(first.id, {'place': "castle"})
+    assert repo.get_by_attribute(('user', 'place'), ("ana", "loft")) is None
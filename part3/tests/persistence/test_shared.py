@@ -0,0 +1,104 @@
+import multiprocessing
+import uuid
+import pytest
+from app.models.amenity import Amenity
+from app.persistence.shared import SharedMemoryRepository
+
+
+@pytest.fixture
+def open_repo(tmp_path):
+    """Open repositories sharing one name, as separate workers would"""
+    name = f'hbnb-test-{uuid.uuid4().hex[:8]}'
+    opened = []
+
+    def open_repo(capacity=1 << 20):
+        repo = SharedMemoryRepository(
+            name, capacity, lock_path=str(tmp_path / 'lock'))
+        repo.add_index('name', unique=True)
+        opened.append(repo)
+        return repo
+    yield open_repo
+    opened[-1].unlink()
+    for repo in opened:
+        repo.close()
+
+
+def test_writes_are_seen_by_every_repository(open_repo):
+    first, second = open_repo(), open_repo()
+    kept, renamed, deleted = (Amenity(name=name)
+                              for name in ("Wi-Fi", "Pool", "Gym"))
+    first.add_many([kept, renamed, deleted])
+    second.update(renamed.id, {'name': "Spa"})
+    first.delete(deleted.id)
+
+    for repo in (first, second, open_repo()):
+        assert [a.name for a in repo.get_all()] == ["Wi-Fi", "Spa"]
+        assert repo.get_by_attribute('name', "Spa").id == renamed.id
+        assert repo.get(deleted.id) is None
+        assert repo.get(kept.id).created_at == kept.created_at
+
+
+def test_unique_indexes_hold_across_repositories(open_repo):
+    first, second = open_repo(), open_repo()
+    first.add(Amenity(name="Wi-Fi"))
+    with pytest.raises(ValueError):
+        second.add(Amenity(name="Wi-Fi"))
+    assert len(first.get_all()) == 1
+
+
+def test_compaction_keeps_cursors_and_late_readers(open_repo):
+    writer, idle = open_repo(capacity=4096), open_repo(capacity=4096)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(40)]
+    for amenity in amenities:
+        writer.add(amenity)
+    writer.delete_many([amenity.id for amenity in amenities[:30]])
+    # The idle repository missed several generations
+    for i in range(40):
+        writer.update(amenities[35].id, {'name': f"Renamed {i}"})
+    assert writer._generation > 2
+    late = open_repo(capacity=4096)
+
+    names = [a.name for a in writer.get_all()]
+    assert len(names) == 10 and "Renamed 39" in names
+    for repo in (idle, late):
+        assert [a.name for a in repo.get_all()] == names
+        for cursor in (None, writer.page(limit=4)[1]):
+            page, next_cursor = repo.page(cursor, 4)
+            expected, expected_cursor = writer.page(cursor, 4)
+            assert [a.id for a in page] == [a.id for a in expected]
+            assert next_cursor == expected_cursor
+
+
+def test_watchers_see_the_writes_of_others(open_repo):
+    first, second = open_repo(), open_repo()
+    seen = []
+    second.watch(lambda op, obj_id: seen.append((op, obj_id)))
+    amenity = Amenity(name="Wi-Fi")
+    first.add(amenity)
+    first.update(amenity.id, {'name': "Pool"})
+    second.add(Amenity(name="Gym"))  # its own writes are not reported
+    first.delete(amenity.id)
+    second.refresh()
+    assert seen == [('add', amenity.id), ('update', amenity.id),
+                    ('delete', amenity.id)]
+
+
+def _add_amenities(name, lock_path, count):
+    repo = SharedMemoryRepository(name, 1 << 20, lock_path=lock_path)
+    repo.add_many([Amenity(name=f"Child {i}") for i in range(count)])
+    repo.close()
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                    reason="needs fork")
+def test_other_processes_share_the_data(open_repo, tmp_path):
+    repo = open_repo()
+    repo.add(Amenity(name="Parent"))
+    child = multiprocessing.get_context('fork').Process(
+        target=_add_amenities,
+        args=(repo.name, str(tmp_path / 'lock'), 5))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert len(repo.get_all()) == 6
+    assert repo.get_by_attribute('name', "Child 4") is not None
@@ -0,0 +1,130 @@
+import pytest
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import Snapshot, write_snapshot
+from app.services.facade import HBnBFacade
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """Snapshot of an amenity repository indexed by case-folded name"""
+    repo = InMemoryRepository()
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    for name in ("Wi-Fi", "Pool", "Gym"):
+        repo.add(Amenity(name=name))
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {'amenities': repo.snapshot_section()})
+    return path
+
+
+def load(path):
+    repo = InMemoryRepository()
+    repo.load_snapshot(Snapshot(path).sections['amenities'])
+    repo.add_index('name', unique=True, normalize=str.casefold)
+    return repo
+
+
+def test_records_are_decoded_on_first_access(snapshot_path):
+    repo = load(snapshot_path)
+    assert repo._storage._loaded == {}
+
+    pool = repo.get_by_attribute('name', "POOL")
+    assert pool.name == "Pool"
+    assert repo._storage._loaded == {pool.id: pool}
+    assert repo.get(pool.id) is pool
+    assert [a.name for a in repo.get_all()] == ["Wi-Fi", "Pool", "Gym"]
+
+
+def test_changes_override_snapshot(snapshot_path):
+    repo = load(snapshot_path)
+    gym = repo.get_by_attribute('name', "Gym")
+    with pytest.raises(ValueError):
+        repo.add(Amenity(name="wi-fi"))
+
+    repo.update(gym.id, {'name': "Spa"})
+    assert repo.get_by_attribute('name', "Gym") is None
+    assert repo.get_by_attribute('name', "Spa").id == gym.id
+
+    wifi = repo.get_by_attribute('name', "Wi-Fi")
+    assert repo.delete(wifi.id) is True
+    assert repo.get(wifi.id) is None
+    repo.add(Amenity(name="Wi-Fi"))
+    assert len(repo.get_all()) == 3
+
+
+def test_only_deleted_snapshot_records_are_shadowed(snapshot_path):
+    repo = load(snapshot_path)
+    index = repo._indexes['name']
+    gym = repo.get_by_attribute('name', "Gym")
+    for i in range(100):
+        repo.update(gym.id, {'name': f"Gym {i}"})
+        spa = Amenity(name=f"Spa {i}")
+        repo.add(spa)
+        repo.delete(spa.id)
+    assert index._shadowed == set()
+
+    pool = repo.get_by_attribute('name', "Pool")
+    repo.delete(gym.id)
+    repo.delete(pool.id)
+    assert index._shadowed == {gym.id, pool.id}
+    assert repo.get_by_attribute('name', "Pool") is None
+    repo.add(Amenity(name="Pool"))
+    assert index._shadowed == {gym.id, pool.id}
+    assert repo.get_by_attribute('name', "Pool").id != pool.id
+
+
+def test_pages_span_snapshot_and_new_records(snapshot_path):
+    repo = load(snapshot_path)
+    wifi = repo.get_by_attribute('name', "Wi-Fi")
+    repo.delete(repo.get_by_attribute('name', "Pool").id)
+    repo.add(Amenity(name="Spa"))
+    repo.update(wifi.id, {'name': "Fiber"})
+
+    names, cursor = [], None
+    while True:
+        page, cursor = repo.page(cursor, limit=2)
+        names.append([a.name for a in page])
+        if cursor is None:
+            break
+    assert names == [["Fiber", "Gym"], ["Spa"]]
+
+
+def test_composite_index_is_stored(tmp_path):
+    repo = InMemoryRepository()
+    repo.add_index(('user', 'place'), unique=True)
+    repo.add(Review("Nice", 5, "loft", "ana"))
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {'reviews': repo.snapshot_section()})
+
+    loaded = InMemoryRepository()
+    loaded.load_snapshot(Snapshot(path).sections['reviews'])
+    loaded.add_index(('user', 'place'), unique=True)
+    with pytest.raises(ValueError):
+        loaded.add(Review("Again", 1, "loft", "ana"))
+    assert loaded._storage._loaded == {}
+
+
+def test_rejects_unknown_files(tmp_path):
+    path = tmp_path / "not-a-snapshot.bin"
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_facade_starts_from_snapshot(tmp_path):
+    path = str(tmp_path / "hbnb.snapshot")
+    facade = HBnBFacade()
+    user = facade.create_user({
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "email": "jane@example.com",
+        "password": "12345678"
+    })
+    amenity = facade.create_amenity({'name': "Pool"})
+    facade.save_snapshot(path)
+
+    restarted = HBnBFacade({'SNAPSHOT_PATH': path})
+    assert restarted.get_amenity(amenity['id'])['name'] == "Pool"
+    assert restarted.get_verified_user("JANE@example.com", "12345678")
+    assert restarted.get_user(user['id'])['password'] == user['password']
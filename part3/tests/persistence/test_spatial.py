@@ -0,0 +1,117 @@
+import sys
+import threading
+import pytest
+from app.models.place import Place
+from app.persistence.concurrent import ConcurrentRepository
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import Snapshot, write_snapshot
+from app.persistence.spatial import GridIndex
+from app.persistence.sqlite_repository import SQLiteRepository
+
+PARIS = (48.8566, 2.3522)
+VERSAILLES = (48.8049, 2.1204)
+LYON = (45.764, 4.8357)
+PARIS_AREA = (48.5, 1.5, 49.2, 3.0)
+
+
+def place(title, point):
+    return Place(title, "", 100.0, point[0], point[1], "owner-id")
+
+
+@pytest.fixture(params=['memory', 'concurrent', 'sqlite'])
+def repo(request, tmp_path):
+    if request.param == 'sqlite':
+        repo = SQLiteRepository(str(tmp_path / "hbnb.db"), 'places')
+    elif request.param == 'concurrent':
+        repo = ConcurrentRepository()
+    else:
+        repo = InMemoryRepository()
+    repo.add_spatial_index('latitude', 'longitude')
+    return repo
+
+
+def titles(page):
+    return [p.title for p in page[0]]
+
+
+def test_grid_checks_border_cells_only():
+    index = GridIndex('latitude', 'longitude', cell_size=1.0)
+    index.insert('a', (10.5, 10.5))
+    index.insert('b', (12.9, 12.1))
+    index.insert('c', (9.9, 10.5))
+    assert sorted(index.within(10.2, 10.2, 13.0, 13.0)) == ['a', 'b']
+    assert index.within(-90, -180, 90, 180) == ['a', 'b', 'c']
+    index.insert('a', (0.0, 0.0))
+    index.remove('b')
+    assert index.within(10.2, 10.2, 13.0, 13.0) == []
+
+
+def test_grid_cells_survive_concurrent_writers():
+    # Distinct points of one cell, whose dict empties and is dropped
+    # over and over while the other threads insert into it
+    grid = GridIndex('latitude', 'longitude')
+    errors = []
+
+    def churn(n):
+        try:
+            for i in range(20000):
+                grid.insert(f"{n}-{i}", (48.851 + n / 10000, 2.351))
+                grid.remove(f"{n}-{i}")
+            grid.insert(f"{n}-kept", (48.851 + n / 10000, 2.351))
+        except KeyError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=churn, args=(n,)) for n in range(8)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert sorted(grid.within(48.85, 2.35, 48.86, 2.36)) == sorted(
+        f"{n}-kept" for n in range(8))
+
+
+def test_bbox_follows_writes(repo):
+    paris, versailles, lyon = (
+        place(title, point) for title, point in
+        (("Paris", PARIS), ("Versailles", VERSAILLES), ("Lyon", LYON)))
+    repo.add_many([paris, versailles, lyon])
+    assert titles(repo.within_bbox(PARIS_AREA)) == ["Paris", "Versailles"]
+
+    repo.update(lyon.id, {'latitude': 48.9, 'longitude': 2.4})
+    repo.delete(paris.id)
+    assert titles(repo.within_bbox(PARIS_AREA)) == ["Versailles", "Lyon"]
+
+    first, cursor = repo.within_bbox(PARIS_AREA, limit=1)
+    assert [p.title for p in first] == ["Versailles"]
+    assert titles(repo.within_bbox(PARIS_AREA, cursor, 1)) == ["Lyon"]
+
+
+def test_snapshot_records_are_indexed_on_first_query(tmp_path):
+    source = InMemoryRepository()
+    source.add_many(place(title, point) for title, point in (
+        ("Paris", PARIS), ("Versailles", VERSAILLES), ("Lyon", LYON)))
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {'places': source.snapshot_section()})
+    repo = InMemoryRepository()
+    repo.load_snapshot(Snapshot(path).sections['places'])
+    paris, versailles, lyon = list(repo._storage)
+
+    repo.add_spatial_index('latitude', 'longitude')
+    assert repo._storage._loaded == {}  # nothing decoded yet
+    repo.update(paris, {'title': "Paris 1er"})
+    repo.update(lyon, {'latitude': 48.9, 'longitude': 2.4})
+    repo.delete(versailles)
+    repo.add(place("Meaux", (48.96, 2.88)))
+    assert titles(repo.within_bbox(PARIS_AREA)) == [
+        "Paris 1er", "Lyon", "Meaux"]
+
+
+def test_bbox_requires_a_spatial_index():
+    with pytest.raises(ValueError):
+        InMemoryRepository().within_bbox(PARIS_AREA)
@@ -0,0 +1,153 @@
+import threading
+import pytest
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.review import Review
+from app.persistence.sqlite_repository import SQLiteRepository
+from app.services.facade import HBnBFacade
+
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / "hbnb.db")
+
+
+def test_crud_round_trip(database):
+    repo = SQLiteRepository(database, 'amenities')
+    amenity = Amenity(name="Wi-Fi")
+    repo.add(amenity)
+
+    stored = repo.get(amenity.id)
+    assert stored.name == "Wi-Fi"
+    assert stored.created_at == amenity.created_at
+
+    repo.update(amenity.id, {'name': "Fiber"})
+    assert repo.get(amenity.id).name == "Fiber"
+    assert [a.id for a in repo.get_all()] == [amenity.id]
+
+    assert repo.delete(amenity.id) is True
+    assert repo.delete(amenity.id) is False
+    assert repo.get(amenity.id) is None
+
+
+def test_nested_amenities_survive_storage(database):
+    repo = SQLiteRepository(database, 'places')
+    place = Place("Loft", "Bright", 80.0, 48.85, 2.35, "owner-id")
+    place.add_amenity(Amenity(name="Pool"))
+    repo.add(place)
+
+    stored = repo.get(place.id)
+    assert stored.amenities[0].name == "Pool"
+    assert stored.owner == "owner-id"
+
+
+def test_indexed_and_unindexed_lookups(database):
+    repo = SQLiteRepository(database, 'amenities')
+    repo.add(Amenity(name="Pool"))
+    repo.add_index('name', unique=True, normalize=str.casefold)
+
+    assert repo.get_by_attribute('name', "POOL").name == "Pool"
+    with pytest.raises(ValueError):
+        repo.add(Amenity(name="pool"))
+
+    sauna = Amenity(name="Sauna")
+    repo.add(sauna)
+    assert repo.get_by_attribute('id', sauna.id).name == "Sauna"
+    assert repo.get_by_attribute('name', "Gym") is None
+
+
+def test_get_all_by_attribute(database):
+    repo = SQLiteRepository(database, 'reviews')
+    reviews = [Review("Nice", 4, place, "user-id")
+               for place in ("loft", "cabin", "loft")]
+    repo.add_many(reviews)
+    for _ in range(2):
+        found = repo.get_all_by_attribute('place', "loft")
+        assert [r.id for r in found] == [reviews[0].id, reviews[2].id]
+        repo.add_index('place')
+
+
+def test_composite_unique_index(database):
+    repo = SQLiteRepository(database, 'reviews')
+    repo.add_index(('user', 'place'), unique=True)
+    review = Review("Nice", 5, "loft", "ana")
+    repo.add(review)
+    with pytest.raises(ValueError):
+        repo.add(Review("Again", 1, "loft", "ana"))
+    repo.add(Review("Nice", 5, "cabin", "ana"))
+    found = repo.get_by_attribute(('user', 'place'), ("ana", "loft"))
+    assert found.id == review.id
+
+
+def test_data_persists_across_instances_and_threads(database):
+    repo = SQLiteRepository(database, 'amenities')
+    ids = []
+
+    def add_amenities():
+        for i in range(20):
+            amenity = Amenity(name=f"Amenity {i}")
+            repo.add(amenity)
+            ids.append(amenity.id)
+
+    threads = [threading.Thread(target=add_amenities) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    repo.close()
+
+    reopened = SQLiteRepository(database, 'amenities')
+    assert sorted(a.id for a in reopened.get_all()) == sorted(ids)
+
+
+def test_facade_uses_configured_backend(database):
+    facade = HBnBFacade({'REPOSITORY': 'sqlite', 'SQLITE_DATABASE': database})
+    assert isinstance(facade.user_repo.repo, SQLiteRepository)
+
+    user = facade.create_user({
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "email": "jane@example.com",
+        "password": "12345678"
+    })
+    assert facade.get_user_by_email("JANE@example.com")['id'] == user['id']
+    assert facade.get_verified_user("jane@example.com", "12345678")
+
+    facade.update_user(user['id'], {'first_name': "Janet"})
+    reopened = HBnBFacade(
+        {'REPOSITORY': 'sqlite', 'SQLITE_DATABASE': database})
+    assert reopened.get_user(user['id'])['first_name'] == "Janet"
+
+
+def test_batch_operations_run_in_one_transaction(database):
+    repo = SQLiteRepository(database, 'amenities')
+    repo.add_index('name', unique=True)
+    amenities = [Amenity(name=f"Amenity {i}") for i in range(1200)]
+    repo.add_many(amenities)
+    ids = [a.id for a in amenities]
+    found = repo.get_many(ids[::-1] + ["missing"])
+    assert [a.id for a in found[:-1]] == ids[::-1]
+    assert found[-1] is None
+
+    with pytest.raises(ValueError):
+        repo.add_many([Amenity(name="New"), Amenity(name="Amenity 0")])
+    assert repo.get_by_attribute('name', "New") is None
+
+    repo.update_many([(ids[0], {'name': "Renamed"})])
+    assert repo.get(ids[0]).name == "Renamed"
+    assert repo.delete_many([ids[0], ids[0]]) == [True, False]
+    assert len(repo.get_all()) == 1199
+
+
+def test_page_seeks_by_rowid(database):
+    repo = SQLiteRepository(database, 'amenities')
+    repo.add_many(Amenity(name=f"Amenity {i}") for i in range(5))
+    repo.delete(repo.get_by_attribute('name', "Amenity 2").id)
+
+    names, cursor = [], None
+    while True:
+        page, cursor = repo.page(cursor, limit=2)
+        names += [a.name for a in page]
+        if cursor is None:
+            break
+    assert names == [f"Amenity {i}" for i in (0, 1, 3, 4)]
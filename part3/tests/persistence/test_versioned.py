@@ -0,0 +1,58 @@
+from app.models.amenity import Amenity
+from app.persistence.repository import InMemoryRepository
+from app.persistence.snapshot import Snapshot, write_snapshot
+from app.persistence.versioned import RadixMap
+
+
+def test_radix_map_versions_are_independent():
+    empty = RadixMap()
+    first = empty.set(3, 'a').set(40000, 'b')
+    second = first.set(3, 'c').delete(40000).set(7, 'd')
+
+    assert len(empty) == 0 and empty.get(3) is None
+    assert list(first.items()) == [(3, 'a'), (40000, 'b')]
+    assert list(second.items()) == [(3, 'c'), (7, 'd')]
+    assert list(second.items(start=5)) == [(7, 'd')]
+    assert list(first.reversed_items()) == [(40000, 'b'), (3, 'a')]
+    assert len(second) == 2
+    assert len(second.delete(3).delete(7)) == 0
+
+
+def test_view_is_not_affected_by_later_writes():
+    repo = InMemoryRepository()
+    wifi, pool = Amenity(name="Wi-Fi"), Amenity(name="Pool")
+    repo.add(wifi)
+    repo.add(pool)
+
+    view = repo.get_all()
+    repo.update(wifi.id, {'name': "Fiber"})
+    repo.delete(pool.id)
+    repo.add(Amenity(name="Gym"))
+
+    assert [a.name for a in view] == ["Wi-Fi", "Pool"]
+    assert len(view) == 2
+    assert wifi.name == "Wi-Fi"
+    assert [a.name for a in repo.get_all()] == ["Fiber", "Gym"]
+
+
+def test_views_over_a_loaded_snapshot(tmp_path):
+    source = InMemoryRepository()
+    for name in ("Wi-Fi", "Pool", "Gym"):
+        source.add(Amenity(name=name))
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {'amenities': source.snapshot_section()})
+
+    repo = InMemoryRepository()
+    repo.load_snapshot(Snapshot(path).sections['amenities'])
+    wifi, pool, gym = repo.get_all()
+    before = repo.get_all()
+    repo.update(pool.id, {'name': "Spa"})
+    repo.delete(wifi.id)
+    repo.add(Amenity(name="Sauna"))
+
+    assert [a.name for a in before] == ["Wi-Fi", "Pool", "Gym"]
+    assert [a.name for a in repo.get_all()] == ["Spa", "Gym", "Sauna"]
+    assert [a.name for _, a in repo.snapshot().reversed_items()] == [
+        "Sauna", "Gym", "Spa"]
+    assert repo.explain(order_by='-id')['order'] == 'seq'
+    assert len(repo.get_all()) == 3
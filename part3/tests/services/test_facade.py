@@ -0,0 +1,214 @@
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+import pytest
+from app.persistence.remote import RepositoryServer
+from app.services.async_facade import AsyncHBnBFacade
+from app.services.facade import HBnBFacade
+
+
+@pytest.fixture
+def facade():
+    """Facade with two users, a place each and reviews between them"""
+    facade = HBnBFacade({'REPOSITORY': 'memory'})
+    ids = {}
+    for name in ("ana", "ben"):
+        ids[name] = facade.create_user({
+            'first_name': name, 'last_name': "Doe",
+            'email': f"{name}@example.com", 'password': "secret"})['id']
+        ids[f"{name}_place"] = facade.create_place({
+            'title': f"{name}'s loft", 'description': "", 'price': 50.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': ids[name]})['id']
+    facade.create_review({'text': "Great", 'rating': 5,
+                          'user_id': ids["ana"], 'place_id': ids["ben_place"]})
+    facade.create_review({'text': "Fine", 'rating': 3,
+                          'user_id': ids["ben"], 'place_id': ids["ana_place"]})
+    facade.ids = ids
+    return facade
+
+
+def test_relationship_lookups_use_indexes(facade):
+    ids = facade.ids
+    assert [r['text'] for r in facade.get_reviews_by_place(
+        ids["ben_place"])] == ["Great"]
+    assert [r['text'] for r in facade.get_reviews_by_user(
+        ids["ben"])] == ["Fine"]
+    assert [p['id'] for p in facade.get_places_by_owner(
+        ids["ana"])] == [ids["ana_place"]]
+    assert facade.get_user_review_for_place(
+        ids["ana"], ids["ben_place"])['rating'] == 5
+    assert facade.get_user_review_for_place(
+        ids["ana"], ids["ana_place"]) is None
+
+    review_id = facade.get_reviews_by_user(ids["ana"])[0]['id']
+    facade.delete_review(review_id)
+    assert facade.get_reviews_by_place(ids["ben_place"]) == []
+
+
+def test_second_review_of_a_place_is_rejected(facade):
+    ids = facade.ids
+    with pytest.raises(ValueError, match="already reviewed"):
+        facade.create_review({'text': "Again", 'rating': 1,
+                              'user_id': ids["ana"],
+                              'place_id': ids["ben_place"]})
+    assert len(facade.get_reviews_by_place(ids["ben_place"])) == 1
+
+
+def test_search_indexes_follow_the_change_log(facade):
+    ids = facade.ids
+    assert facade.changes.last_seq == 6
+    # Built by the first search, not on startup
+    assert facade.search_stats()['places']['documents'] == 0
+    assert [p['id'] for p in facade.get_places_page(q="loft")[0]] == [
+        ids["ana_place"], ids["ben_place"]]
+    facade.update_place(ids["ana_place"], {'title': "Ana's cabin"})
+    assert [p['id'] for p in facade.get_places_page(q="cabin")[0]] == [
+        ids["ana_place"]]
+
+    facade.delete_place(ids["ana_place"])
+    assert facade.get_places_page(q="cabin")[0] == []
+    assert [c.op for c in facade.changes.read(after=6)] == [
+        'update', 'delete']
+
+
+def test_identical_place_update_writes_nothing(tmp_path):
+    facade = HBnBFacade({'REPOSITORY': 'sqlite',
+                         'SQLITE_DATABASE': str(tmp_path / "hbnb.db")})
+    owner_id = facade.create_user({
+        'first_name': "Ana", 'last_name': "Doe",
+        'email': "ana@example.com", 'password': "secret"})['id']
+    wifi_id = facade.create_amenity({'name': "Wi-Fi"})['id']
+    data = {'title': "Loft", 'description': "", 'price': 50.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': owner_id}
+    place_id = facade.create_place(dict(data))['id']
+    facade.update_place(place_id, dict(data, amenities=[wifi_id]))
+    seq = facade.changes.last_seq
+
+    # The amenities are decoded again, as other instances
+    facade.update_place(place_id, dict(data, amenities=[wifi_id]))
+    assert facade.changes.read(after=seq) == []
+    assert facade.place_repo.update(place_id, {
+        'amenities': facade.amenity_repo.get_many([wifi_id])}) == {}
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_places_follow_the_writes_of_their_amenities(backend, tmp_path):
+    facade = HBnBFacade({'REPOSITORY': backend,
+                         'SQLITE_DATABASE': str(tmp_path / "hbnb.db")})
+    owner_id = facade.create_user({
+        'first_name': "Ana", 'last_name': "Doe",
+        'email': "ana@example.com", 'password': "secret"})['id']
+    wifi_id = facade.create_amenity({'name': "Wifi"})['id']
+    pool_id = facade.create_amenity({'name': "Pool"})['id']
+    place_id = facade.create_place({
+        'title': "Loft", 'description': "", 'price': 50.0, 'latitude': 0.0,
+        'longitude': 0.0, 'owner_id': owner_id,
+        'amenities': [wifi_id, pool_id]})['id']
+    facade.get_places_page(encoded=True)  # caches the place's JSON
+
+    facade.update_amenity(wifi_id, {'name': "Fast Wifi"})
+    assert [a['name'] for a in facade.get_place(place_id)['amenities']] == [
+        "Fast Wifi", "Pool"]
+    encoded, _ = facade.get_places_page(encoded=True)
+    assert [a['name'] for a in json.loads(encoded)[0]['amenities']] == [
+        "Fast Wifi", "Pool"]
+
+    facade.delete_amenity(pool_id)
+    assert [a['name'] for a in facade.get_place(place_id)['amenities']] == [
+        "Fast Wifi"]
+
+
+def test_encoded_pages_join_the_cached_json(facade):
+    for entity in ('users', 'places', 'reviews', 'amenities'):
+        method = getattr(facade, f'get_{entity}_page')
+        items, cursor = method(limit=1)
+        encoded, encoded_cursor = method(limit=1, encoded=True)
+        assert json.loads(encoded) == items and encoded_cursor == cursor
+    assert 'password' not in json.loads(facade.get_users_page(
+        encoded=True)[0])[0]
+    place_id = facade.ids["ana_place"]
+    place = facade.place_repo.get(place_id)
+    assert place.to_json() is place.to_json()
+    facade.update_place(place_id, {'title': "Renamed"})
+    assert b'"Renamed"' in facade.place_repo.get(place_id).to_json()
+
+
+def test_workers_share_the_shared_memory_backend():
+    config = {'REPOSITORY': 'shared',
+              'SHARED_MEMORY_NAME': f'hbnb-test-{uuid.uuid4().hex[:8]}',
+              'SHARED_MEMORY_SIZE': 1 << 20}
+    first, second = HBnBFacade(config), HBnBFacade(config)
+    try:
+        user_id = first.create_user({
+            'first_name': "Ana", 'last_name': "Doe",
+            'email': "ana@example.com", 'password': "secret"})['id']
+        place_id = second.create_place({
+            'title': "Loft", 'description': "", 'price': 50.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': user_id})['id']
+        first.update_place(place_id, {'title': "Cabin"})
+        assert second.get_user(user_id)['email'] == "ana@example.com"
+        assert [p['id'] for p in second.get_places_page(q="cabin")[0]] == [
+            place_id]
+        assert second.get_places_page(q="loft")[0] == []
+    finally:
+        for repo in first.repositories.values():
+            repo.unlink()
+        for facade in (first, second):
+            for repo in facade.repositories.values():
+                repo.close()
+        for path in glob.glob(os.path.join(
+                tempfile.gettempdir(), config['SHARED_MEMORY_NAME'] + '*')):
+            os.remove(path)
+
+
+def test_workers_share_a_repository_server(tmp_path):
+    server = RepositoryServer(str(tmp_path / 'repositories.sock'))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = {'REPOSITORY': 'remote', 'REMOTE_SOCKET': server.server_address}
+    try:
+        first, second = HBnBFacade(config), HBnBFacade(config)
+        user_id = first.create_user({
+            'first_name': "Ana", 'last_name': "Doe",
+            'email': "ana@example.com", 'password': "secret"})['id']
+        with pytest.raises(ValueError):
+            second.create_user({
+                'first_name': "Ana", 'last_name': "Doe",
+                'email': "ANA@example.com", 'password': "secret"})
+        place_id = second.create_place({
+            'title': "Loft", 'description': "", 'price': 50.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': user_id})['id']
+        first.update_place(place_id, {'title': "Cabin"})
+        assert [p['id'] for p in second.get_places_page(q="cabin")[0]] == [
+            place_id]
+        assert second.get_places_page(q="loft")[0] == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_facade_reads_match_the_sync_ones(facade):
+    ids = facade.ids
+    async_facade = AsyncHBnBFacade(facade)
+
+    async def reads():
+        return await asyncio.gather(
+            async_facade.get_user(ids["ana"]),
+            async_facade.get_place_with_reviews(ids["ben_place"]),
+            async_facade.get_place_with_reviews("missing"),
+            async_facade.get_reviews_page(q="great"),
+            async_facade.get_places_page(max_price=60.0, limit=1))
+
+    user, place, missing, (reviews, _), (places, cursor) = asyncio.run(
+        reads())
+    expected = facade.get_user(ids["ana"])
+    del expected['password']
+    assert user == expected
+    assert place['title'] == "ben's loft"
+    assert [r['text'] for r in place['reviews']] == ["Great"]
+    assert missing is None
+    assert [r['text'] for r in reviews] == ["Great"]
+    assert len(places) == 1 and cursor is not None
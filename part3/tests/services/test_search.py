@@ -0,0 +1,53 @@
+import random
+from app.models.place import Place
+from app.services.search import FullTextIndex, tokenize
+
+
+def place(title, description=""):
+    return Place(title, description, 100.0, 0.0, 0.0, "owner-id")
+
+
+def test_tokenize_case_folds_words():
+    assert tokenize("Sunny LOFT, near the Café!") == [
+        "sunny", "loft", "near", "the", "café"]
+    assert tokenize(None) == []
+
+
+def test_bm25_ranks_rarer_and_denser_matches_first():
+    index = FullTextIndex(('title', 'description'))
+    loft = place("Loft", "Quiet loft with a view of the sea")
+    house = place("House", "Big house with garden, pool and a sea view")
+    cabin = place("Cabin", "Cabin in the woods")
+    index.add_many([loft, house, cabin])
+
+    assert index.search("loft") == [loft.id]
+    assert index.search("sea view")[:2] == [loft.id, house.id]
+    assert index.search("cabin pool", top=1) == [cabin.id]
+    assert index.search("castle") == []
+
+
+def test_index_follows_updates_and_deletes():
+    index = FullTextIndex(('title',))
+    loft = place("Sunny loft")
+    index.add(loft)
+    loft.title = "Dark cellar"
+    index.add(loft)
+    assert index.search("loft") == []
+    assert index.search("cellar") == [loft.id]
+
+    index.remove(loft.id)
+    assert index.search("cellar") == []
+    stats = index.stats()
+    assert (stats['documents'], stats['terms'], stats['postings']) == (
+        0, 0, 0)
+
+
+def test_top_matches_full_ranking():
+    random.seed(7)
+    words = [f"w{i}" for i in range(30)]
+    index = FullTextIndex(('title',))
+    for _ in range(500):
+        index.add(place(" ".join(random.choices(
+            words, weights=range(30, 0, -1), k=8))))
+    for query in ("w0 w29", "w1 w2 w25", "w28"):
+        assert index.search(query, top=5) == index.search(query)[:5]